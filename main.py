@@ -1,6 +1,7 @@
 # video_streaming_project/main.py
 import sys
 import asyncio
+import multiprocessing
 import qasync
 from PyQt5.QtWidgets import QApplication
 from src.ui.main_window import StreamApp
@@ -21,4 +22,7 @@ def main():
         loop.run_forever()
 
 if __name__ == "__main__":
+    # En el ejecutable de PyInstaller el worker de captura vuelve a correr este
+    # script: freeze_support lo desvía al proceso hijo antes de abrir la GUI
+    multiprocessing.freeze_support()
     main()
@@ -7,15 +7,83 @@ PREVIEW_FPS = 30  # FPS para la previsualización
 VIDEO_CODEC = 'XVID'
 VIDEO_QUALITY = 1  # 1 es la mejor calidad, aumentar para reducir tamaño
 
+# Ritmo de captura
+PACER_LATE_POLICY = 'skip'  # 'skip' (saltar deadlines perdidos) o 'catch_up' (entregarlos sin esperar)
+PACER_SPIN_US = 2000  # Microsegundos finales de espera activa antes de cada deadline
+
+# Captura adaptativa
+ADAPTIVE_CAPTURE = True  # Bajar la tasa de captura mientras la pantalla está estática
+IDLE_CAPTURE_FPS = 2  # Capturas por segundo en reposo
+IDLE_AFTER_STATIC_GRABS = 3  # Capturas idénticas seguidas antes de pasar a reposo
+
+# Regiones de captura
+CAPTURE_REGION_MIN_SIZE = 64  # Lado mínimo en píxeles de una región o ventana a capturar
+MULTI_MONITOR_OUTPUT = 'files'  # Varios monitores: 'files' (un archivo sincronizado por monitor) o 'streams' (un contenedor con un stream de video por monitor)
+
+# Worker de captura
+CAPTURE_WORKER = True  # Capturar y codificar en un proceso aparte (la GUI solo recibe el preview)
+WORKER_REPLY_TIMEOUT = 30.0  # Segundos máximos de espera por la respuesta del worker a un comando
+
+# Configuración del Encoder
+ENCODER_BACKEND = 'ffmpeg'  # 'ffmpeg' (un solo paso por pipe) u 'opencv' (AVI temporal + combinación)
+ENCODER_QUEUE_SIZE = 6  # Frames en cola antes de aplicar la política de desborde (menor que BUFFER_SIZE)
+ENCODER_OVERFLOW_POLICY = 'drop_oldest'  # Puede ser 'block', 'drop_oldest', 'drop_newest'
+
+# Detección de cambios (damage) y salida de frame rate variable
+DAMAGE_DETECTION = True  # Omitir frames sin tiles cambiados antes de codificarlos
+DAMAGE_TILE_SIZE = 64  # Lado en píxeles de cada tile comparado
+VIDEO_FRAME_RATE_MODE = 'cfr'  # 'cfr' (se duplican frames al multiplexar para mantener VIDEO_FPS) o 'vfr' (timestamps reales)
+VFR_MAX_GAP = 1.0  # Segundos máximos sin escribir un frame aunque la pantalla esté estática
+
+# Configuración de FFmpeg
+FFMPEG_PATH = 'ffmpeg'  # Ejecutable de FFmpeg (debe estar en el PATH)
+FFMPEG_VIDEO_CODEC = 'libx264'
+FFMPEG_PRESET = 'ultrafast'  # Presets más lentos comprimen mejor pero usan más CPU
+FFMPEG_CRF = 23  # 0-51, menor es mejor calidad
+FFMPEG_CONTAINER = 'mkv'  # Matroska sigue siendo reproducible si la grabación se interrumpe
+FINALIZE_MODE = 'copy'  # 'copy' (solo codifica el audio), 'transcode' (recodifica también el video) o 'parallel' (recodifica por segmentos en paralelo)
+TRANSCODE_WORKERS = 0  # Procesos de ffmpeg simultáneos en modo 'parallel' (0 = uno por núcleo)
+TRANSCODE_MIN_SEGMENT_SECONDS = 30  # Duración mínima de cada segmento; videos más cortos se recodifican en serie
+
 # Configuración de Audio
 AUDIO_CHANNELS = 2  # Cambiado a 2 canales (stereo)
 AUDIO_SAMPLE_RATE = 44100
 AUDIO_CHUNK_SIZE = 1024
-AUDIO_FORMAT = 'int16'
+AUDIO_FORMAT = 'int16'  # Formato de los WAV y pipes de audio: 'int16', 'int24' o 'float32' (sin conversión)
+AUDIO_DITHER = False  # Ruido TPDF de ±1 LSB al convertir a enteros
+AUDIO_NATIVE_RATE = True  # Abrir cada dispositivo a su tasa nativa y resamplear a AUDIO_SAMPLE_RATE
+AUDIO_RESAMPLER_TAPS = 32  # Coeficientes por fase del resampler polifásico
+AUDIO_RESAMPLER_PHASES = 256  # Fases del banco de filtros (se interpola entre fases vecinas)
+AUDIO_DRIFT_CORRECTION = True  # Corregir la deriva de reloj de cada dispositivo con el resampler
+AUDIO_DRIFT_WINDOW = 2.0  # Segundos por punto de la estimación de deriva
+AUDIO_DRIFT_HISTORY = 150  # Ventanas usadas en el ajuste (150 x 2 s = 5 minutos)
+AUDIO_DRIFT_PULL_SECONDS = 10.0  # Tiempo para recuperar el desfase acumulado
+AUDIO_DRIFT_MAX_PPM = 1000  # Límite de la corrección aplicada
+AUDIO_NORMALIZE = True  # Medir sonoridad EBU R128 al escribir y normalizar al finalizar
+AUDIO_TARGET_LUFS = -16.0  # Sonoridad integrada objetivo
+AUDIO_TRUE_PEAK_LIMIT = -1.0  # dBTP máximo tras la normalización
+AUDIO_MAX_NORMALIZE_GAIN = 20.0  # dB máximos de amplificación
+AUDIO_METER_RATE = 20  # Actualizaciones por segundo de los niveles de cada fuente
+AUDIO_SILENCE_THRESHOLD_DB = -60.0  # Pico por debajo del cual una fuente se considera en silencio
+AUDIO_SILENCE_ALARM_SECONDS = 3.0  # Segundos de silencio antes de avisar
+AUDIO_RING_SECONDS = 2.0  # Capacidad del anillo entre el callback y el thread escritor
+AUDIO_WRITE_INTERVAL = 0.1  # Segundos entre escrituras a disco o al pipe
+AUDIO_GAP_TOLERANCE = 0.1  # Segundos de audio perdidos a partir de los que se inserta silencio
+
+# Mezcla de audio
+AUDIO_TRACK_MODE = 'mix'  # 'mix' (una pista mezclada) o 'tracks' (una pista por dispositivo, sin mezclar)
+AUDIO_SOURCE_GAINS = {'mic': 1.0, 'speakers': 1.0}  # Ganancia lineal por tipo de fuente
+AUDIO_SOFT_CLIP_KNEE = 0.8  # Nivel desde el que la mezcla se satura suavemente en lugar de recortar
+AUDIO_STALL_SECONDS = 0.5  # Atraso tolerado de una fuente antes de mezclar su parte como silencio
+
+# Configuración del Cursor
+CURSOR_CACHE_SIZE = 16  # Formas de cursor rasterizadas que se mantienen en caché
+CURSOR_ONLY_MAX_FRAMES = 5  # Frames seguidos sin recapturar si solo se mueve el cursor (0 desactiva)
 
 # Configuración de Buffer
-PREVIEW_SCALE = 0.75  # Escala de previsualización (reducir para menor uso de memoria)
-BUFFER_SIZE = 10  # Número de frames en buffer
+PREVIEW_SCALE = 0.75  # Escala máxima del preview; se redondea a 1/n del frame para reducir con INTER_AREA rápido
+BUFFER_SIZE = 10  # Número de slots preasignados en el anillo de frames
+PREVIEW_RING_SLOTS = 3  # Slots del anillo de preview en memoria compartida (worker -> GUI)
 
 # Optimización
 PROCESS_PRIORITY = 'normal'  # Puede ser 'low', 'normal', 'high'
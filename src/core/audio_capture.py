@@ -1 +1,614 @@
- 
\ No newline at end of file
+"""Captura de audio: timestamps de sesión, anillo de muestras y escritura fuera del callback."""
+import collections
+import math
+import threading
+import time
+import numpy as np
+import sounddevice as sd
+from ..config.settings import (
+    AUDIO_CHUNK_SIZE,
+    AUDIO_SAMPLE_RATE,
+    AUDIO_NORMALIZE,
+    AUDIO_GAP_TOLERANCE,
+    AUDIO_NATIVE_RATE,
+    AUDIO_DRIFT_CORRECTION,
+    AUDIO_DRIFT_WINDOW,
+    AUDIO_DRIFT_HISTORY,
+    AUDIO_DRIFT_PULL_SECONDS,
+    AUDIO_DRIFT_MAX_PPM,
+    AUDIO_RING_SECONDS,
+    AUDIO_WRITE_INTERVAL,
+    AUDIO_SOFT_CLIP_KNEE,
+    AUDIO_STALL_SECONDS,
+    AUDIO_METER_RATE,
+    AUDIO_SILENCE_THRESHOLD_DB,
+    AUDIO_SILENCE_ALARM_SECONDS
+)
+from .resampler import PolyphaseResampler
+from .sample_format import SampleConverter
+from .loudness import LoudnessMeter
+
+class AudioTimeline:
+    """Sella cada bloque de audio de una fuente con el reloj de sesión.
+
+    El primer bloque fija ``start_offset``: los segundos entre el inicio de la
+    sesión y la primera muestra capturada. Los bloques siguientes se comparan
+    con la posición esperada según las muestras recibidas; si faltan más de
+    ``gap_tolerance`` segundos (bloques perdidos por desborde del dispositivo)
+    se indica cuántas muestras de silencio hay que insertar para no perder la
+    sincronía con el video.
+
+    ``sample_rate`` es la tasa del dispositivo; si el audio se resamplea,
+    ``output_rate`` es la tasa del anillo y el silencio se cuenta en ella.
+    """
+
+    def __init__(self, clock, sample_rate, pad_start=False, gap_tolerance=AUDIO_GAP_TOLERANCE,
+                 output_rate=None):
+        self.clock = clock
+        self.sample_rate = sample_rate
+        self.output_rate = output_rate or sample_rate
+        self.pad_start = pad_start  # Rellenar con silencio desde el inicio de la sesión
+        self.gap_tolerance = gap_tolerance
+        self.start_offset = None
+        self.samples = 0  # Muestras por canal recibidas del dispositivo
+        self.gap_samples = 0  # Silencio insertado por bloques perdidos (a output_rate)
+        self.last_pts = None
+
+    def stamp(self, frames, time_info=None, position=None):
+        """Registra un bloque de ``frames`` muestras.
+
+        ``position`` son los segundos de audio ya entregados a ``output_rate``
+        (incluido el silencio); si se indica, reemplaza a la posición esperada
+        calculada con las muestras del dispositivo, que con corrección de
+        deriva ya no coincide con lo escrito.
+
+        Retorna ``(pts, silence)``: el instante de la primera muestra en
+        segundos de sesión y las muestras de silencio a escribir antes del bloque.
+        """
+        now = time.perf_counter()
+        latency = frames / self.sample_rate
+        # PortAudio informa cuándo llegó el bloque al ADC, si el host lo soporta
+        adc_time = getattr(time_info, 'inputBufferAdcTime', 0)
+        current_time = getattr(time_info, 'currentTime', 0)
+        if adc_time and current_time > adc_time:
+            latency = current_time - adc_time
+        pts = self.clock.to_session(now - latency)
+
+        silence = 0
+        if self.start_offset is None:
+            self.start_offset = max(0.0, pts)
+            if self.pad_start:
+                silence = int(round(self.start_offset * self.output_rate))
+        else:
+            expected = position
+            if expected is None:
+                expected = (self.start_offset + self.samples / self.sample_rate
+                            + self.gap_samples / self.output_rate)
+            if pts - expected > self.gap_tolerance:
+                silence = int(round((pts - expected) * self.output_rate))
+                self.gap_samples += silence
+
+        self.samples += frames
+        self.last_pts = pts
+        return pts, silence
+
+    def stats(self):
+        return {
+            'start_offset': self.start_offset,
+            'samples': self.samples,
+            'gap_samples': self.gap_samples,
+            'sample_rate': self.output_rate,
+            'device_rate': self.sample_rate
+        }
+
+class DriftEstimator:
+    """Estima la deriva del reloj de un dispositivo respecto del reloj de sesión.
+
+    Sin deriva, ``pts - muestras / tasa`` es constante; su pendiente contra
+    ``pts`` es la diferencia relativa entre el cristal del dispositivo y el
+    reloj monotónico (negativa si el dispositivo entrega muestras de más).
+    La latencia del callback solo puede atrasar ``pts``, así que de cada
+    ventana de ``window`` segundos se toma el offset mínimo y la pendiente se
+    ajusta por mínimos cuadrados sobre las últimas ``history`` ventanas.
+
+    ``correction`` es la corrección de paso para el resampler: la deriva
+    medida más un término que recupera en ``pull_seconds`` el desfase ya
+    acumulado en la salida.
+    """
+
+    def __init__(self, nominal_rate, window=AUDIO_DRIFT_WINDOW, history=AUDIO_DRIFT_HISTORY,
+                 pull_seconds=AUDIO_DRIFT_PULL_SECONDS, max_ppm=AUDIO_DRIFT_MAX_PPM):
+        self.nominal_rate = nominal_rate
+        self.window = window
+        self.pull_seconds = pull_seconds
+        self.max_correction = max_ppm * 1e-6
+        self.points = collections.deque(maxlen=history)
+        self.drift = 0.0  # Relativa: 1e-6 = el dispositivo adelanta 1 ppm
+        self.phase_error = 0.0  # Segundos que la salida va adelantada al reloj
+        self.correction = 0.0
+        self._window_start = None
+        self._window_offset = None
+        self._window_pts = None
+        self._window_phase = None
+
+    def update(self, pts, samples, position):
+        """Agrega un bloque: ``samples`` del dispositivo y ``position`` de salida (en segundos) antes de él.
+
+        Retorna la corrección actual.
+        """
+        offset = pts - samples / self.nominal_rate
+        phase = position - pts
+        if self._window_start is None:
+            self._window_start = pts
+        if self._window_offset is None or offset < self._window_offset:
+            self._window_offset = offset
+            self._window_pts = pts
+        if self._window_phase is None or phase > self._window_phase:
+            self._window_phase = phase
+
+        if pts - self._window_start >= self.window:
+            self.points.append((self._window_pts, self._window_offset))
+            self.phase_error = self._window_phase
+            self._window_start = pts
+            self._window_offset = None
+            self._window_phase = None
+            if len(self.points) >= 3:
+                self.drift = -self._slope()
+            pull = self.phase_error / self.pull_seconds
+            self.correction = max(-self.max_correction,
+                                  min(self.max_correction, self.drift + pull))
+        return self.correction
+
+    def _slope(self):
+        count = len(self.points)
+        mean_t = sum(t for t, _ in self.points) / count
+        mean_o = sum(o for _, o in self.points) / count
+        covariance = sum((t - mean_t) * (o - mean_o) for t, o in self.points)
+        variance = sum((t - mean_t) ** 2 for t, _ in self.points)
+        return covariance / variance if variance else 0.0
+
+    def stats(self):
+        return {
+            'drift_ppm': self.drift * 1e6,
+            'correction_ppm': self.correction * 1e6,
+            'phase_error_ms': self.phase_error * 1000
+        }
+
+class AudioRingBuffer:
+    """Anillo preasignado de un productor y un consumidor para bloques de audio.
+
+    El callback de PortAudio (productor) solo copia muestras al anillo y
+    avanza ``_write_pos``; el thread escritor (consumidor) lee y avanza
+    ``_read_pos``. Cada posición la modifica un único thread y se publica
+    después de copiar los datos, así que no hacen falta locks.
+    """
+
+    def __init__(self, capacity, channels, dtype=np.float32):
+        self.capacity = capacity
+        self.channels = channels
+        self.buffer = np.zeros((capacity, channels), dtype=dtype)
+        self._write_pos = 0
+        self._read_pos = 0
+        self.overflows = 0  # Bloques descartados por anillo lleno
+        self.overflow_frames = 0
+
+    def available(self):
+        """Muestras escritas y todavía no leídas."""
+        return self._write_pos - self._read_pos
+
+    def space(self):
+        return self.capacity - self.available()
+
+    def write(self, data):
+        """Copia un bloque ``(frames, channels)``. Retorna cuántas muestras copió (0 si no había espacio)."""
+        frames = len(data)
+        if frames > self.space():
+            self.overflows += 1
+            self.overflow_frames += frames
+            return 0
+        start = self._write_pos % self.capacity
+        first = min(frames, self.capacity - start)
+        self.buffer[start:start + first] = data[:first]
+        if first < frames:
+            self.buffer[:frames - first] = data[first:]
+        self._write_pos += frames
+        return frames
+
+    def write_silence(self, frames):
+        """Agrega ``frames`` muestras de silencio (limitado al espacio libre). Retorna cuántas agregó."""
+        frames = min(frames, self.space())
+        start = self._write_pos % self.capacity
+        first = min(frames, self.capacity - start)
+        self.buffer[start:start + first] = 0
+        if first < frames:
+            self.buffer[:frames - first] = 0
+        self._write_pos += frames
+        return frames
+
+    def skip(self, frames):
+        """Descarta hasta ``frames`` muestras sin leerlas. Retorna cuántas se descartaron."""
+        frames = min(self.available(), frames)
+        self._read_pos += frames
+        return frames
+
+    def read_into(self, out):
+        """Copia hasta ``len(out)`` muestras en ``out``. Retorna cuántas se leyeron."""
+        frames = min(self.available(), len(out))
+        start = self._read_pos % self.capacity
+        first = min(frames, self.capacity - start)
+        out[:first] = self.buffer[start:start + first]
+        if first < frames:
+            out[first:frames] = self.buffer[:frames - first]
+        self._read_pos += frames
+        return frames
+
+class AudioWriterThread(threading.Thread):
+    """Vacía un ``AudioRingBuffer`` hacia un destino (WAV o pipe) en escrituras grandes.
+
+    Se despierta cada ``interval`` segundos, convierte todo lo acumulado al
+    formato de salida con un ``SampleConverter`` y lo escribe de una sola
+    vez, fuera del callback de tiempo real. Con ``AUDIO_NORMALIZE`` cada
+    bloque pasa también por un ``LoudnessMeter``.
+    """
+
+    def __init__(self, name, sink, ring, interval=AUDIO_WRITE_INTERVAL, sample_rate=AUDIO_SAMPLE_RATE):
+        super().__init__(name=f"AudioWriter-{name}", daemon=True)
+        self.sink = sink
+        self.ring = ring
+        self.interval = interval
+        self._float = np.zeros((ring.capacity, ring.channels), dtype=np.float32)
+        self.converter = SampleConverter(ring.capacity, ring.channels)
+        self.meter = LoudnessMeter(sample_rate, ring.channels) if AUDIO_NORMALIZE else None
+        self._stop_event = threading.Event()
+
+        # Contadores
+        self.written_frames = 0
+        self.underruns = 0  # Ciclos sin datos mientras el stream estaba activo
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            if not self._drain():
+                self.underruns += 1
+        self._drain()
+
+    def _drain(self):
+        """Escribe todo lo disponible. Retorna False si el anillo estaba vacío."""
+        frames = self.ring.read_into(self._float)
+        if frames == 0:
+            return False
+        block = self._float[:frames]
+        if self.meter is not None:
+            self.meter.process(block)
+        try:
+            self.sink.writeframes(self.converter.convert(block))
+            self.written_frames += frames
+        except Exception as e:
+            print(f"Error al escribir audio: {str(e)}")
+        return True
+
+    def stop(self):
+        """Escribe lo pendiente y espera a que el thread termine."""
+        self._stop_event.set()
+        self.join()
+
+    def stats(self):
+        return {
+            'written_frames': self.written_frames,
+            'ring_overflows': self.ring.overflows,
+            'ring_overflow_frames': self.ring.overflow_frames,
+            'underruns': self.underruns,
+            'loudness': self.meter.stats() if self.meter is not None else None
+        }
+
+def _to_db(level):
+    """Nivel lineal a dBFS, con piso en -100 dB."""
+    return 20 * math.log10(level) if level > 1e-5 else -100.0
+
+class LevelMeter:
+    """Pico y RMS por canal de un stream, publicados ``rate`` veces por segundo.
+
+    ``process`` corre en el callback de tiempo real y solo hace reducciones
+    vectorizadas del bloque hacia buffers preasignados, sin arrays
+    temporales. Cada ``sample_rate / rate`` muestras publica la ventana en
+    ``peak`` y ``rms`` (lineales) y la compara con ``silence_db``: si la
+    señal sigue por debajo durante ``alarm_seconds`` se activa ``silent``.
+    """
+
+    def __init__(self, sample_rate, channels, rate=AUDIO_METER_RATE,
+                 silence_db=AUDIO_SILENCE_THRESHOLD_DB, alarm_seconds=AUDIO_SILENCE_ALARM_SECONDS):
+        self.sample_rate = sample_rate
+        self.window = max(1, int(sample_rate / rate))
+        self.silence_level = 10 ** (silence_db / 20)
+        self.alarm_seconds = alarm_seconds
+        self._block_squares = np.zeros(channels, dtype=np.float32)
+        self._peak_acc = np.zeros(channels, dtype=np.float32)
+        self._squares_acc = np.zeros(channels, dtype=np.float64)
+        self._count = 0
+
+        # Última ventana publicada
+        self.peak = np.zeros(channels, dtype=np.float32)
+        self.rms = np.zeros(channels, dtype=np.float32)
+        self.updated_at = None  # perf_counter de la última publicación
+        self.silent = False
+        self.silent_seconds = 0.0
+        self.alarms = 0  # Veces que una fuente quedó en silencio
+        self.max_peak = 0.0
+
+    def process(self, block):
+        # Con pocos canales, reducir cada columna es mucho más rápido que axis=0
+        for channel in range(block.shape[1]):
+            column = block[:, channel]
+            peak = max(column.max(), -column.min())
+            if peak > self._peak_acc[channel]:
+                self._peak_acc[channel] = peak
+        np.einsum('ij,ij->j', block, block, out=self._block_squares)
+        np.add(self._squares_acc, self._block_squares, out=self._squares_acc)
+        self._count += len(block)
+        if self._count >= self.window:
+            self._publish()
+
+    def _publish(self):
+        np.copyto(self.peak, self._peak_acc)
+        np.divide(self._squares_acc, self._count, out=self._squares_acc)
+        np.sqrt(self._squares_acc, out=self._squares_acc)
+        np.copyto(self.rms, self._squares_acc, casting='same_kind')
+
+        peak = float(self._peak_acc.max())
+        if peak > self.max_peak:
+            self.max_peak = peak
+        if peak < self.silence_level:
+            self.silent_seconds += self._count / self.sample_rate
+            if self.silent_seconds >= self.alarm_seconds and not self.silent:
+                self.silent = True
+                self.alarms += 1
+        else:
+            self.silent_seconds = 0.0
+            self.silent = False
+
+        self._peak_acc.fill(0)
+        self._squares_acc.fill(0)
+        self._count = 0
+        self.updated_at = time.perf_counter()
+
+class AudioSource:
+    """Un dispositivo de entrada: su stream de PortAudio, timestamps y anillo de muestras.
+
+    El anillo se rellena con silencio desde el inicio de la sesión, así que la
+    muestra ``i`` de cualquier fuente corresponde al instante ``i / sample_rate``
+    y las fuentes se pueden mezclar por posición.
+
+    Con ``native_rate`` el dispositivo se abre a su tasa por defecto y cada
+    bloque pasa por un ``PolyphaseResampler`` hacia ``sample_rate`` dentro del
+    mismo callback, antes de llegar al anillo. Con ``drift_correction`` el
+    paso del resampler sigue la deriva medida por ``DriftEstimator``, así la
+    posición en el anillo no se aparta del reloj de sesión aunque cada
+    dispositivo tenga su propio cristal.
+    """
+
+    def __init__(self, key, name, clock, sample_rate, channels, gain=1.0, native_rate=AUDIO_NATIVE_RATE,
+                 drift_correction=AUDIO_DRIFT_CORRECTION):
+        self.key = key
+        self.name = name
+        self.gain = gain
+        self.clock = clock
+        self.sample_rate = sample_rate
+        self.device_rate = sample_rate
+        self.channels = channels
+        self.native_rate = native_rate
+        self.drift_correction = drift_correction
+        self.resampler = None
+        self.timeline = AudioTimeline(clock, sample_rate, pad_start=True)
+        self.drift = DriftEstimator(sample_rate)
+        # Muestras que el anillo aceptó a sample_rate, incluido el silencio; lo
+        # descartado por anillo lleno no cuenta y vuelve como hueco en stamp()
+        self.output_frames = 0
+        self.ring = AudioRingBuffer(int(sample_rate * AUDIO_RING_SECONDS), channels)
+        self.stream = None
+        self.active = False
+        self.device_overflows = 0  # Desbordes informados por PortAudio
+        self.levels = LevelMeter(sample_rate, channels)
+        self.started_at = None
+
+    def start(self, device):
+        """Abre el dispositivo y comienza a capturar."""
+        if self.native_rate:
+            self.device_rate = int(sd.query_devices(device, 'input')['default_samplerate'])
+        if self.device_rate != self.sample_rate or self.drift_correction:
+            self.resampler = PolyphaseResampler(
+                self.device_rate, self.sample_rate, self.channels, max_block=AUDIO_CHUNK_SIZE
+            )
+        self.timeline = AudioTimeline(
+            self.clock, self.device_rate, pad_start=True, output_rate=self.sample_rate
+        )
+        self.drift = DriftEstimator(self.device_rate)
+        self.output_frames = 0
+        self.levels = LevelMeter(self.device_rate, self.channels)
+        self.started_at = time.perf_counter()
+        self.stream = sd.InputStream(
+            device=device,
+            channels=self.channels,
+            callback=self._callback,
+            samplerate=self.device_rate,
+            blocksize=AUDIO_CHUNK_SIZE,
+            dtype=np.float32
+        )
+        self.active = True
+        self.stream.start()
+
+    def _callback(self, indata, frames, time_info, status):
+        """Callback de tiempo real: sella el bloque y lo copia al anillo, sin E/S ni asignaciones."""
+        if not self.active or len(indata) == 0:
+            return
+        try:
+            if status and status.input_overflow:
+                self.device_overflows += 1
+            self.levels.process(indata)
+            samples = self.timeline.samples
+            pts, silence = self.timeline.stamp(frames, time_info, self.output_frames / self.sample_rate)
+            if silence:
+                # Inicio de la sesión o bloques perdidos: mantener la sincronía con el video
+                self.output_frames += self.ring.write_silence(silence)
+
+            correction = self.drift.update(pts, samples, self.output_frames / self.sample_rate)
+
+            if self.resampler is None:
+                self.output_frames += self.ring.write(indata)
+            else:
+                if self.drift_correction:
+                    self.resampler.set_correction(correction)
+                for start in range(0, frames, AUDIO_CHUNK_SIZE):
+                    out = self.resampler.process(indata[start:start + AUDIO_CHUNK_SIZE])
+                    self.output_frames += self.ring.write(out)
+        except Exception as e:
+            print(f"Error en callback de audio ({self.name}): {str(e)}")
+
+    def stop(self):
+        self.active = False
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+    def level(self):
+        """Últimos niveles publicados en dBFS y el estado de la alarma de silencio.
+
+        Una fuente cuyo callback dejó de llegar (o nunca llegó) durante el
+        tiempo de alarma también cuenta como silenciosa.
+        """
+        levels = self.levels
+        last = levels.updated_at if levels.updated_at is not None else self.started_at
+        stalled = (
+            self.active and last is not None
+            and time.perf_counter() - last >= levels.alarm_seconds
+        )
+        return {
+            'name': self.name,
+            'peak_db': [_to_db(float(value)) for value in levels.peak],
+            'rms_db': [_to_db(float(value)) for value in levels.rms],
+            'silent': levels.silent or stalled,
+            'stalled': stalled,
+            'silent_seconds': levels.silent_seconds
+        }
+
+    def stats(self):
+        return {
+            'device': self.name,
+            'gain': self.gain,
+            'device_overflows': self.device_overflows,
+            'max_peak_db': _to_db(self.levels.max_peak),
+            'silence_alarms': self.levels.alarms,
+            'ring_overflows': self.ring.overflows,
+            'ring_overflow_frames': self.ring.overflow_frames,
+            'drift_correction': self.drift_correction,
+            **self.drift.stats(),
+            **self.timeline.stats()
+        }
+
+class AudioMixerThread(threading.Thread):
+    """Mezcla en streaming varias ``AudioSource`` en una sola pista.
+
+    Cada ``interval`` segundos suma las muestras disponibles de todas las
+    fuentes (alineadas por posición sobre el reloj de sesión) aplicando la
+    ganancia de cada una, satura suavemente lo que supera ``knee`` y escribe
+    el resultado en ``sink`` en el formato de ``SampleConverter``. Todos los
+    buffers son preasignados. La sonoridad se mide sobre la mezcla final.
+
+    Si una fuente se atrasa más de ``stall_seconds`` respecto a la más
+    adelantada, su parte se mezcla como silencio y esas muestras se descartan
+    cuando finalmente llegan, para no desalinear el resto.
+    """
+
+    def __init__(self, sink, sources, interval=AUDIO_WRITE_INTERVAL,
+                 knee=AUDIO_SOFT_CLIP_KNEE, stall_seconds=AUDIO_STALL_SECONDS):
+        super().__init__(name="AudioMixer", daemon=True)
+        self.sink = sink
+        self.sources = list(sources)
+        self.interval = interval
+        self.knee = np.float32(knee)
+        self._curve_scale = np.float32(1.0 - knee)
+        capacity = max(source.ring.capacity for source in self.sources)
+        channels = self.sources[0].channels
+        self._stall_frames = int(stall_seconds * self.sources[0].sample_rate)
+        self._block = np.zeros((capacity, channels), dtype=np.float32)
+        self._mix = np.zeros((capacity, channels), dtype=np.float32)
+        self._excess = np.zeros((capacity, channels), dtype=np.float32)
+        self.converter = SampleConverter(capacity, channels)
+        self.meter = LoudnessMeter(self.sources[0].sample_rate, channels) if AUDIO_NORMALIZE else None
+        self._debt = [0] * len(self.sources)  # Muestras ya mezcladas como silencio
+        self._stop_event = threading.Event()
+
+        # Contadores
+        self.written_frames = 0
+        self.underruns = 0
+        self.soft_clipped_samples = 0
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            if not self._drain():
+                self.underruns += 1
+        self._drain(flush=True)
+
+    def _drain(self, flush=False):
+        """Mezcla y escribe lo disponible. Retorna False si no había nada."""
+        available = []
+        for i, source in enumerate(self.sources):
+            if self._debt[i]:
+                self._debt[i] -= source.ring.skip(self._debt[i])
+            available.append(source.ring.available() if not self._debt[i] else 0)
+
+        frames = min(available)
+        most = max(available)
+        if flush or most - frames > self._stall_frames:
+            frames = most
+        frames = min(frames, len(self._mix))
+        if frames == 0:
+            return False
+
+        mix = self._mix[:frames]
+        mix.fill(0)
+        for i, source in enumerate(self.sources):
+            block = self._block[:min(frames, available[i])]
+            read = source.ring.read_into(block)
+            self._debt[i] += frames - read
+            if read:
+                np.multiply(block, np.float32(source.gain), out=block)
+                np.add(mix[:read], block, out=mix[:read])
+
+        self._soft_clip(mix, self._excess[:frames])
+        if self.meter is not None:
+            self.meter.process(mix)
+        try:
+            self.sink.writeframes(self.converter.convert(mix))
+            self.written_frames += frames
+        except Exception as e:
+            print(f"Error al escribir audio: {str(e)}")
+        return True
+
+    def _soft_clip(self, mix, excess):
+        """Por encima de ``knee`` comprime con tanh hacia 1.0 en lugar de recortar."""
+        np.abs(mix, out=excess)
+        np.subtract(excess, self.knee, out=excess)
+        np.maximum(excess, 0, out=excess)
+        clipped = int(np.count_nonzero(excess))
+        if not clipped:
+            return
+        self.soft_clipped_samples += clipped
+        np.divide(excess, self._curve_scale, out=excess)
+        np.tanh(excess, out=excess)
+        np.multiply(excess, self._curve_scale, out=excess)
+        np.copysign(excess, mix, out=excess)
+        np.clip(mix, -self.knee, self.knee, out=mix)
+        np.add(mix, excess, out=mix)
+
+    def stop(self):
+        """Mezcla lo pendiente y espera a que el thread termine."""
+        self._stop_event.set()
+        self.join()
+
+    def stats(self):
+        return {
+            'written_frames': self.written_frames,
+            'underruns': self.underruns,
+            'soft_clipped_samples': self.soft_clipped_samples,
+            'loudness': self.meter.stats() if self.meter is not None else None
+        }
@@ -0,0 +1,133 @@
+"""Bucle de captura de pantalla independiente de Qt."""
+import mss
+import numpy as np
+import time
+from ..config.settings import (
+    VIDEO_FPS,
+    CURSOR_ONLY_MAX_FRAMES,
+    ADAPTIVE_CAPTURE,
+    IDLE_CAPTURE_FPS,
+    IDLE_AFTER_STATIC_GRABS
+)
+from .frame_buffer import FrameRingBuffer
+from .compositor import FrameCompositor
+from .cursor import CursorLayer
+from .damage import SampledChangeDetector
+from ..utils.timing import FramePacer
+
+class ScreenCapture:
+    """Bucle de captura: grab con mss, detección de cambios, cursor y anillo de frames.
+
+    No depende de Qt, así que corre igual en un ``QThread``
+    (``ScreenCaptureThread``) o en un thread del worker de captura.
+    ``on_frame`` recibe la secuencia de cada frame publicado, desde el thread
+    de captura.
+    """
+
+    def __init__(self, monitor, region=None, tracker=None, on_frame=None):
+        self.monitor = monitor
+        # Rectángulo capturado: el monitor completo o una región dentro de él
+        # (ver ``make_region``); los frames tienen el tamaño de la región
+        self.region = dict(region or monitor)
+        self.tracker = tracker  # WindowTracker opcional que desplaza la región con una ventana
+        self.running = True
+        width, height = self.region['width'], self.region['height']
+        # Los frames BGRA se escriben en slots preasignados; los lectores usan referencias
+        self.ring = FrameRingBuffer(width, height)
+        self.compositor = FrameCompositor(self.ring)
+        self.frame_callback = None  # Consumidor de FrameRef (p.ej. el encoder), llamado desde este thread
+        self.on_frame = on_frame
+        self.change_detector = SampledChangeDetector(width, height)
+        self.cursor_only_frames = 0  # Frames generados sin recapturar la pantalla
+        # Captura adaptativa: en reposo solo se captura a IDLE_CAPTURE_FPS
+        self.adaptive = ADAPTIVE_CAPTURE
+        self.idle = False
+        self.idle_ticks = 0  # Intervalos omitidos por estar en reposo
+        self.pacer = FramePacer(VIDEO_FPS)
+
+    def run(self):
+        # Región de captura construida una sola vez (el tracker solo mueve left/top)
+        region = self.region
+        shape = (region['height'], region['width'], 4)
+        cursor_layer = CursorLayer()
+        frames_since_grab = 0
+        static_grabs = 0
+        last_grab_time = 0.0
+        idle_interval = 1.0 / IDLE_CAPTURE_FPS
+
+        with mss.mss() as sct:
+            self.pacer.start()
+
+            while self.running:
+                try:
+                    # Esperar al deadline absoluto del próximo frame
+                    self.pacer.wait()
+
+                    # Una ventana seguida que se movió obliga a recapturar en la nueva posición
+                    moved = self.tracker is not None and self.tracker.follow(region)
+
+                    # Cursor: sprite en caché, solo se consulta la posición
+                    sprite, cursor_x, cursor_y = cursor_layer.poll()
+                    cursor_x -= region['left']
+                    cursor_y -= region['top']
+                    other_input = cursor_layer.other_input()
+
+                    # El cursor y la entrada se consultan a tasa completa: cualquier
+                    # actividad sale del reposo en el mismo intervalo
+                    if cursor_layer.moved or other_input or moved:
+                        self.idle = False
+                        static_grabs = 0
+                    elif self.idle and time.perf_counter() - last_grab_time < idle_interval:
+                        # Sin frame nuevo: el muxer repite el anterior
+                        self.idle_ticks += 1
+                        continue
+
+                    # Con la pantalla estática y sin clics ni teclado, basta con
+                    # recomponer el cursor sobre la última captura (en reposo se
+                    # recaptura para detectar cambios de contenido)
+                    cursor_only = (
+                        not self.idle
+                        and self.change_detector.static
+                        and frames_since_grab < CURSOR_ONLY_MAX_FRAMES
+                        and not other_input
+                        and not moved
+                    )
+
+                    if cursor_only:
+                        result = self.compositor.update_cursor(sprite, cursor_x, cursor_y)
+                        frames_since_grab += 1
+                        self.cursor_only_frames += 1
+                    else:
+                        # Capturar pantalla (vista sin copia del buffer de mss)
+                        screenshot = sct.grab(region)
+                        pixels = np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(shape)
+                        static_grabs = static_grabs + 1 if self.change_detector.update(pixels) else 0
+                        self.idle = self.adaptive and static_grabs >= IDLE_AFTER_STATIC_GRABS
+                        last_grab_time = time.perf_counter()
+                        frames_since_grab = 0
+
+                        # Copiar al anillo y superponer el cursor sin asignar memoria
+                        result = self.compositor.process(pixels, sprite, cursor_x, cursor_y)
+                    if result is None:
+                        continue  # Todos los slots en uso: se pierde este frame
+                    index, seq = result
+
+                    # Entregar una referencia al encoder sin pasar por la GUI
+                    frame_callback = self.frame_callback
+                    if frame_callback is not None:
+                        ref = self.ring.acquire(index)
+                        if ref is not None and not frame_callback(ref):
+                            ref.release()
+                    
+                    # Avisar que hay un frame nuevo (solo la secuencia)
+                    if self.on_frame is not None:
+                        self.on_frame(seq)
+                    
+                except Exception as e:
+                    print(f"Error en captura: {str(e)}")
+
+        self.pacer.stop()
+
+    def stop(self):
+        """Pide terminar el bucle; ``run`` sale al completar el intervalo en curso."""
+        self.running = False 
\ No newline at end of file
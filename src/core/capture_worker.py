@@ -0,0 +1,344 @@
+"""Captura, codificación y audio en un proceso worker separado de la GUI.
+
+La GUI controla el worker con mensajes por dos ``Pipe`` unidireccionales
+(comandos hacia el worker; respuestas y eventos hacia la GUI) y recibe el
+preview por un ``SharedPreviewRing``. Los píxeles capturados nunca pasan por
+el proceso de la GUI, así que la carga de Qt no compite por el GIL con la
+captura ni con el encoder.
+
+Si la GUI se cae, el pipe de comandos se cierra: el worker detiene la
+grabación, termina de escribir y finalizar los archivos y recién entonces sale.
+"""
+import asyncio
+import multiprocessing
+import queue
+import threading
+import time
+from functools import partial
+import cv2
+from .frame_buffer import SharedPreviewRing
+from ..config.settings import PREVIEW_FPS, PREVIEW_SCALE, AUDIO_METER_RATE, WORKER_REPLY_TIMEOUT
+from ..utils.video_utils import preview_size
+
+EVENT_QUEUE_SIZE = 64  # Mensajes pendientes hacia la GUI antes de descartar estados
+
+class PreviewPublisher(threading.Thread):
+    """Copia el último frame capturado, reducido, al anillo compartido a ``PREVIEW_FPS``.
+
+    Corre en su propio thread para que la reducción no se sume al tiempo
+    del bucle de captura. Mientras la ventana de la GUI no está visible queda
+    en pausa esperando ``active``, sin reducir frames.
+    """
+
+    def __init__(self, capture, ring, fps=PREVIEW_FPS):
+        super().__init__(name="PreviewPublisher", daemon=True)
+        self.reader = capture.ring.reader()
+        self.ring = ring
+        self.interval = 1.0 / fps
+        self.running = True
+        self.published = 0
+        self.active = threading.Event()
+        self.active.set()
+
+    def run(self):
+        size = (self.ring.width, self.ring.height)
+        while self.running:
+            self.active.wait()
+            time.sleep(self.interval)
+            ref = self.reader.acquire_latest()
+            if ref is None:
+                continue
+            try:
+                index, slot = self.ring.begin_write()
+                cv2.resize(ref.array, size, dst=slot, interpolation=cv2.INTER_AREA)
+                self.ring.publish(index)
+                self.published += 1
+            except Exception as e:
+                print(f"Error al publicar preview: {str(e)}")
+            finally:
+                ref.release()
+
+    def pause(self):
+        self.active.clear()
+
+    def resume(self):
+        self.active.set()
+
+    def stop(self):
+        self.running = False
+        self.active.set()
+        self.join(timeout=1.0)
+
+class WorkerSession:
+    """Estado del proceso worker: capturas, anillo de preview y un ``RecordingManager`` local."""
+
+    def __init__(self, commands, events, output_dir):
+        from .recording_manager import RecordingManager
+        self.commands = commands
+        self.events = events
+        self.manager = RecordingManager(output_dir)
+        self.manager.progress_callback = lambda final, event: self.send(('progress', final, event))
+        self.captures = []  # (ScreenCapture, thread); la primera alimenta el preview
+        self.preview_ring = None
+        self.preview_publisher = None
+        self.preview_paused = False  # La ventana de la GUI está minimizada u oculta
+        self._outbox = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self._sender = threading.Thread(target=self._send_loop, name="WorkerEvents", daemon=True)
+        self._sender.start()
+
+    def send(self, message, droppable=False):
+        """Encola un mensaje hacia la GUI. Los estados periódicos se descartan si la GUI no los lee."""
+        if droppable:
+            try:
+                self._outbox.put_nowait(message)
+            except queue.Full:
+                pass
+        else:
+            self._outbox.put(message)
+
+    def _send_loop(self):
+        # Un thread aparte: una GUI colgada no bloquea el loop del worker
+        while True:
+            message = self._outbox.get()
+            if message is None:
+                return
+            try:
+                self.events.send(message)
+            except (OSError, EOFError):
+                pass  # La GUI ya no está; se siguen descartando mensajes
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        status = asyncio.ensure_future(self._publish_status())
+        try:
+            while True:
+                try:
+                    message = await loop.run_in_executor(None, self.commands.recv)
+                except (EOFError, OSError):
+                    print("La GUI se desconectó: cerrando la grabación")
+                    await self.shutdown()
+                    return
+                seq, command, args = message[0], message[1], message[2:]
+                try:
+                    result = await getattr(self, f"cmd_{command}")(*args)
+                    self.send(('reply', seq, result))
+                except Exception as e:
+                    print(f"Error en comando {command} del worker: {str(e)}")
+                    self.send(('error', seq, str(e)))
+                if command == 'shutdown':
+                    return
+        finally:
+            status.cancel()
+            self.send(None)
+            self._sender.join(timeout=1.0)
+
+    async def _publish_status(self):
+        """Envía niveles de audio y estado de la sesión a ``AUDIO_METER_RATE``."""
+        while True:
+            await asyncio.sleep(1.0 / AUDIO_METER_RATE)
+            self.send(('status', {
+                'recording': self.manager.is_recording,
+                'finalizing': len(self.manager.finalize_tasks),
+                'levels': self.manager.get_audio_levels(),
+                'audio': self.manager.get_audio_stats(),
+                'encoder': [self.manager.get_encoder_stats(i) for i in range(len(self.manager.pipelines))]
+            }), droppable=True)
+
+    def _start_capture(self, monitor, region=None, tracker=None):
+        from .capture_loop import ScreenCapture
+        capture = ScreenCapture(monitor, region, tracker)
+        thread = threading.Thread(target=capture.run, name="ScreenCapture", daemon=True)
+        thread.start()
+        self.captures.append((capture, thread))
+        return capture
+
+    def _stop_captures(self, start=0):
+        for capture, thread in self.captures[start:]:
+            capture.frame_callback = None
+            capture.stop()
+            thread.join(timeout=2.0)
+        del self.captures[start:]
+
+    def _close_preview(self):
+        if self.preview_publisher is not None:
+            self.preview_publisher.stop()
+            self.preview_publisher = None
+        if self.preview_ring is not None:
+            self.preview_ring.close()
+            self.preview_ring = None
+
+    async def cmd_start_capture(self, monitor, region=None, tracker=None, max_size=None):
+        """(Re)inicia la captura del área del preview; retorna el nombre del anillo compartido.
+
+        Con ``max_size`` (ancho, alto del widget de preview) los frames del
+        anillo ya salen del tamaño en que se muestran y la GUI no los reduce.
+        """
+        if self.manager.is_recording:
+            raise RuntimeError("No se puede cambiar el área durante la grabación")
+        self._close_preview()
+        self._stop_captures()
+        capture = self._start_capture(monitor, region, tracker)
+        width, height = preview_size(capture.region['width'], capture.region['height'], PREVIEW_SCALE,
+                                     *(max_size or ()))
+        self.preview_ring = SharedPreviewRing.create(width, height)
+        self.preview_publisher = PreviewPublisher(capture, self.preview_ring)
+        if self.preview_paused:
+            self.preview_publisher.pause()
+        self.preview_publisher.start()
+        return self.preview_ring.name
+
+    async def cmd_preview_pause(self):
+        """Deja de reducir frames para el preview (ventana minimizada u oculta)."""
+        self.preview_paused = True
+        if self.preview_publisher is not None:
+            self.preview_publisher.pause()
+
+    async def cmd_preview_resume(self):
+        self.preview_paused = False
+        if self.preview_publisher is not None:
+            self.preview_publisher.resume()
+
+    async def cmd_start_recording(self, areas, selected_speakers, selected_mics):
+        """Graba ``areas``: la primera debe ser la del preview; las demás se capturan completas.
+
+        De la primera se usa la región viva de la captura: con una ventana
+        seguida su posición puede haber cambiado, así que solo se valida el tamaño.
+        """
+        if not self.captures:
+            raise RuntimeError("No hay captura activa")
+        preview_region = self.captures[0][0].region
+        if (areas[0]['width'], areas[0]['height']) != (preview_region['width'], preview_region['height']):
+            raise ValueError(
+                f"El área {areas[0]['width']}x{areas[0]['height']} no es la del preview "
+                f"({preview_region['width']}x{preview_region['height']})"
+            )
+        areas = [preview_region] + list(areas[1:])
+        if not await self.manager.start_recording(areas, selected_speakers, selected_mics):
+            return False
+        self.captures[0][0].frame_callback = self.manager.write_frame
+        self.manager.attach_pacer(self.captures[0][0].pacer)
+        for index, area in enumerate(areas[1:], start=1):
+            capture = self._start_capture(area)
+            capture.frame_callback = partial(self.manager.write_frame, index=index)
+            self.manager.attach_pacer(capture.pacer, index)
+        return True
+
+    async def cmd_stop_recording(self):
+        if self.captures:
+            self.captures[0][0].frame_callback = None
+        self._stop_captures(start=1)
+        return await self.manager.stop_recording()
+
+    async def cmd_cancel_finalize(self):
+        self.manager.cancel_finalize()
+
+    async def cmd_shutdown(self):
+        await self.shutdown()
+
+    async def shutdown(self):
+        """Detiene todo y espera a que terminen las finalizaciones pendientes."""
+        if self.manager.is_recording:
+            await self.cmd_stop_recording()
+        self._close_preview()
+        self._stop_captures()
+        await self.manager.wait_finalize()
+        self.manager.cleanup()
+
+def run_worker(commands, events, output_dir):
+    """Punto de entrada del proceso worker."""
+    session = WorkerSession(commands, events, output_dir)
+    asyncio.run(session.serve())
+
+class CaptureWorker:
+    """Lado GUI del worker: lanza el proceso, envía comandos y recibe respuestas y eventos.
+
+    El proceso no es daemon: si la GUI termina, el worker sigue hasta cerrar
+    y finalizar la grabación en curso. ``on_event`` recibe los eventos que
+    no son respuestas (progreso de finalización) desde el thread lector.
+
+    Cada comando lleva un número de secuencia que el worker devuelve en la
+    respuesta: la respuesta tardía de un comando que expiró se descarta en
+    lugar de tomarse como la del siguiente.
+    """
+
+    def __init__(self, output_dir, on_event=None):
+        # 'spawn' en todas las plataformas: el worker no hereda el estado de Qt
+        context = multiprocessing.get_context('spawn')
+        command_reader, self._commands = context.Pipe(duplex=False)
+        self._events, event_writer = context.Pipe(duplex=False)
+        self.process = context.Process(
+            target=run_worker, args=(command_reader, event_writer, output_dir),
+            name="CaptureWorker", daemon=False
+        )
+        self.process.start()
+        # Los extremos del worker solo deben quedar abiertos en el worker
+        command_reader.close()
+        event_writer.close()
+
+        self.on_event = on_event
+        self.status = {}  # Último estado periódico del worker
+        self._replies = queue.Queue()
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._closed = False  # El worker cerró su extremo del pipe
+        self._reader = threading.Thread(target=self._read_events, name="CaptureWorkerEvents", daemon=True)
+        self._reader.start()
+
+    def _read_events(self):
+        while True:
+            try:
+                message = self._events.recv()
+            except (EOFError, OSError):
+                self._closed = True
+                self._replies.put(('error', None, "El worker de captura terminó"))
+                return
+            kind = message[0]
+            if kind in ('reply', 'error'):
+                self._replies.put(message)
+            elif kind == 'status':
+                self.status = message[1]
+            elif self.on_event is not None:
+                self.on_event(message)
+
+    def request(self, command, *args, timeout=WORKER_REPLY_TIMEOUT):
+        """Envía un comando y espera su respuesta (bloqueante). Lanza ``RuntimeError`` si falla.
+
+        Con ``timeout=None`` espera hasta que el worker responda o termine.
+        """
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            try:
+                self._commands.send((seq, command) + args)
+            except (OSError, EOFError):
+                raise RuntimeError("El worker de captura terminó")
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                if self._closed and self._replies.empty():
+                    raise RuntimeError("El worker de captura terminó")
+                wait = 1.0 if deadline is None else min(1.0, deadline - time.monotonic())
+                if wait <= 0:
+                    raise RuntimeError(f"El worker no respondió a {command}")
+                try:
+                    kind, reply_seq, value = self._replies.get(timeout=wait)
+                except queue.Empty:
+                    continue
+                # None: el worker terminó antes de responder
+                if reply_seq == seq or reply_seq is None:
+                    break
+        if kind == 'error':
+            raise RuntimeError(value)
+        return value
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def shutdown(self):
+        """Pide al worker que cierre todo. No espera: las finalizaciones siguen en su proceso."""
+        try:
+            with self._lock:
+                self._seq += 1
+                self._commands.send((self._seq, 'shutdown'))
+        except (OSError, EOFError):
+            pass
+        self._commands.close()
@@ -0,0 +1,135 @@
+"""Composición de frames sin asignaciones por frame: copia al anillo y mezcla del cursor."""
+import numpy as np
+
+class CursorSprite:
+    """Cursor rasterizado con color premultiplicado por alpha, listo para componer."""
+
+    def __init__(self, premultiplied, alpha):
+        # Se guardan en uint16 para mezclar sin conversiones por frame
+        self.height, self.width = alpha.shape[:2]
+        self.color = premultiplied[..., :3].astype(np.uint16)
+        self.inv_alpha = (255 - alpha.astype(np.uint16)).reshape(self.height, self.width, 1)
+
+    @classmethod
+    def from_bgra(cls, bgra):
+        """Crea un sprite a partir de una imagen BGRA con alpha sin premultiplicar."""
+        alpha = bgra[..., 3:4].astype(np.uint16)
+        premultiplied = (bgra[..., :3].astype(np.uint16) * alpha + 127) // 255
+        return cls(premultiplied.astype(np.uint8), bgra[..., 3])
+
+class FrameCompositor:
+    """Escribe cada captura en un slot del anillo y superpone el cursor en el lugar.
+
+    Todos los buffers intermedios se crean en el constructor, así que tras el
+    calentamiento el procesamiento de un frame no asigna memoria en el heap.
+    La mezcla usa aritmética entera de 8 bits en punto fijo en lugar de floats.
+
+    La última captura sin cursor se conserva como frame base. Cuando solo se
+    mueve el cursor, ``update_cursor`` pide al anillo un slot que ya contenga
+    esa base (el que no esté publicado como último ni retenido por un lector)
+    y solo restaura el rectángulo del cursor anterior antes de componer el
+    nuevo; si no hay ninguno libre, copia la base completa.
+    """
+
+    def __init__(self, ring, cursor_size=64):
+        self.ring = ring
+        self.cursor_size = cursor_size
+        # Buffers planos: un prefijo se ve como (h, w, 3) contiguo para cualquier recorte
+        self._acc = np.zeros(cursor_size * cursor_size * 3, dtype=np.uint16)
+        self._tmp = np.zeros(cursor_size * cursor_size * 3, dtype=np.uint16)
+        self._c128 = np.uint16(128)
+        self._c8 = np.uint16(8)
+
+        # Frame base sin cursor y estado de cada slot respecto a esa base
+        self.base = None
+        self.base_version = 0
+        self._slot_version = [0] * ring.size
+        self._slot_rect = [None] * ring.size
+        self._base_slots = []  # Slots que contienen la base actual
+        self.rect_restores = 0  # Frames de solo cursor rearmados restaurando un rectángulo
+        self.full_restores = 0  # Frames de solo cursor que copiaron la base completa
+
+    def process(self, pixels, sprite=None, cursor_x=0, cursor_y=0):
+        """Copia ``pixels`` (BGRA) a un slot libre, compone el cursor y lo publica.
+
+        Retorna ``(index, seq)`` o None si el anillo no tenía slots libres.
+        """
+        index = self.ring.acquire_write()
+        if index is None:
+            return None
+        frame = self.ring.slots[index]
+        np.copyto(frame, pixels)
+
+        # ``pixels`` no se modifica, así que sirve como base sin copiarla
+        self.base = pixels
+        self.base_version += 1
+        self._base_slots.clear()
+        return self._finish(index, frame, sprite, cursor_x, cursor_y)
+
+    def update_cursor(self, sprite=None, cursor_x=0, cursor_y=0):
+        """Publica un frame nuevo reutilizando la base: solo se recomponen los rectángulos del cursor.
+
+        Retorna ``(index, seq)`` o None si no hay base o slots libres.
+        """
+        if self.base is None:
+            return None
+        index = self.ring.acquire_write(prefer=self._base_slots)
+        if index is None:
+            return None
+        frame = self.ring.slots[index]
+
+        if self._slot_version[index] == self.base_version:
+            # El slot ya contiene la base: borrar el cursor viejo
+            rect = self._slot_rect[index]
+            if rect is not None:
+                y0, y1, x0, x1 = rect
+                np.copyto(frame[y0:y1, x0:x1], self.base[y0:y1, x0:x1])
+            self.rect_restores += 1
+        else:
+            np.copyto(frame, self.base)
+            self.full_restores += 1
+
+        return self._finish(index, frame, sprite, cursor_x, cursor_y)
+
+    def _finish(self, index, frame, sprite, cursor_x, cursor_y):
+        rect = None
+        if sprite is not None:
+            rect = self.blend_cursor(frame, sprite, cursor_x, cursor_y)
+        self._slot_version[index] = self.base_version
+        self._slot_rect[index] = rect
+        if index not in self._base_slots:
+            self._base_slots.append(index)
+        return index, self.ring.publish(index)
+
+    def blend_cursor(self, frame, sprite, x, y):
+        """Compone un ``CursorSprite`` sobre ``frame`` en (x, y), recortando en los bordes.
+
+        Retorna el rectángulo modificado ``(y0, y1, x0, x1)`` o None.
+        """
+        height, width = frame.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1 = min(x + sprite.width, width, x0 + self.cursor_size)
+        y1 = min(y + sprite.height, height, y0 + self.cursor_size)
+        if x0 >= x1 or y0 >= y1:
+            return None
+
+        h, w = y1 - y0, x1 - x0
+        roi = frame[y0:y1, x0:x1, :3]
+        color = sprite.color[y0 - y:y1 - y, x0 - x:x1 - x]
+        inv_alpha = sprite.inv_alpha[y0 - y:y1 - y, x0 - x:x1 - x]
+        acc = self._acc[:h * w * 3].reshape(h, w, 3)
+        tmp = self._tmp[:h * w * 3].reshape(h, w, 3)
+
+        # Over premultiplicado: cursor + fondo * (255 - a) / 255
+        np.copyto(tmp, roi)
+        np.multiply(tmp, inv_alpha, out=acc)
+
+        # División exacta por 255 con redondeo: (v + 128 + ((v + 128) >> 8)) >> 8
+        np.add(acc, self._c128, out=acc)
+        np.right_shift(acc, self._c8, out=tmp)
+        np.add(acc, tmp, out=acc)
+        np.right_shift(acc, self._c8, out=acc)
+
+        np.add(acc, color, out=acc)
+        np.copyto(roi, acc, casting='unsafe')
+        return y0, y1, x0, x1
@@ -0,0 +1,124 @@
+"""Capa del cursor: sprites rasterizados una vez por forma y posición consultada por frame."""
+from collections import OrderedDict
+import numpy as np
+import win32api
+import win32con
+import win32gui
+import win32ui
+from .compositor import CursorSprite
+from ..config.settings import CURSOR_CACHE_SIZE
+
+CURSOR_SHOWING = 0x00000001
+MOUSE_BUTTONS = (win32con.VK_LBUTTON, win32con.VK_RBUTTON, win32con.VK_MBUTTON)
+
+class CursorLayer:
+    """Caché de sprites premultiplicados indexada por el handle del cursor (``hcursor``).
+
+    Rasterizar un cursor requiere DCs, bitmaps y ``DrawIconEx``; eso solo
+    ocurre cuando aparece una forma nueva. En cada frame solo se llama a
+    ``GetCursorInfo`` para obtener el handle y la posición.
+    """
+
+    def __init__(self, size=None, cache_size=CURSOR_CACHE_SIZE):
+        self.size = size or win32gui.GetSystemMetrics(win32con.SM_CXCURSOR) or 32
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # hcursor -> (sprite, hotspot_x, hotspot_y)
+        self._last_state = None
+        self._last_input_tick = 0
+        self.moved = False  # Si el cursor cambió de posición o forma en el último poll
+
+    def poll(self):
+        """Retorna ``(sprite, x, y)`` en coordenadas de pantalla, o ``(None, 0, 0)`` si no hay cursor visible."""
+        try:
+            flags, hcursor, (x, y) = win32gui.GetCursorInfo()
+        except Exception as e:
+            print(f"Error al consultar cursor: {str(e)}")
+            return None, 0, 0
+
+        state = (flags, hcursor, x, y)
+        self.moved = state != self._last_state
+        self._last_state = state
+
+        if not flags & CURSOR_SHOWING or not hcursor:
+            return None, 0, 0
+
+        entry = self._cache.get(hcursor)
+        if entry is None:
+            entry = self._rasterize(hcursor)
+            if entry is None:
+                return None, 0, 0
+            self._cache[hcursor] = entry
+            # Descartar la forma usada hace más tiempo
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(hcursor)
+
+        sprite, hotspot_x, hotspot_y = entry
+        return sprite, x - hotspot_x, y - hotspot_y
+
+    def other_input(self):
+        """True si hubo clics o teclado desde la consulta anterior.
+
+        Son entradas que pueden cambiar la pantalla sin mover el cursor, así
+        que obligan a recapturar aunque la pantalla pareciera estática.
+        """
+        try:
+            if any(win32api.GetAsyncKeyState(vk) & 0x8000 for vk in MOUSE_BUTTONS):
+                return True
+            tick = win32api.GetLastInputInfo()
+        except Exception:
+            return True
+        changed = tick != self._last_input_tick
+        self._last_input_tick = tick
+        # El movimiento del puntero también actualiza el tick; ese caso no cuenta
+        return changed and not self.moved
+
+    def invalidate(self):
+        """Vacía la caché (p.ej. si cambia el tema de cursores o el DPI)."""
+        self._cache.clear()
+
+    def _rasterize(self, hcursor):
+        """Dibuja el cursor sobre fondo negro y blanco para obtener color premultiplicado y alpha."""
+        hotspot_x = hotspot_y = 0
+        try:
+            _, hotspot_x, hotspot_y, hbm_mask, hbm_color = win32gui.GetIconInfo(hcursor)
+            for hbm in (hbm_mask, hbm_color):
+                if hbm:
+                    win32gui.DeleteObject(hbm)
+        except Exception:
+            pass
+
+        hwnd_dc = win32gui.GetDC(0)
+        hdc = win32ui.CreateDCFromHandle(hwnd_dc)
+        hdc_mem = hdc.CreateCompatibleDC()
+        hbmp = win32ui.CreateBitmap()
+        try:
+            size = self.size
+            hbmp.CreateCompatibleBitmap(hdc, size, size)
+            hdc_mem.SelectObject(hbmp)
+
+            renders = []
+            for background in (0x000000, 0xFFFFFF):
+                hdc_mem.FillSolidRect((0, 0, size, size), background)
+                win32gui.DrawIconEx(
+                    hdc_mem.GetSafeHdc(), 0, 0, hcursor, size, size, 0, None, win32con.DI_NORMAL
+                )
+                bits = hbmp.GetBitmapBits(True)
+                renders.append(np.frombuffer(bits, dtype=np.uint8).reshape(size, size, 4)[..., :3].astype(np.int16))
+
+            on_black, on_white = renders
+            # Sobre negro el resultado es color * alpha (premultiplicado); la
+            # diferencia con el fondo blanco es 255 * (1 - alpha)
+            alpha = 255 - np.clip((on_white - on_black).max(axis=2), 0, 255)
+            premultiplied = np.minimum(on_black, alpha[..., None]).astype(np.uint8)
+            return CursorSprite(premultiplied, alpha.astype(np.uint8)), hotspot_x, hotspot_y
+
+        except Exception as e:
+            print(f"Error al rasterizar cursor: {str(e)}")
+            return None
+
+        finally:
+            win32gui.DeleteObject(hbmp.GetHandle())
+            hdc_mem.DeleteDC()
+            win32gui.ReleaseDC(0, hwnd_dc)
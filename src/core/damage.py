@@ -0,0 +1,87 @@
+"""Detección de cambios entre capturas consecutivas."""
+import numpy as np
+from ..config.settings import DAMAGE_TILE_SIZE
+
+class SampledChangeDetector:
+    """Compara una muestra de filas de cada captura con la anterior.
+
+    Es una verificación barata (1/``row_stride`` del frame, sin asignaciones)
+    para saber si la pantalla quedó estática y solo se mueve el cursor.
+    """
+
+    def __init__(self, width, height, row_stride=8):
+        self.row_stride = row_stride
+        rows = (height + row_stride - 1) // row_stride
+        self._previous = np.zeros((rows, width, 4), dtype=np.uint8)
+        self._diff = np.zeros((rows, width, 4), dtype=bool)
+        self._has_previous = False
+        self.static = False
+
+    def update(self, pixels):
+        """Registra una captura nueva (sin cursor). Retorna True si no cambió respecto a la anterior."""
+        sample = pixels[::self.row_stride]
+        if self._has_previous:
+            np.not_equal(sample, self._previous, out=self._diff)
+            self.static = not self._diff.any()
+        np.copyto(self._previous, sample)
+        self._has_previous = True
+        return self.static
+
+    def reset(self):
+        self._has_previous = False
+        self.static = False
+
+class TileDamageDetector:
+    """Detecta qué tiles de tamaño fijo cambiaron comparando cada frame con una copia del anterior.
+
+    La comparación se hace por bandas de ``tile_size`` filas, en palabras de
+    64 bits (dos píxeles BGRA), sobre una máscara preasignada que entra en
+    caché. Solo las bandas con cambios se copian sobre el frame anterior, así
+    que con la pantalla estática el costo es una lectura de cada frame.
+    Cualquier diferencia de un byte marca su tile.
+    """
+
+    def __init__(self, width, height, tile_size=DAMAGE_TILE_SIZE):
+        self.tile_size = tile_size
+        # Palabras de dos píxeles solo si ningún tile queda partido en una palabra
+        pixels_per_word = 2 if width % 2 == 0 and tile_size % 2 == 0 else 1
+        self._dtype = np.uint64 if pixels_per_word == 2 else np.uint32
+        words = width // pixels_per_word
+        self._row_starts = range(0, height, tile_size)
+        self._col_starts = np.arange(0, words, tile_size // pixels_per_word)
+        tiles_y, tiles_x = len(self._row_starts), len(self._col_starts)
+        self.tile_count = tiles_y * tiles_x
+
+        self._previous = np.zeros((height, words), dtype=self._dtype)
+        self._diff = np.zeros((tile_size, words), dtype=bool)
+        self._column_diff = np.zeros(words, dtype=bool)
+        self.changed = np.ones((tiles_y, tiles_x), dtype=bool)  # Máscara de tiles cambiados
+        self._has_previous = False
+        self.ratio = 1.0
+
+    def update(self, pixels):
+        """Registra un frame BGRA y retorna la fracción de tiles que cambiaron (0.0 = duplicado)."""
+        height = pixels.shape[0]
+        words = pixels.reshape(height, -1).view(self._dtype)
+        if not self._has_previous:
+            np.copyto(self._previous, words)
+            self.changed.fill(True)
+            self._has_previous = True
+            self.ratio = 1.0
+            return self.ratio
+
+        for band, top in enumerate(self._row_starts):
+            current = words[top:top + self.tile_size]
+            previous = self._previous[top:top + self.tile_size]
+            diff = self._diff[:len(current)]
+            np.not_equal(current, previous, out=diff)
+            np.logical_or.reduce(diff, axis=0, out=self._column_diff)
+            np.logical_or.reduceat(self._column_diff, self._col_starts, out=self.changed[band])
+            if self.changed[band].any():
+                np.copyto(previous, current)
+        self.ratio = int(np.count_nonzero(self.changed)) / self.tile_count
+        return self.ratio
+
+    def reset(self):
+        self._has_previous = False
+        self.ratio = 1.0
@@ -0,0 +1,241 @@
+"""Encoder de video en un thread dedicado alimentado por una cola acotada."""
+import queue
+import threading
+import time
+import cv2
+from .damage import TileDamageDetector
+from ..config.settings import (
+    VIDEO_FPS,
+    ENCODER_QUEUE_SIZE,
+    ENCODER_OVERFLOW_POLICY,
+    DAMAGE_DETECTION,
+    VFR_MAX_GAP
+)
+
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'drop_newest')
+
+def _release(frame):
+    """Libera el slot del anillo si el frame es una referencia."""
+    release = getattr(frame, 'release', None)
+    if release is not None:
+        release()
+
+class FrameEncoderThread(threading.Thread):
+    """Consume frames de una cola acotada y los escribe fuera del thread de la GUI.
+
+    Acepta arrays o referencias ``FrameRef`` del anillo de captura; en este
+    caso el encoder se encarga de liberar el slot una vez escrito o descartado.
+
+    Antes de escribir, un ``TileDamageDetector`` marca como duplicados los
+    frames sin tiles cambiados. Si el writer acepta timestamps, los duplicados
+    no se codifican (salida VFR) salvo uno cada ``VFR_MAX_GAP`` segundos y el
+    último de la grabación, para que el video cubra toda la duración. Con
+    writers de cadencia fija el duplicado se escribe sin volver a convertirlo.
+
+    Los timestamps se miden desde ``clock`` (el reloj de sesión compartido con
+    el audio) o, sin él, desde el primer frame. Con cadencia fija cada frame
+    ocupa el slot ``round(pts * fps)``: los slots vacíos (captura en reposo,
+    frames descartados) se rellenan repitiendo el último frame y los frames
+    que caen en un slot ya escrito se descartan.
+    """
+
+    def __init__(self, writer, fps=VIDEO_FPS, max_queue=ENCODER_QUEUE_SIZE,
+                 overflow_policy=ENCODER_OVERFLOW_POLICY, damage_detection=DAMAGE_DETECTION,
+                 clock=None):
+        super().__init__(name="FrameEncoder", daemon=True)
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Política de desborde desconocida: {overflow_policy}")
+        self.writer = writer
+        self.overflow_policy = overflow_policy
+        self.frame_interval = 1.0 / fps
+        self.queue = queue.Queue(maxsize=max_queue)
+        self._bgr_buffer = None
+        # ffmpeg acepta BGRA directamente; cv2.VideoWriter necesita BGR
+        self._needs_bgr = not getattr(writer, 'accepts_bgra', False)
+        self._timestamped = getattr(writer, 'accepts_timestamps', False)
+
+        # Detección de frames duplicados
+        self.damage_detection = damage_detection
+        self.damage = None  # TileDamageDetector, se crea con el primer frame
+        self.last_damage_ratio = 1.0  # Fracción de tiles cambiados en el último frame
+        self._start_time = clock.start_time if clock is not None else None
+        self._last_pts = None
+        self._held = None  # Último duplicado omitido: (frame, pts)
+
+        # Contadores
+        self.submitted_frames = 0
+        self.encoded_frames = 0
+        self.dropped_frames = 0
+        self.late_frames = 0
+        self.duplicate_frames = 0
+        self.sync_dropped_frames = 0  # Descartados por caer en un slot ya escrito
+        self.sync_duplicated_frames = 0  # Repetidos para rellenar slots vacíos
+
+    def submit(self, frame):
+        """Encola un frame según la política de desborde. Retorna False si se descartó."""
+        item = (frame, time.perf_counter())
+        self.submitted_frames += 1
+
+        if self.overflow_policy == 'block':
+            self.queue.put(item)
+            return True
+
+        if self.overflow_policy == 'drop_newest':
+            try:
+                self.queue.put_nowait(item)
+                return True
+            except queue.Full:
+                self.dropped_frames += 1
+                return False
+
+        # drop_oldest: descartar el frame más antiguo hasta que haya espacio
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return True
+            except queue.Full:
+                try:
+                    oldest, _ = self.queue.get_nowait()
+                    _release(oldest)
+                    self.dropped_frames += 1
+                except queue.Empty:
+                    pass
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+
+            frame, submitted_at = item
+            held = False
+            try:
+                held = self._encode(frame, getattr(frame, 'timestamp', submitted_at))
+            except Exception as e:
+                print(f"Error al codificar frame: {str(e)}")
+            finally:
+                if not held:
+                    _release(frame)
+
+            # Un frame es tardío si tardó más de un intervalo en ser codificado
+            if time.perf_counter() - submitted_at > self.frame_interval:
+                self.late_frames += 1
+
+        # Escribir el último duplicado para que el video dure hasta el final
+        if self._held is not None:
+            frame, pts = self._held
+            self._held = None
+            try:
+                self._write(getattr(frame, 'array', frame), pts)
+            except Exception as e:
+                print(f"Error al codificar frame: {str(e)}")
+            finally:
+                _release(frame)
+
+    def _encode(self, frame, timestamp):
+        """Escribe u omite un frame. Retorna True si quedó retenido como duplicado."""
+        image = getattr(frame, 'array', frame)
+        if self._start_time is None:
+            self._start_time = timestamp
+        # El primer frame se muestra desde el inicio de la sesión
+        pts = timestamp - self._start_time if self._last_pts is not None else 0.0
+
+        # Sincronía: un frame que no avanza al menos un slot (cadencia fija) o
+        # un milisegundo (timestamps) respecto al último escrito se descarta
+        if self._last_pts is not None:
+            if self._timestamped:
+                stale = pts - self._last_pts < 0.001
+            else:
+                stale = self._slot(pts) <= self._slot(self._last_pts)
+            if stale:
+                self.sync_dropped_frames += 1
+                return False
+
+        duplicate = False
+        if self.damage_detection and image.ndim == 3 and image.shape[-1] == 4:
+            if self.damage is None:
+                self.damage = TileDamageDetector(image.shape[1], image.shape[0])
+            self.last_damage_ratio = self.damage.update(image)
+            duplicate = self.last_damage_ratio == 0.0 and self._last_pts is not None
+
+        if duplicate:
+            self.duplicate_frames += 1
+            if not self._timestamped:
+                # Cadencia fija: repetir el último frame ya convertido
+                self._fill_gap(pts)
+                self.writer.write(self._bgr_buffer if self._needs_bgr else image)
+                self.encoded_frames += 1
+                self._last_pts = self._slot(pts) * self.frame_interval
+                return False
+            if pts - self._last_pts < VFR_MAX_GAP:
+                self._hold(frame, pts)
+                return True
+
+        self._write(image, pts)
+        self._hold(None, None)
+        return False
+
+    def _write(self, image, pts):
+        if self._timestamped:
+            self.writer.write(self._to_bgr(image) if self._needs_bgr else image, pts)
+            self._last_pts = pts
+        else:
+            self._fill_gap(pts)
+            self.writer.write(self._to_bgr(image) if self._needs_bgr else image)
+            self._last_pts = self._slot(pts) * self.frame_interval
+        self.encoded_frames += 1
+
+    def _slot(self, pts):
+        """Índice del frame de cadencia fija que corresponde a ``pts``."""
+        return int(round(pts / self.frame_interval))
+
+    def _fill_gap(self, pts):
+        """Repite el último frame escrito en los slots vacíos anteriores a ``pts``."""
+        if self._last_pts is None or self._bgr_buffer is None:
+            return
+        missing = self._slot(pts) - self._slot(self._last_pts) - 1
+        for _ in range(missing):
+            self.writer.write(self._bgr_buffer)
+            self.encoded_frames += 1
+            self.sync_duplicated_frames += 1
+
+    def _hold(self, frame, pts):
+        """Reemplaza el duplicado retenido, liberando el anterior."""
+        if self._held is not None:
+            _release(self._held[0])
+        self._held = (frame, pts) if frame is not None else None
+
+    def _to_bgr(self, frame):
+        """Convierte BGRA a BGR reutilizando el buffer de salida."""
+        if frame.ndim != 3 or frame.shape[-1] != 4:
+            return frame
+        if self._bgr_buffer is None or self._bgr_buffer.shape[:2] != frame.shape[:2]:
+            self._bgr_buffer = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+            return self._bgr_buffer
+        return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR, dst=self._bgr_buffer)
+
+    def stop(self):
+        """Vacía la cola pendiente y espera a que el thread termine."""
+        self.queue.put(None)
+        self.join()
+
+    def duration(self):
+        """Duración en segundos del video escrito."""
+        if self._timestamped:
+            return (self._last_pts or 0.0) + self.frame_interval if self.encoded_frames else 0.0
+        return self.encoded_frames * self.frame_interval
+
+    def stats(self):
+        """Retorna los contadores del encoder."""
+        return {
+            'submitted': self.submitted_frames,
+            'encoded': self.encoded_frames,
+            'dropped': self.dropped_frames,
+            'late': self.late_frames,
+            'duplicates': self.duplicate_frames,
+            'sync_dropped': self.sync_dropped_frames,
+            'sync_duplicated': self.sync_duplicated_frames,
+            'damage_ratio': self.last_damage_ratio,
+            'duration': self.duration(),
+            'queued': self.queue.qsize()
+        }
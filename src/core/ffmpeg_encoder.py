@@ -0,0 +1,292 @@
+"""Encoder de un solo paso: frames crudos por stdin a un proceso ffmpeg con audio multiplexado en vivo."""
+import os
+import subprocess
+import tempfile
+import threading
+import uuid
+from ..config.settings import (
+    FFMPEG_PATH,
+    FFMPEG_VIDEO_CODEC,
+    FFMPEG_PRESET,
+    FFMPEG_CRF,
+    VIDEO_FRAME_RATE_MODE,
+    TEMP_DIR
+)
+from ..utils.mkv_stream import MatroskaFrameStream
+
+if os.name == 'nt':
+    import win32file
+    import win32pipe
+
+PIPE_BUFFER_SIZE = 1 << 20
+
+# FourCC de Matroska para cada formato de píxel crudo aceptado por ffmpeg
+RAW_FOURCC = {
+    'bgra': b'BGRA',
+    'bgr24': b'BGR\x18',
+}
+
+class AudioPipe:
+    """Named pipe por el que se envía PCM crudo a ffmpeg mientras se graba.
+
+    Expone ``writeframes``/``close`` igual que ``wave.Wave_write`` para poder
+    usarse como destino de los callbacks de audio. Los datos que llegan antes
+    de que ffmpeg abra el pipe se guardan en memoria y se envían al conectar.
+    """
+
+    def __init__(self, name, sample_rate, channels, sample_format='s16le', title=None):
+        self.name = name
+        self.title = title  # Nombre de la pista en el contenedor (p.ej. el dispositivo)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_format = sample_format
+        self.path = None
+        self._handle = None
+        self._pending = []
+        self._connected = False
+        self._closed = False
+        self._lock = threading.Lock()
+        self._connect_thread = None
+
+    def input_args(self):
+        """Argumentos de entrada de ffmpeg para leer este pipe."""
+        return [
+            '-f', self.sample_format,
+            '-ar', str(self.sample_rate),
+            '-ac', str(self.channels),
+            '-thread_queue_size', '1024',
+            # Sin esto ffmpeg analiza varios segundos de audio en vivo antes de arrancar
+            '-probesize', '32',
+            '-analyzeduration', '0',
+            '-i', self.path
+        ]
+
+    def start(self):
+        """Crea el pipe y espera en segundo plano a que ffmpeg lo abra."""
+        unique = f"screenrec_{self.name}_{uuid.uuid4().hex[:8]}"
+        if os.name == 'nt':
+            self.path = rf"\\.\pipe\{unique}"
+            self._handle = win32pipe.CreateNamedPipe(
+                self.path,
+                win32pipe.PIPE_ACCESS_OUTBOUND,
+                win32pipe.PIPE_TYPE_BYTE | win32pipe.PIPE_WAIT,
+                1, PIPE_BUFFER_SIZE, PIPE_BUFFER_SIZE, 0, None
+            )
+        else:
+            self.path = os.path.join(tempfile.gettempdir(), unique)
+            os.mkfifo(self.path)
+
+        self._connect_thread = threading.Thread(
+            target=self._connect, name=f"AudioPipe-{self.name}", daemon=True
+        )
+        self._connect_thread.start()
+
+    def _connect(self):
+        try:
+            if os.name == 'nt':
+                win32pipe.ConnectNamedPipe(self._handle, None)
+            else:
+                self._handle = open(self.path, 'wb', buffering=0)
+        except Exception as e:
+            print(f"Error al conectar pipe de audio {self.name}: {str(e)}")
+            return
+
+        with self._lock:
+            if self._closed:
+                return
+            for data in self._pending:
+                self._write(data)
+            self._pending.clear()
+            self._connected = True
+
+    def _write(self, data):
+        if os.name == 'nt':
+            win32file.WriteFile(self._handle, data)
+        else:
+            self._handle.write(data)
+
+    def writeframes(self, data):
+        """Envía un bloque de PCM a ffmpeg."""
+        with self._lock:
+            if self._closed:
+                return
+            if not self._connected:
+                self._pending.append(bytes(data))
+                return
+            self._write(data)
+
+    def close(self):
+        """Cierra el pipe; ffmpeg lo interpreta como fin del stream de audio."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            connected = self._connected
+            self._pending.clear()
+
+        if not connected:
+            self._unblock_connect()
+        if self._connect_thread:
+            self._connect_thread.join(timeout=1.0)
+
+        try:
+            if os.name == 'nt':
+                if self._handle is not None:
+                    win32file.CloseHandle(self._handle)
+            else:
+                if self._handle is not None:
+                    self._handle.close()
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+        except Exception as e:
+            print(f"Error al cerrar pipe de audio {self.name}: {str(e)}")
+
+    def _unblock_connect(self):
+        """Despierta al thread de conexión si ffmpeg nunca abrió el pipe."""
+        try:
+            if os.name == 'nt':
+                client = win32file.CreateFile(
+                    self.path, win32file.GENERIC_READ, 0, None,
+                    win32file.OPEN_EXISTING, 0, None
+                )
+                win32file.CloseHandle(client)
+            else:
+                fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+                os.close(fd)
+        except Exception:
+            pass
+
+class FFmpegPipeWriter:
+    """Escribe frames crudos en un proceso ffmpeg de larga duración.
+
+    Implementa la misma interfaz que ``cv2.VideoWriter`` (``write``,
+    ``release``, ``isOpened``) para poder usarse desde el encoder.
+
+    Cada frame viaja envuelto en un bloque Matroska con su timestamp, así que
+    el encoder puede omitir frames duplicados y la salida queda con frame rate
+    variable (``frame_rate_mode='vfr'``) o ffmpeg los repone a ``fps``
+    (``'cfr'``).
+
+    Cada pipe de audio se guarda como su propia pista; con
+    ``AUDIO_TRACK_MODE = 'mix'`` llega un solo pipe ya mezclado por
+    ``AudioMixerThread``.
+    """
+
+    def __init__(self, output_file, width, height, fps, audio_pipes=(),
+                 pix_fmt='bgra', frame_rate_mode=VIDEO_FRAME_RATE_MODE):
+        if pix_fmt not in RAW_FOURCC:
+            raise ValueError(f"Formato de píxel no soportado: {pix_fmt}")
+        if frame_rate_mode not in ('vfr', 'cfr'):
+            raise ValueError(f"Modo de frame rate desconocido: {frame_rate_mode}")
+        self.output_file = output_file
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.audio_pipes = list(audio_pipes)
+        self.pix_fmt = pix_fmt
+        self.frame_rate_mode = frame_rate_mode
+        self.accepts_bgra = pix_fmt == 'bgra'
+        self.accepts_timestamps = True
+        self.process = None
+        self.log_file = None
+        self._stream = None
+        self._frames = 0
+
+    def build_command(self):
+        """Construye el comando ffmpeg para el encoding en vivo."""
+        cmd = [
+            FFMPEG_PATH, '-y', '-hide_banner', '-loglevel', 'error',
+            '-f', 'matroska',
+            '-thread_queue_size', '64',
+            '-probesize', '32',
+            '-analyzeduration', '0',
+            '-i', '-'
+        ]
+
+        for audio_pipe in self.audio_pipes:
+            cmd.extend(audio_pipe.input_args())
+
+        cmd.extend(['-map', '0:v'])
+        # Una pista por pipe, sin grafo de filtros
+        for i, audio_pipe in enumerate(self.audio_pipes):
+            cmd.extend(['-map', f'{i + 1}:a'])
+            if audio_pipe.title:
+                cmd.extend([f'-metadata:s:a:{i}', f'title={audio_pipe.title}'])
+
+        # yuv420p requiere dimensiones pares
+        if self.width % 2 or self.height % 2:
+            cmd.extend(['-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2'])
+
+        if self.frame_rate_mode == 'cfr':
+            cmd.extend(['-fps_mode', 'cfr', '-r', str(self.fps)])
+        else:
+            cmd.extend(['-fps_mode', 'vfr'])
+
+        cmd.extend([
+            '-c:v', FFMPEG_VIDEO_CODEC,
+            '-preset', FFMPEG_PRESET,
+            '-crf', str(FFMPEG_CRF),
+            '-pix_fmt', 'yuv420p'
+        ])
+        if self.audio_pipes:
+            cmd.extend(['-c:a', 'aac', '-b:a', '192k'])
+        cmd.append(self.output_file)
+        return cmd
+
+    def open(self):
+        """Lanza el proceso ffmpeg. Retorna True si quedó en ejecución."""
+        try:
+            log_path = os.path.join(
+                TEMP_DIR, f"{os.path.splitext(os.path.basename(self.output_file))[0]}_ffmpeg.log"
+            )
+            self.log_file = open(log_path, 'wb')
+            self.process = subprocess.Popen(
+                self.build_command(),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=self.log_file
+            )
+            self._stream = MatroskaFrameStream(
+                self.process.stdin, self.width, self.height, RAW_FOURCC[self.pix_fmt]
+            )
+            self._frames = 0
+            return self.isOpened()
+        except Exception as e:
+            print(f"Error al iniciar ffmpeg: {str(e)}")
+            self.process = None
+            return False
+
+    def isOpened(self):
+        return self.process is not None and self.process.poll() is None
+
+    def write(self, frame, pts=None):
+        """Envía un frame crudo a ffmpeg con su timestamp en segundos.
+
+        Sin ``pts`` se asume la cadencia nominal de ``fps``.
+        """
+        if pts is None:
+            pts = self._frames / self.fps
+        self._stream.write(frame, pts)
+        self._frames += 1
+
+    def release(self, timeout=30):
+        """Cierra stdin y espera a que ffmpeg termine de escribir el archivo."""
+        if self.process is None:
+            return
+        try:
+            if self.process.stdin and not self.process.stdin.closed:
+                self.process.stdin.close()
+            self.process.wait(timeout=timeout)
+            if self.process.returncode != 0:
+                print(f"ffmpeg terminó con código {self.process.returncode}")
+        except subprocess.TimeoutExpired:
+            print("ffmpeg no respondió, terminando proceso")
+            self.process.kill()
+        except Exception as e:
+            print(f"Error al cerrar ffmpeg: {str(e)}")
+        finally:
+            self.process = None
+            self._stream = None
+            if self.log_file:
+                self.log_file.close()
+                self.log_file = None
@@ -0,0 +1,215 @@
+"""Anillo de frames preasignados compartido por captura, preview y encoder."""
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from ..config.settings import BUFFER_SIZE, PREVIEW_RING_SLOTS
+
+class FrameRef:
+    """Referencia a un slot del anillo. Mientras no se libere, el slot no se sobrescribe."""
+    __slots__ = ('ring', 'index', 'seq', 'array', 'timestamp')
+
+    def __init__(self, ring, index, seq):
+        self.ring = ring
+        self.index = index
+        self.seq = seq
+        self.array = ring.slots[index]
+        self.timestamp = ring.slot_time[index]  # perf_counter() al publicarse
+
+    def release(self):
+        """Devuelve el slot al anillo."""
+        if self.ring is not None:
+            self.ring.release(self.index)
+            self.ring = None
+
+class FrameReader:
+    """Cursor de lectura sobre el anillo; recuerda la última secuencia leída."""
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.cursor = 0
+        self.skipped = 0
+
+    def acquire_latest(self):
+        """Retorna una referencia al frame más reciente no leído, o None."""
+        ref = self.ring.acquire_latest(after=self.cursor)
+        if ref is not None:
+            self.skipped += ref.seq - self.cursor - 1 if self.cursor else 0
+            self.cursor = ref.seq
+        return ref
+
+class FrameRingBuffer:
+    """Slots de frames BGRA preasignados con números de secuencia.
+
+    La captura escribe en el slot libre más antiguo y lo publica; los lectores
+    (preview y encoder) reciben vistas del mismo array sin copiarlo. Un slot
+    referenciado por algún lector nunca se reutiliza hasta que se libera.
+    """
+
+    def __init__(self, width, height, channels=4, size=BUFFER_SIZE):
+        self.width = width
+        self.height = height
+        self.size = size
+        self.slots = [np.zeros((height, width, channels), dtype=np.uint8) for _ in range(size)]
+        self.slot_seq = [0] * size
+        self.slot_time = [0.0] * size
+        self.pins = [0] * size
+        self.latest_index = -1
+        self.seq = 0
+        self.overruns = 0  # Frames perdidos porque todos los slots estaban ocupados
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def acquire_write(self, prefer=()):
+        """Reserva un slot libre para escribir. Retorna su índice o None si no hay.
+
+        Los índices de ``prefer`` se prueban antes que el orden circular: el
+        escritor los usa para reutilizar slots cuyo contenido le sirve.
+        """
+        with self._lock:
+            for index in prefer:
+                if self.pins[index] == 0 and index != self.latest_index:
+                    self.slot_seq[index] = 0
+                    return index
+            for offset in range(self.size):
+                index = (self._next + offset) % self.size
+                if self.pins[index] == 0 and index != self.latest_index:
+                    # Invalidar la secuencia anterior mientras se escribe
+                    self.slot_seq[index] = 0
+                    self._next = (index + 1) % self.size
+                    return index
+            self.overruns += 1
+            return None
+
+    def publish(self, index, timestamp=None):
+        """Publica el slot escrito como el frame más reciente y retorna su secuencia."""
+        with self._lock:
+            self.seq += 1
+            self.slot_seq[index] = self.seq
+            self.slot_time[index] = time.perf_counter() if timestamp is None else timestamp
+            self.latest_index = index
+            return self.seq
+
+    def acquire(self, index):
+        """Retorna una referencia a un slot publicado."""
+        with self._lock:
+            seq = self.slot_seq[index]
+            if seq == 0:
+                return None
+            self.pins[index] += 1
+            return FrameRef(self, index, seq)
+
+    def acquire_latest(self, after=0):
+        """Retorna una referencia al frame más reciente con secuencia mayor a ``after``."""
+        with self._lock:
+            index = self.latest_index
+            if index < 0 or self.slot_seq[index] <= after:
+                return None
+            self.pins[index] += 1
+            return FrameRef(self, index, self.slot_seq[index])
+
+    def release(self, index):
+        with self._lock:
+            self.pins[index] -= 1
+
+    def reader(self):
+        """Crea un cursor de lectura independiente."""
+        return FrameReader(self)
+
+class SharedPreviewRing:
+    """Anillo de frames de preview en ``multiprocessing.shared_memory`` (un escritor, un lector).
+
+    El worker de captura escribe frames BGRA ya reducidos y la GUI los lee
+    desde su proceso sin pasar píxeles por el canal de control. No hay locks
+    entre procesos: cada slot guarda su secuencia, que vale 0 mientras se
+    escribe, y el lector confirma con ``is_current`` que el slot no se
+    reescribió mientras lo usaba.
+
+    La cabecera (int64) guarda la última secuencia, su slot, ancho, alto,
+    cantidad de slots y la secuencia de cada slot; los frames van a continuación.
+    """
+    HEADER_FIELDS = 5
+
+    def __init__(self, shm, width, height, size, owner):
+        self.shm = shm
+        self.name = shm.name
+        self.width = width
+        self.height = height
+        self.size = size
+        self.owner = owner  # El dueño borra el segmento al cerrar
+        header_bytes = self._header_bytes(size)
+        frame_bytes = width * height * 4
+        self._header = np.ndarray(self.HEADER_FIELDS + size, dtype=np.int64, buffer=shm.buf)
+        self.slots = [
+            np.ndarray((height, width, 4), dtype=np.uint8, buffer=shm.buf,
+                       offset=header_bytes + i * frame_bytes)
+            for i in range(size)
+        ]
+        self._next = 0
+
+    @classmethod
+    def _header_bytes(cls, size):
+        return ((cls.HEADER_FIELDS + size) * 8 + 63) // 64 * 64
+
+    @classmethod
+    def create(cls, width, height, size=PREVIEW_RING_SLOTS):
+        """Crea el segmento (lado escritor)."""
+        shm = shared_memory.SharedMemory(
+            create=True, size=cls._header_bytes(size) + width * height * 4 * size
+        )
+        ring = cls(shm, width, height, size, owner=True)
+        ring._header[:] = 0
+        ring._header[2:5] = (width, height, size)
+        return ring
+
+    @classmethod
+    def attach(cls, name):
+        """Abre un segmento creado por otro proceso (lado lector).
+
+        El worker hereda el resource tracker de la GUI, así que el registro
+        que hace ``SharedMemory`` al abrir es el mismo que quita el ``unlink``
+        del dueño.
+        """
+        shm = shared_memory.SharedMemory(name=name)
+        width, height, size = (int(v) for v in np.ndarray(5, dtype=np.int64, buffer=shm.buf)[2:5])
+        return cls(shm, width, height, size, owner=False)
+
+    def begin_write(self):
+        """Reserva el próximo slot; retorna ``(índice, array)`` para escribir en él."""
+        index = self._next
+        self._next = (index + 1) % self.size
+        self._header[self.HEADER_FIELDS + index] = 0
+        return index, self.slots[index]
+
+    def publish(self, index):
+        """Publica el slot escrito como el más reciente y retorna su secuencia."""
+        seq = int(self._header[0]) + 1
+        self._header[self.HEADER_FIELDS + index] = seq
+        self._header[1] = index
+        self._header[0] = seq
+        return seq
+
+    def read_latest(self, after=0):
+        """``(seq, índice, array)`` del frame más reciente posterior a ``after``, o None."""
+        seq = int(self._header[0])
+        if seq <= after:
+            return None
+        index = int(self._header[1])
+        if int(self._header[self.HEADER_FIELDS + index]) != seq:
+            return None  # Se está reescribiendo; se lee en la próxima consulta
+        return seq, index, self.slots[index]
+
+    def is_current(self, index, seq):
+        """True si el slot todavía contiene el frame ``seq``."""
+        return int(self._header[self.HEADER_FIELDS + index]) == seq
+
+    def close(self):
+        # Las vistas de numpy deben soltarse antes de cerrar el segmento
+        self._header = None
+        self.slots = []
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except Exception as e:
+            print(f"Error al cerrar el anillo de preview: {str(e)}")
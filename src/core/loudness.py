@@ -0,0 +1,192 @@
+"""Medición de sonoridad EBU R128 (ITU-R BS.1770) en streaming, bloque a bloque."""
+import collections
+import math
+import numpy as np
+from ..config.settings import AUDIO_TARGET_LUFS, AUDIO_TRUE_PEAK_LIMIT, AUDIO_MAX_NORMALIZE_GAIN
+
+ABSOLUTE_GATE = -70.0  # LUFS
+RELATIVE_GATE = -10.0  # LU bajo la sonoridad sin compuerta relativa (integrada)
+LRA_RELATIVE_GATE = -20.0  # LU, para el rango de sonoridad (EBU Tech 3342)
+K_FILTER_SECONDS = 0.1  # Largo de la respuesta al impulso del filtro K (decae en ~60 ms)
+TRUE_PEAK_OVERSAMPLING = 4
+TRUE_PEAK_TAPS = 48
+
+def _biquad_impulse(b, a, length):
+    """Respuesta al impulso de un biquad (coeficientes normalizados con a[0] = 1)."""
+    response = np.zeros(length)
+    x1 = x2 = y1 = y2 = 0.0
+    for n in range(length):
+        x0 = 1.0 if n == 0 else 0.0
+        y0 = b[0] * x0 + b[1] * x1 + b[2] * x2 - a[1] * y1 - a[2] * y2
+        response[n] = y0
+        x2, x1 = x1, x0
+        y2, y1 = y1, y0
+    return response
+
+def k_weighting_response(sample_rate, length):
+    """Respuesta al impulso del filtro K: estante de +4 dB en agudos y pasa altos RLB.
+
+    Los biquads se calculan para ``sample_rate`` a partir de los parámetros de
+    BS.1770 (a 48 kHz reproducen los coeficientes publicados).
+    """
+    # Pre-filtro: estante alto
+    gain_db, q, fc = 3.999843853973347, 0.7071752369554196, 1681.974450955533
+    k = math.tan(math.pi * fc / sample_rate)
+    vh = 10 ** (gain_db / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = _biquad_impulse(
+        [(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0],
+        [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0],
+        length
+    )
+
+    # Pasa altos RLB
+    q, fc = 0.5003270373238773, 38.13547087602444
+    k = math.tan(math.pi * fc / sample_rate)
+    a0 = 1 + k / q + k * k
+    highpass = _biquad_impulse(
+        [1.0, -2.0, 1.0],
+        [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0],
+        length
+    )
+
+    return np.convolve(shelf, highpass)[:length]
+
+def _power_to_lufs(power):
+    return -0.691 + 10 * math.log10(power) if power > 0 else -math.inf
+
+class LoudnessMeter:
+    """Mide sonoridad integrada, rango de sonoridad y true peak de un stream.
+
+    ``process`` recibe bloques float32 ``(frames, channels)`` de cualquier
+    tamaño (lo que vacía un thread escritor en cada ciclo, fuera del callback
+    de tiempo real). El filtro K se aplica como FIR por overlap-add con FFT y
+    la energía se acumula en sub-bloques de 100 ms: cada cuatro forman un
+    bloque de compuerta de 400 ms (solapado al 75%) y cada treinta un valor
+    de corto plazo de 3 s para el rango. El true peak se estima con
+    sobremuestreo x4 polifásico.
+
+    Todos los canales pesan 1.0 (estéreo o mono en BS.1770).
+    """
+
+    def __init__(self, sample_rate, channels):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._taps = int(sample_rate * K_FILTER_SECONDS)
+        self._k_response = k_weighting_response(sample_rate, self._taps)
+        self._k_spectra = {}  # Tamaño de FFT -> espectro del filtro K
+        self._tail = np.zeros((self._taps - 1, channels))
+
+        self._sub_block = int(round(sample_rate * 0.1))
+        self._sub_sum = 0.0
+        self._sub_count = 0
+        self._recent = collections.deque(maxlen=30)  # Potencias de los últimos 3 s de sub-bloques
+        self.block_powers = []  # Bloques de 400 ms para la sonoridad integrada
+        self.short_term_powers = []  # Ventanas de 3 s para el rango de sonoridad
+
+        # True peak: filtro interpolador repartido en fases de 12 coeficientes
+        n = np.arange(TRUE_PEAK_TAPS) - (TRUE_PEAK_TAPS - 1) / 2
+        kernel = np.sinc(n / TRUE_PEAK_OVERSAMPLING) * np.kaiser(TRUE_PEAK_TAPS, 8.0)
+        self._phases = [kernel[p::TRUE_PEAK_OVERSAMPLING] for p in range(TRUE_PEAK_OVERSAMPLING)]
+        phase_taps = len(self._phases[0])
+        self._peak_history = np.zeros((phase_taps - 1, channels))
+        self.true_peak = 0.0
+        self.sample_peak = 0.0
+
+    def process(self, block):
+        frames = len(block)
+        if frames == 0:
+            return
+        block = np.asarray(block, dtype=np.float64)
+        self._update_peaks(block)
+
+        # Filtro K por overlap-add: la cola del bloque anterior se suma al inicio
+        size = 1 << (frames + self._taps - 2).bit_length()
+        spectrum = self._k_spectra.get(size)
+        if spectrum is None:
+            spectrum = np.fft.rfft(self._k_response, size)[:, None]
+            self._k_spectra[size] = spectrum
+        filtered = np.fft.irfft(np.fft.rfft(block, size, axis=0) * spectrum, size, axis=0)
+        filtered = filtered[:frames + self._taps - 1]
+        filtered[:self._taps - 1] += self._tail
+        self._tail = filtered[frames:].copy()
+
+        # Energía por frame sumada sobre canales, acumulada en sub-bloques de 100 ms
+        energy = np.einsum('ij,ij->i', filtered[:frames], filtered[:frames])
+        position = 0
+        while position < frames:
+            take = min(frames - position, self._sub_block - self._sub_count)
+            self._sub_sum += float(energy[position:position + take].sum())
+            self._sub_count += take
+            position += take
+            if self._sub_count == self._sub_block:
+                self._close_sub_block()
+
+    def _update_peaks(self, block):
+        peak = float(np.max(np.abs(block)))
+        if peak > self.sample_peak:
+            self.sample_peak = peak
+        history = np.concatenate([self._peak_history, block])
+        for channel in range(self.channels):
+            for phase in self._phases:
+                interpolated = np.convolve(history[:, channel], phase, mode='valid')
+                peak = float(np.max(np.abs(interpolated)))
+                if peak > self.true_peak:
+                    self.true_peak = peak
+        self._peak_history = history[len(history) - len(self._peak_history):]
+
+    def _close_sub_block(self):
+        self._recent.append(self._sub_sum / self._sub_block)
+        self._sub_sum = 0.0
+        self._sub_count = 0
+        if len(self._recent) >= 4:
+            self.block_powers.append(sum(list(self._recent)[-4:]) / 4)
+        if len(self._recent) == self._recent.maxlen:
+            self.short_term_powers.append(sum(self._recent) / len(self._recent))
+
+    def integrated(self):
+        """Sonoridad integrada en LUFS, o None si no hubo audio sobre la compuerta absoluta."""
+        powers = np.array(self.block_powers)
+        powers = powers[powers > 10 ** ((ABSOLUTE_GATE + 0.691) / 10)]
+        if len(powers) == 0:
+            return None
+        threshold = _power_to_lufs(powers.mean()) + RELATIVE_GATE
+        powers = powers[powers > 10 ** ((threshold + 0.691) / 10)]
+        return _power_to_lufs(powers.mean())
+
+    def loudness_range(self):
+        """Rango de sonoridad (LRA) en LU: percentil 95 menos percentil 10 del corto plazo."""
+        powers = np.array(self.short_term_powers)
+        powers = powers[powers > 10 ** ((ABSOLUTE_GATE + 0.691) / 10)]
+        if len(powers) == 0:
+            return None
+        threshold = _power_to_lufs(powers.mean()) + LRA_RELATIVE_GATE
+        powers = powers[powers > 10 ** ((threshold + 0.691) / 10)]
+        loudness = -0.691 + 10 * np.log10(powers)
+        low, high = np.percentile(loudness, [10, 95])
+        return float(high - low)
+
+    def true_peak_db(self):
+        peak = max(self.true_peak, self.sample_peak)
+        return 20 * math.log10(peak) if peak > 0 else None
+
+    def normalization_gain(self, target=AUDIO_TARGET_LUFS, peak_limit=AUDIO_TRUE_PEAK_LIMIT,
+                           max_gain=AUDIO_MAX_NORMALIZE_GAIN):
+        """Ganancia en dB para llevar la sonoridad integrada a ``target`` sin pasar ``peak_limit`` dBTP."""
+        integrated = self.integrated()
+        if integrated is None:
+            return 0.0
+        gain = min(target - integrated, max_gain)
+        peak = self.true_peak_db()
+        if peak is not None:
+            gain = min(gain, peak_limit - peak)
+        return gain
+
+    def stats(self):
+        return {
+            'integrated_lufs': self.integrated(),
+            'loudness_range_lu': self.loudness_range(),
+            'true_peak_dbtp': self.true_peak_db(),
+            'normalization_gain_db': self.normalization_gain()
+        }
@@ -1,30 +1,105 @@
 from datetime import datetime
+import asyncio
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import cv2
 import sounddevice as sd
-import wave
-import numpy as np
-from ..utils.async_utils import ProcessManager, AsyncWorker
+from ..utils.async_utils import ProcessManager
+from ..utils.video_utils import (
+    apply_audio_gains_async, combine_audio_video_async, merge_video_streams_async
+)
+from ..utils.timing import SessionClock
+from .audio_capture import AudioSource, AudioMixerThread, AudioWriterThread
+from .encoder import FrameEncoderThread
+from .capture_worker import CaptureWorker
+from .frame_buffer import SharedPreviewRing
+from .ffmpeg_encoder import AudioPipe, FFmpegPipeWriter
+from .sample_format import SAMPLE_FORMATS, open_wave
 from ..config.settings import (
     VIDEO_FPS,
     VIDEO_CODEC,
+    ENCODER_BACKEND,
+    FFMPEG_CONTAINER,
     AUDIO_CHANNELS,
+    AUDIO_FORMAT,
     AUDIO_SAMPLE_RATE,
-    AUDIO_CHUNK_SIZE
+    AUDIO_SOURCE_GAINS,
+    AUDIO_TRACK_MODE,
+    MULTI_MONITOR_OUTPUT,
+    WORKER_REPLY_TIMEOUT
 )
 
+class VideoPipeline:
+    """Writer y encoder de video de un área capturada (un monitor o una región).
+
+    Cada pipeline tiene su propio thread encoder y, con ffmpeg, su propio
+    proceso de codificación, así que varios monitores se codifican en
+    paralelo en distintos núcleos. Todas comparten el reloj de sesión: sus
+    timestamps parten del mismo instante que el audio.
+    """
+
+    def __init__(self, name, region, writer, video_file, final_file, clock):
+        self.name = name
+        self.region = region
+        self.size = (region['width'], region['height'])
+        self.writer = writer
+        self.video_file = video_file  # Temporal a combinar con el audio, o None
+        self.final_file = final_file
+        # El encoder escribe en su propio thread para no bloquear la GUI
+        self.encoder = FrameEncoderThread(writer, clock=clock)
+        self.encoder.name = f"FrameEncoder-{name}"
+        self.pacer = None  # FramePacer de la captura que alimenta el área
+
+    def start(self):
+        self.encoder.start()
+
+    def stats(self):
+        """Contadores del encoder y, si hay captura conectada, la puntualidad de su pacer."""
+        stats = self.encoder.stats()
+        if self.pacer is not None:
+            stats['pacing'] = self.pacer.stats()
+        return stats
+
+    def close(self):
+        """Vacía la cola del encoder y cierra el writer. Retorna las estadísticas del encoder."""
+        stats = None
+        if self.encoder.is_alive():
+            self.encoder.stop()
+            stats = self.stats()
+        self.writer.release()
+        return stats
+
 class RecordingManager:
+    remote = False  # La captura y el encoder corren en este proceso
+
     def __init__(self, output_dir):
         self.output_dir = output_dir
         self.process_manager = ProcessManager()
         self.is_recording = False
         self.current_recording = None
-        self.video_writer = None
-        self.audio_streams = {}
-        self.wav_files = {}
-
-    async def start_recording(self, monitor, selected_speakers, selected_mics):
-        """Inicia la grabación."""
+        self.pipelines = []  # Un VideoPipeline por área grabada; el primero lleva el audio
+        self.audio_sources = {}  # Dispositivos capturados (AudioSource)
+        self.wav_files = {}  # Destinos del audio: WAV o pipes hacia ffmpeg
+        self.audio_writers = {}  # Threads que vacían los anillos hacia cada destino
+        self.clock = SessionClock()  # Reloj común para frames y bloques de audio
+        self.finalize_tasks = {}
+        self.progress_callback = None  # Recibe (archivo_final, evento) durante la finalización
+
+    async def start_recording(self, region, selected_speakers, selected_mics):
+        """Inicia la grabación de ``region`` (un monitor completo o una región dentro de él).
+
+        El video tiene el tamaño de la región, que debe coincidir con el de
+        los frames del thread de captura. ``region`` también puede ser una
+        lista de áreas (p.ej. todos los monitores): se abre un pipeline de
+        video por área, con un archivo ``_monN`` cada uno, y el audio se
+        graba una sola vez en el primero. Con ``MULTI_MONITOR_OUTPUT =
+        'streams'`` los archivos se juntan al detener en un solo contenedor
+        con un stream de video por área. Los frames de cada área se entregan
+        con ``write_frame(frame, index)``.
+        """
+        regions = [region] if isinstance(region, dict) else list(region)
         if self.is_recording:
             return False
 
@@ -41,41 +116,56 @@ class RecordingManager:
             
             print(f"Directorio de grabación: {recording_dir}")
             print(f"Nombre base del archivo: {os.path.basename(filename_base)}")
+            for area in regions:
+                print(f"Área de captura: {area['width']}x{area['height']} en ({area['left']}, {area['top']})")
             
-            # Inicializar grabación de video
-            video_file = f"{filename_base}_temp.avi"
-            print(f"\nCreando archivo de video: {os.path.basename(video_file)}")
-            
-            self.video_writer = cv2.VideoWriter(
-                video_file,
-                cv2.VideoWriter_fourcc(*VIDEO_CODEC),
-                VIDEO_FPS,
-                (monitor['width'], monitor['height'])
-            )
-
-            if not self.video_writer.isOpened():
-                raise Exception("No se pudo crear el archivo de video")
-            print("✓ Video writer inicializado correctamente")
-
-            # Inicializar grabación de audio
-            print("\nIniciando grabación de audio...")
+            # Con ffmpeg el video y el audio se multiplexan en vivo en un solo paso
+            live_mux = ENCODER_BACKEND == 'ffmpeg'
+            self.clock.start()
+            self.audio_sources.clear()
+            self.audio_writers.clear()
             self.is_recording = True
-            
-            if selected_mics:
-                print(f"\nIniciando grabación de micrófono: {selected_mics[0]['name']}")
-                self._init_microphone(filename_base, selected_mics[0]['id'])
-                print("✓ Grabación de micrófono iniciada")
-                
-            if selected_speakers:
-                print(f"\nIniciando grabación de audio del sistema: {selected_speakers[0]['name']}")
-                self._init_system_audio(filename_base, selected_speakers[0]['id'])
-                print("✓ Grabación de audio del sistema iniciada")
 
+            if live_mux:
+                # El audio se abre primero: solo los dispositivos que arrancan
+                # correctamente se agregan como entradas de ffmpeg
+                print("\nIniciando grabación de audio...")
+                self._start_audio(filename_base, selected_speakers, selected_mics, live_mux)
+
+            multiple = len(regions) > 1
+            for index, area in enumerate(regions):
+                name = f"mon{area.get('mon', index + 1)}" if multiple else 'video'
+                base = f"{filename_base}_{name}" if multiple else filename_base
+                self.pipelines.append(self._open_pipeline(name, area, base, live_mux, with_audio=index == 0))
+            for pipeline in self.pipelines:
+                pipeline.start()
+
+            if not live_mux:
+                # Inicializar grabación de audio
+                print("\nIniciando grabación de audio...")
+                self._start_audio(filename_base, selected_speakers, selected_mics, live_mux)
+
+            # Clave del destino -> archivo WAV (con multiplexado en vivo no hay WAV)
+            audio_paths = {} if live_mux else {key: f"{filename_base}_{key}.wav" for key in self.wav_files}
+            primary = self.pipelines[0]
             self.current_recording = {
-                'video': video_file,
-                'mic': f"{filename_base}_mic.wav" if selected_mics else None,
-                'speakers': f"{filename_base}_speakers.wav" if selected_speakers else None,
-                'final': f"{filename_base}.avi"
+                'video': primary.video_file,
+                # Archivo WAV -> nombre de la pista
+                'audio': {
+                    path: self.audio_sources[key].name if key in self.audio_sources else None
+                    for key, path in audio_paths.items()
+                },
+                'audio_paths': audio_paths,
+                # Con multiplexado en vivo: clave de cada pista de audio, en orden de stream
+                'audio_streams': list(self.wav_files) if live_mux else [],
+                'final': primary.final_file,
+                'size': primary.size,
+                # Con varias áreas: un contenedor con todos los streams de video, o None
+                'merged': (
+                    f"{filename_base}.{FFMPEG_CONTAINER}"
+                    if multiple and MULTI_MONITOR_OUTPUT == 'streams' else None
+                ),
+                'started_at': datetime.now().isoformat(timespec='seconds')
             }
 
             print("\n✓ Grabación iniciada correctamente")
@@ -84,90 +174,145 @@ class RecordingManager:
         except Exception as e:
             print(f"\n✗ Error al iniciar grabación: {str(e)}")
             self.is_recording = False
-            if self.video_writer:
-                self.video_writer.release()
-                self.video_writer = None
+            self._close_audio()
+            self._close_pipelines()
             return False
 
-    def _init_microphone(self, filename_base, mic_id):
-        """Inicializa la grabación del micrófono."""
-        try:
-            self.wav_files['mic'] = wave.open(f"{filename_base}_mic.wav", 'wb')
-            self.wav_files['mic'].setnchannels(AUDIO_CHANNELS)
-            self.wav_files['mic'].setsampwidth(2)
-            self.wav_files['mic'].setframerate(AUDIO_SAMPLE_RATE)
-
-            def mic_callback(indata, frames, time, status):
-                if status:
-                    print(f"Estado del micrófono: {status}")
-                if self.is_recording and len(indata) > 0:
-                    try:
-                        data = (indata * 32767).astype(np.int16)
-                        self.wav_files['mic'].writeframes(data.tobytes())
-                    except Exception as e:
-                        print(f"Error en callback de micrófono: {str(e)}")
-
-            self.audio_streams['mic'] = sd.InputStream(
-                device=mic_id,
-                channels=AUDIO_CHANNELS,
-                callback=mic_callback,
-                samplerate=AUDIO_SAMPLE_RATE,
-                blocksize=AUDIO_CHUNK_SIZE,
-                dtype=np.float32
+    def _open_pipeline(self, name, region, filename_base, live_mux, with_audio):
+        """Crea el writer de video de un área; solo el de ``with_audio`` recibe el audio."""
+        if live_mux:
+            video_file = None
+            final_file = f"{filename_base}.{FFMPEG_CONTAINER}"
+            print(f"\nIniciando ffmpeg: {os.path.basename(final_file)}")
+            writer = FFmpegPipeWriter(
+                final_file,
+                region['width'],
+                region['height'],
+                VIDEO_FPS,
+                audio_pipes=list(self.wav_files.values()) if with_audio else []
+            )
+            if not writer.open():
+                raise Exception("No se pudo iniciar ffmpeg")
+            print("✓ ffmpeg inicializado correctamente")
+        else:
+            if with_audio:
+                video_file = f"{filename_base}_temp.avi"
+                # Varias pistas con nombre requieren Matroska; AVI no guarda títulos
+                final_file = f"{filename_base}.{FFMPEG_CONTAINER if AUDIO_TRACK_MODE == 'tracks' else 'avi'}"
+            else:
+                # Sin audio que combinar se escribe directamente el archivo final
+                video_file = None
+                final_file = f"{filename_base}.avi"
+            print(f"\nCreando archivo de video: {os.path.basename(video_file or final_file)}")
+
+            writer = cv2.VideoWriter(
+                video_file or final_file,
+                cv2.VideoWriter_fourcc(*VIDEO_CODEC),
+                VIDEO_FPS,
+                (region['width'], region['height'])
             )
-            self.audio_streams['mic'].start()
-
-        except Exception as e:
-            print(f"Error al inicializar micrófono: {str(e)}")
-            if 'mic' in self.wav_files:
-                self.wav_files['mic'].close()
-                del self.wav_files['mic']
 
-    def _init_system_audio(self, filename_base, speaker_id):
-        """Inicializa la grabación del audio del sistema."""
+            if not writer.isOpened():
+                raise Exception("No se pudo crear el archivo de video")
+            print("✓ Video writer inicializado correctamente")
+        return VideoPipeline(name, region, writer, video_file, final_file, self.clock)
+
+    def _close_pipelines(self):
+        """Cierra todos los pipelines de video; retorna sus estadísticas en orden."""
+        stats = [pipeline.close() for pipeline in self.pipelines]
+        self.pipelines = []
+        return stats
+
+    def _start_audio(self, filename_base, selected_speakers, selected_mics, live_mux):
+        """Inicia la captura de todos los dispositivos seleccionados.
+
+        Con ``AUDIO_TRACK_MODE = 'mix'`` las fuentes se mezclan en una sola
+        pista; con ``'tracks'`` cada una se escribe tal cual en su propio destino.
+        """
+        for key, name, device in self._audio_devices(selected_speakers, selected_mics):
+            kind = 'mic' if key.startswith('mic') else 'speakers'
+            source = AudioSource(
+                key, name, self.clock, AUDIO_SAMPLE_RATE, AUDIO_CHANNELS,
+                gain=AUDIO_SOURCE_GAINS.get(kind, 1.0)
+            )
+            print(f"\nIniciando captura de audio: {name}")
+            try:
+                source.start(device)
+                self.audio_sources[key] = source
+                print(f"✓ Captura de {name} iniciada ({source.device_rate} Hz)")
+            except Exception as e:
+                print(f"Error al inicializar {name}: {str(e)}")
+                source.stop()
+
+        if not self.audio_sources:
+            return
+
+        if AUDIO_TRACK_MODE == 'tracks':
+            for key, source in self.audio_sources.items():
+                self._open_audio_sink(key, filename_base, live_mux, title=source.name)
+                self.audio_writers[key] = AudioWriterThread(key, self.wav_files[key], source.ring)
+                self.audio_writers[key].start()
+            return
+
+        # Una sola pista mezclada en vivo: no hace falta amix al finalizar
+        self._open_audio_sink('audio', filename_base, live_mux)
+        self.audio_writers['audio'] = AudioMixerThread(
+            self.wav_files['audio'], self.audio_sources.values()
+        )
+        self.audio_writers['audio'].start()
+
+    def _audio_devices(self, selected_speakers, selected_mics):
+        """Lista ``(clave, nombre, dispositivo)`` de las fuentes a capturar, sin repetir dispositivos."""
+        devices = []
+        used = set()
+        for i, mic in enumerate(selected_mics):
+            if mic['id'] not in used:
+                used.add(mic['id'])
+                devices.append((f"mic{i + 1 if i else ''}", mic['name'], mic['id']))
+
+        # El audio del sistema se toma del dispositivo de loopback si existe
+        loopback_device = self._find_loopback_device()
+        for i, speaker in enumerate(selected_speakers):
+            device = loopback_device if loopback_device is not None else speaker['id']
+            if device not in used:
+                used.add(device)
+                devices.append((f"speakers{i + 1 if i else ''}", speaker['name'], device))
+        return devices
+
+    def _find_loopback_device(self):
+        """Busca un dispositivo de loopback (Stereo Mix, What U Hear, Voicemeeter)."""
         try:
-            self.wav_files['speakers'] = wave.open(f"{filename_base}_speakers.wav", 'wb')
-            self.wav_files['speakers'].setnchannels(AUDIO_CHANNELS)
-            self.wav_files['speakers'].setsampwidth(2)
-            self.wav_files['speakers'].setframerate(AUDIO_SAMPLE_RATE)
-
-            def speaker_callback(indata, frames, time, status):
-                if status:
-                    print(f"Estado del audio del sistema: {status}")
-                if self.is_recording and len(indata) > 0:
-                    try:
-                        data = (indata * 32767).astype(np.int16)
-                        self.wav_files['speakers'].writeframes(data.tobytes())
-                    except Exception as e:
-                        print(f"Error en callback de audio del sistema: {str(e)}")
-
-            # Buscar dispositivo de loopback
-            loopback_device = None
             for i, dev in enumerate(sd.query_devices()):
-                if ('stereo mix' in dev['name'].lower() or 
+                if ('stereo mix' in dev['name'].lower() or
                     'what u hear' in dev['name'].lower() or
                     'voicemeeter' in dev['name'].lower()):
-                    loopback_device = i
-                    break
-
-            if loopback_device is None:
-                loopback_device = speaker_id
-
-            self.audio_streams['speakers'] = sd.InputStream(
-                device=loopback_device,
-                channels=AUDIO_CHANNELS,
-                callback=speaker_callback,
-                samplerate=AUDIO_SAMPLE_RATE,
-                blocksize=AUDIO_CHUNK_SIZE,
-                dtype=np.float32
-            )
-            self.audio_streams['speakers'].start()
-
+                    return i
         except Exception as e:
-            print(f"Error al inicializar audio del sistema: {str(e)}")
-            if 'speakers' in self.wav_files:
-                self.wav_files['speakers'].close()
-                del self.wav_files['speakers']
+            print(f"Error al buscar dispositivo de loopback: {str(e)}")
+        return None
+
+    def _open_audio_sink(self, key, filename_base, live_mux, title=None):
+        """Abre el destino del audio: un pipe hacia ffmpeg o un archivo WAV."""
+        if live_mux:
+            sink = AudioPipe(
+                key, AUDIO_SAMPLE_RATE, AUDIO_CHANNELS,
+                sample_format=SAMPLE_FORMATS[AUDIO_FORMAT][0], title=title
+            )
+            sink.start()
+        else:
+            sink = open_wave(f"{filename_base}_{key}.wav", AUDIO_CHANNELS, AUDIO_SAMPLE_RATE)
+        self.wav_files[key] = sink
+
+    def _close_audio(self):
+        """Detiene las fuentes de audio, escribe lo pendiente y cierra los destinos."""
+        for source in self.audio_sources.values():
+            source.stop()
+        for writer in self.audio_writers.values():
+            if writer.is_alive():
+                writer.stop()
+        for wav_file in self.wav_files.values():
+            wav_file.close()
+        self.wav_files.clear()
 
     async def stop_recording(self):
         """Detiene la grabación."""
@@ -178,97 +323,342 @@ class RecordingManager:
             print("\n=== Deteniendo grabación ===")
             self.is_recording = False
 
-            # Detener streams de audio
+            # Detener streams de audio y cerrar archivos WAV o pipes
             print("\nDeteniendo streams de audio...")
-            for stream in self.audio_streams.values():
-                stream.stop()
-                stream.close()
-            self.audio_streams.clear()
+            self._close_audio()
+            for source in self.audio_sources.values():
+                print(f"Deriva de reloj de {source.name}: {source.drift.drift * 1e6:+.1f} ppm")
+            self._measure_loudness(self.current_recording)
             print("✓ Streams de audio detenidos")
 
-            # Cerrar archivos WAV
-            print("\nCerrando archivos de audio...")
-            for wav_file in self.wav_files.values():
-                wav_file.close()
-            self.wav_files.clear()
-            print("✓ Archivos de audio cerrados")
-
-            # Cerrar video writer
+            # Vaciar la cola del encoder y cerrar video writer
             print("\nCerrando archivo de video...")
-            if self.video_writer:
-                self.video_writer.release()
-                self.video_writer = None
+            pipelines = self.pipelines
+            all_stats = self._close_pipelines()
+            for pipeline, stats in zip(pipelines, all_stats):
+                if stats:
+                    print(f"Frames codificados ({pipeline.name}): {stats['encoded']}, "
+                          f"descartados: {stats['dropped']}, tardíos: {stats['late']}, "
+                          f"duplicados: {stats['duplicates']}")
+            video_stats = all_stats[0] if all_stats else None
+            duration = video_stats['duration'] if video_stats else None
+            if len(pipelines) > 1:
+                self.current_recording['monitors'] = [
+                    {
+                        'name': pipeline.name,
+                        'file': os.path.basename(pipeline.final_file),
+                        'size': pipeline.size,
+                        'video': stats
+                    }
+                    for pipeline, stats in zip(pipelines, all_stats)
+                ]
             print("✓ Archivo de video cerrado")
 
             # Verificar archivos
             print("\nVerificando archivos generados:")
-            for key, path in self.current_recording.items():
+            files = [('video', self.current_recording['video'])]
+            files += [('audio', path) for path in self.current_recording['audio']]
+            files += [
+                ('final', pipeline.final_file) for pipeline in pipelines if not pipeline.video_file
+            ]
+            for key, path in files:
                 if path and os.path.exists(path):
                     size = os.path.getsize(path)
                     print(f"✓ {key}: {os.path.basename(path)} ({size} bytes)")
                 elif path:
                     print(f"✗ {key}: Archivo no encontrado - {os.path.basename(path)}")
 
-            # Combinar audio y video
-            if self.current_recording:
-                print("\nCombinando audio y video...")
-                await self._combine_audio_video()
-
-            print("\n✓ Grabación finalizada correctamente")
+            # Las fuentes se rellenan desde el inicio de la sesión, así que el
+            # audio ya está alineado con el video y no necesita desplazamiento
+            recording = self.current_recording
+            self._write_metadata(recording, video_stats)
+            self.audio_sources.clear()
+            self.audio_writers.clear()
+
+            # Combinar audio y video en segundo plano (no hace falta si ffmpeg ya
+            # multiplexó en vivo) y juntar los monitores si corresponde. Se puede
+            # iniciar otra grabación mientras tanto.
+            self.current_recording = None
+            if recording and (recording['video'] or recording['merged'] or recording['stream_gains']):
+                print("\nFinalizando en segundo plano...")
+                task = asyncio.ensure_future(self._finalize(recording, duration))
+                self.finalize_tasks[recording['final']] = task
+                task.add_done_callback(
+                    lambda _, final=recording['final']: self.finalize_tasks.pop(final, None)
+                )
+
+            print("\n✓ Grabación detenida correctamente")
             return True
 
         except Exception as e:
             print(f"\n✗ Error al detener grabación: {str(e)}")
             return False
 
-    async def _combine_audio_video(self):
-        """Combina audio y video de manera asíncrona."""
-        from ..utils.video_utils import combine_audio_video
-        
+    async def _finalize(self, recording, duration):
+        """Combina audio y video y junta los monitores sin bloquear el loop de eventos."""
+        success = True
+        if recording['video']:
+            success = await self._combine(recording, duration)
+        elif recording['stream_gains']:
+            # Multiplexado en vivo: la normalización se aplica sobre el archivo ya escrito
+            success = await apply_audio_gains_async(recording['final'], recording['stream_gains'])
+            if success:
+                print(f"✓ Audio normalizado: {os.path.basename(recording['final'])}")
+        if recording['merged']:
+            files = [os.path.join(os.path.dirname(recording['final']), monitor['file'])
+                     for monitor in recording['monitors']]
+            titles = [monitor['name'] for monitor in recording['monitors']]
+            if await merge_video_streams_async(files, recording['merged'], titles):
+                print(f"✓ Monitores combinados: {os.path.basename(recording['merged'])}")
+            else:
+                success = False
+        return success
+
+    async def _combine(self, recording, duration):
+        """Combina el video del primer pipeline con las pistas de audio."""
+        audio_files = [path for path in recording['audio'] if os.path.exists(path)]
+
+        def on_progress(event):
+            if self.progress_callback:
+                self.progress_callback(recording['final'], event)
+
+        success = await combine_audio_video_async(
+            recording['video'],
+            audio_files,
+            recording['final'],
+            duration=duration,
+            progress_callback=on_progress,
+            track_titles=recording['audio'] if AUDIO_TRACK_MODE == 'tracks' else None,
+            audio_gains=recording.get('audio_gains')
+        )
+        if success:
+            print(f"✓ Grabación finalizada: {os.path.basename(recording['final'])}")
+        return success
+
+    def _measure_loudness(self, recording):
+        """Informa la sonoridad de cada pista y guarda su ganancia de normalización.
+
+        Para los WAV la ganancia se aplica al combinar, en la misma pasada que
+        codifica el audio. Con multiplexado en vivo el audio ya está
+        codificado: se guarda por índice de pista y ``_finalize`` la aplica
+        recodificando solo el audio.
+        """
+        gains = {}
+        stream_gains = {}
+        for key, writer in self.audio_writers.items():
+            meter = writer.meter
+            if meter is None:
+                continue
+            integrated = meter.integrated()
+            if integrated is None:
+                print(f"Sonoridad de {key}: silencio")
+                continue
+            gain = meter.normalization_gain()
+            print(f"Sonoridad de {key}: {integrated:.1f} LUFS, "
+                  f"LRA {meter.loudness_range() or 0.0:.1f} LU, pico {meter.true_peak_db():.1f} dBTP, "
+                  f"ganancia {gain:+.1f} dB")
+            path = recording['audio_paths'].get(key)
+            if path:
+                gains[path] = gain
+            elif key in recording['audio_streams']:
+                stream_gains[recording['audio_streams'].index(key)] = gain
+        recording['audio_gains'] = gains
+        recording['stream_gains'] = stream_gains
+
+    def _write_metadata(self, recording, video_stats):
+        """Guarda junto al archivo final un JSON con los datos de sincronía de la sesión."""
+        output = recording.get('merged') or recording['final']
+        metadata = {
+            'file': os.path.basename(output),
+            'started_at': recording['started_at'],
+            'fps': VIDEO_FPS,
+            'size': recording.get('size'),
+            'video': video_stats,
+            'audio_sources': {key: source.stats() for key, source in self.audio_sources.items()},
+            'audio_tracks': {key: writer.stats() for key, writer in self.audio_writers.items()}
+        }
+        if recording.get('monitors'):
+            metadata['monitors'] = recording['monitors']
+        path = f"{os.path.splitext(output)[0]}.json"
         try:
-            audio_files = []
-            if self.current_recording['mic'] and os.path.exists(self.current_recording['mic']):
-                audio_files.append(self.current_recording['mic'])
-            if self.current_recording['speakers'] and os.path.exists(self.current_recording['speakers']):
-                audio_files.append(self.current_recording['speakers'])
-
-            # Ejecutar la combinación en un worker separado
-            worker = AsyncWorker(
-                combine_audio_video,
-                self.current_recording['video'],
-                audio_files,
-                self.current_recording['final']
-            )
-            worker.start()
-            worker.wait()  # Esperar a que termine
-
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(metadata, f, indent=2, default=float)
         except Exception as e:
-            print(f"Error al combinar audio y video: {str(e)}")
-            # En caso de error, mantener el video temporal
-            if os.path.exists(self.current_recording['video']):
-                os.rename(self.current_recording['video'], self.current_recording['final'])
-
-    def write_frame(self, frame):
-        """Escribe un frame al video si está grabando."""
-        if self.is_recording and self.video_writer:
-            try:
-                # Asegurarse de que el frame esté en BGR
-                if frame.shape[-1] == 4:  # Si es BGRA
-                    frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
-                self.video_writer.write(frame)
-                return True
-            except Exception as e:
-                print(f"Error al escribir frame: {str(e)}")
-                return False
+            print(f"Error al guardar metadatos: {str(e)}")
+
+    def is_finalizing(self):
+        """Indica si hay grabaciones anteriores combinándose todavía."""
+        return bool(self.finalize_tasks)
+
+    def cancel_finalize(self):
+        """Cancela las finalizaciones pendientes conservando los temporales."""
+        for task in list(self.finalize_tasks.values()):
+            task.cancel()
+
+    async def wait_finalize(self):
+        """Espera a que terminen todas las finalizaciones pendientes."""
+        if self.finalize_tasks:
+            await asyncio.gather(*self.finalize_tasks.values(), return_exceptions=True)
+
+    def write_frame(self, frame, index=0):
+        """Encola un frame para el encoder del área ``index`` si está grabando.
+
+        No bloquea salvo con la política 'block'.
+        """
+        pipelines = self.pipelines
+        if self.is_recording and index < len(pipelines):
+            return pipelines[index].encoder.submit(frame)
         return False
 
+    def get_audio_stats(self):
+        """Retorna los contadores de cada fuente de audio y de cada pista escrita."""
+        return {
+            'sources': {key: source.stats() for key, source in self.audio_sources.items()},
+            'tracks': {key: writer.stats() for key, writer in self.audio_writers.items()}
+        }
+
+    def get_audio_levels(self):
+        """Niveles de cada fuente (pico y RMS en dBFS por canal) y su alarma de silencio.
+
+        Los medidores publican a ``AUDIO_METER_RATE``; consultar más seguido
+        repite la última ventana.
+        """
+        return {key: source.level() for key, source in self.audio_sources.items()}
+
+    def get_encoder_stats(self, index=0):
+        """Retorna los contadores del encoder del área ``index`` (ver ``VideoPipeline.stats``)."""
+        pipelines = self.pipelines
+        if index < len(pipelines):
+            return pipelines[index].stats()
+        return None
+
+    def attach_pacer(self, pacer, index=0):
+        """Asocia el pacer de la captura del área ``index``; sus estadísticas cuentan desde ahora."""
+        pipelines = self.pipelines
+        if index < len(pipelines):
+            pacer.reset_stats()
+            pipelines[index].pacer = pacer
+
     def cleanup(self):
         """Limpia todos los recursos."""
         self.process_manager.stop_all()
-        if self.video_writer:
-            self.video_writer.release()
-        for stream in self.audio_streams.values():
-            stream.stop()
-            stream.close()
-        for wav_file in self.wav_files.values():
-            wav_file.close() 
\ No newline at end of file
+        self._close_audio()
+        self._close_pipelines()
+
+class RemoteRecordingManager:
+    """Interfaz de ``RecordingManager`` para la GUI, con la sesión corriendo en un ``CaptureWorker``.
+
+    El worker tiene su propio ``RecordingManager`` y las capturas; acá solo
+    se envían comandos (desde un executor de un thread, para no congelar la
+    GUI y conservar su orden) y se lee el estado que el worker publica solo:
+    niveles de audio, encoder y finalizaciones pendientes. El preview se lee
+    de ``preview_ring``.
+    """
+    remote = True
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.is_recording = False
+        self.progress_callback = None  # Recibe (archivo_final, evento) durante la finalización
+        self.preview_ring = None
+        self.preview_paused = False
+        self._loop = asyncio.get_event_loop()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self.worker = CaptureWorker(output_dir, on_event=self._on_event)
+
+    def _on_event(self, message):
+        if message[0] == 'progress' and self.progress_callback:
+            # Llega desde el thread lector y el callback toca widgets: se pasa al loop de la GUI
+            self._loop.call_soon_threadsafe(self.progress_callback, message[1], message[2])
+
+    async def start_capture(self, monitor, region=None, tracker=None, max_size=None):
+        """(Re)inicia la captura del preview en el worker y retorna el anillo compartido.
+
+        Al primer inicio el worker todavía importa sus módulos: la espera corre
+        en el executor para no congelar la GUI. ``max_size`` es el tamaño del
+        widget de preview, al que el worker ya entrega los frames.
+        """
+        name = await self._request('start_capture', monitor, region, tracker, max_size)
+        if self.preview_ring is not None:
+            self.preview_ring.close()
+        self.preview_ring = SharedPreviewRing.attach(name)
+        return self.preview_ring
+
+    async def _request(self, command, *args, timeout=WORKER_REPLY_TIMEOUT):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, partial(self.worker.request, command, *args, timeout=timeout)
+        )
+
+    def pause_preview(self, paused):
+        """Pausa o reanuda la reducción del preview en el worker, sin esperar la respuesta."""
+        if paused == self.preview_paused:
+            return
+        self.preview_paused = paused
+        asyncio.ensure_future(self._notify('preview_pause' if paused else 'preview_resume'))
+
+    async def _notify(self, command):
+        try:
+            await self._request(command)
+        except RuntimeError as e:
+            print(f"Error en comando {command} del worker: {str(e)}")
+
+    async def start_recording(self, region, selected_speakers, selected_mics):
+        """Inicia la grabación en el worker (ver ``RecordingManager.start_recording``)."""
+        if self.is_recording:
+            return False
+        areas = [region] if isinstance(region, dict) else list(region)
+        try:
+            self.is_recording = await self._request('start_recording', areas, selected_speakers, selected_mics)
+        except RuntimeError as e:
+            print(f"\n✗ Error al iniciar grabación: {str(e)}")
+            self.is_recording = False
+        return self.is_recording
+
+    async def stop_recording(self):
+        if not self.is_recording:
+            return False
+        self.is_recording = False
+        try:
+            # Cerrar los encoders puede tardar más que WORKER_REPLY_TIMEOUT: se espera sin límite
+            return await self._request('stop_recording', timeout=None)
+        except RuntimeError as e:
+            print(f"\n✗ Error al detener grabación: {str(e)}")
+            return False
+
+    def is_finalizing(self):
+        return bool(self.worker.status.get('finalizing'))
+
+    async def cancel_finalize(self):
+        try:
+            await self._request('cancel_finalize')
+        except RuntimeError as e:
+            print(f"Error al cancelar finalización: {str(e)}")
+
+    async def wait_finalize(self):
+        while self.worker.is_alive() and self.is_finalizing():
+            await asyncio.sleep(0.1)
+
+    def get_audio_stats(self):
+        """Contadores de audio según el último estado del worker (ver ``RecordingManager.get_audio_stats``)."""
+        return self.worker.status.get('audio')
+
+    def get_audio_levels(self):
+        """Últimos niveles publicados por el worker (ver ``RecordingManager.get_audio_levels``)."""
+        if not self.is_recording:
+            return {}
+        return self.worker.status.get('levels', {})
+
+    def get_encoder_stats(self, index=0):
+        """Contadores del encoder del área ``index``, según el último estado del worker."""
+        stats = self.worker.status.get('encoder') or []
+        if index < len(stats):
+            return stats[index]
+        return None
+
+    def cleanup(self):
+        """Cierra el preview y pide al worker que termine; las finalizaciones siguen en su proceso."""
+        if self.preview_ring is not None:
+            self.preview_ring.close()
+            self.preview_ring = None
+        self.worker.shutdown()
+        self._executor.shutdown(wait=False)
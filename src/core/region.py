@@ -0,0 +1,118 @@
+"""Regiones de captura: rectángulos dentro de un monitor y ventanas seguidas al moverse."""
+import ctypes
+from ctypes import wintypes
+import win32gui
+from ..config.settings import CAPTURE_REGION_MIN_SIZE
+
+DWMWA_EXTENDED_FRAME_BOUNDS = 9
+
+def make_region(monitor, left, top, width, height):
+    """Región de captura en coordenadas absolutas, recortada a ``monitor`` y con lados pares.
+
+    Los encoders con submuestreo 4:2:0 requieren ancho y alto pares, así que
+    se descarta la última columna o fila si hace falta. Lanza ``ValueError``
+    si la región queda vacía o por debajo de ``CAPTURE_REGION_MIN_SIZE``.
+    """
+    right = min(left + width, monitor['left'] + monitor['width'])
+    bottom = min(top + height, monitor['top'] + monitor['height'])
+    left = max(left, monitor['left'])
+    top = max(top, monitor['top'])
+    width = (right - left) & ~1
+    height = (bottom - top) & ~1
+    if width < CAPTURE_REGION_MIN_SIZE or height < CAPTURE_REGION_MIN_SIZE:
+        raise ValueError(f"Región de captura demasiado chica: {max(width, 0)}x{max(height, 0)}")
+    return {
+        'top': top,
+        'left': left,
+        'width': width,
+        'height': height,
+        'mon': monitor['mon']
+    }
+
+def window_rect(hwnd):
+    """Rectángulo visible ``(left, top, right, bottom)`` de una ventana, o None si no existe.
+
+    Se prefiere el marco extendido de DWM: ``GetWindowRect`` incluye los
+    bordes invisibles de redimensionado de Windows 10/11.
+    """
+    try:
+        rect = wintypes.RECT()
+        result = ctypes.windll.dwmapi.DwmGetWindowAttribute(
+            wintypes.HWND(hwnd), DWMWA_EXTENDED_FRAME_BOUNDS, ctypes.byref(rect), ctypes.sizeof(rect)
+        )
+        if result == 0:
+            return rect.left, rect.top, rect.right, rect.bottom
+    except Exception:
+        pass
+    try:
+        return win32gui.GetWindowRect(hwnd)
+    except Exception as e:
+        print(f"Error al obtener la posición de la ventana: {str(e)}")
+        return None
+
+def list_windows(monitor):
+    """Ventanas visibles con título que se superponen con ``monitor``."""
+    windows = []
+
+    def collect(hwnd, _):
+        if not win32gui.IsWindowVisible(hwnd) or win32gui.IsIconic(hwnd):
+            return True
+        title = win32gui.GetWindowText(hwnd)
+        rect = window_rect(hwnd) if title else None
+        if rect is None:
+            return True
+        left, top, right, bottom = rect
+        if (right <= monitor['left'] or left >= monitor['left'] + monitor['width']
+                or bottom <= monitor['top'] or top >= monitor['top'] + monitor['height']):
+            return True
+        windows.append({'hwnd': hwnd, 'title': title, 'rect': rect})
+        return True
+
+    try:
+        win32gui.EnumWindows(collect, None)
+    except Exception as e:
+        print(f"Error al listar ventanas: {str(e)}")
+    return windows
+
+def window_region(hwnd, monitor):
+    """Región inicial para capturar la ventana ``hwnd`` dentro de ``monitor``."""
+    rect = window_rect(hwnd)
+    if rect is None:
+        raise ValueError("La ventana ya no existe")
+    left, top, right, bottom = rect
+    return make_region(monitor, left, top, right - left, bottom - top)
+
+class WindowTracker:
+    """Mueve una región de captura para que siga a una ventana.
+
+    El tamaño de la región (y por lo tanto del video) queda fijo al empezar:
+    si la ventana se mueve, la región la acompaña sin salir de ``monitor``;
+    si se redimensiona, se captura el rectángulo original desde su esquina
+    superior izquierda. Mientras la ventana está minimizada o ya no existe,
+    la región queda donde estaba.
+    """
+
+    def __init__(self, hwnd, monitor):
+        self.hwnd = hwnd
+        self.monitor = monitor
+        self.moves = 0  # Veces que la región se desplazó con la ventana
+
+    def follow(self, region):
+        """Actualiza ``left``/``top`` de ``region`` en el lugar; retorna True si cambiaron."""
+        try:
+            if not win32gui.IsWindow(self.hwnd) or win32gui.IsIconic(self.hwnd):
+                return False
+        except Exception:
+            return False
+        rect = window_rect(self.hwnd)
+        if rect is None:
+            return False
+        monitor = self.monitor
+        left = min(max(rect[0], monitor['left']), monitor['left'] + monitor['width'] - region['width'])
+        top = min(max(rect[1], monitor['top']), monitor['top'] + monitor['height'] - region['height'])
+        if left == region['left'] and top == region['top']:
+            return False
+        region['left'] = left
+        region['top'] = top
+        self.moves += 1
+        return True
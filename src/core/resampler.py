@@ -0,0 +1,122 @@
+"""Resampler polifásico en streaming para convertir audio de la tasa nativa del dispositivo a la de sesión."""
+import numpy as np
+from ..config.settings import AUDIO_RESAMPLER_TAPS, AUDIO_RESAMPLER_PHASES
+
+class PolyphaseResampler:
+    """Convierte bloques de audio entre tasas arbitrarias conservando el estado entre llamadas.
+
+    Usa un banco de ``phases`` filtros sinc con ventana de Blackman de
+    ``taps`` coeficientes cada uno, con interpolación lineal entre fases
+    vecinas. Cada muestra de salida se calcula en la posición fraccional de
+    entrada ``pos``, que avanza ``step`` muestras de entrada por muestra de
+    salida; como ``step`` no tiene que ser racional, se puede ajustar en
+    vivo (p.ej. para corregir deriva de reloj) con ``set_correction``.
+
+    El procesamiento de un bloque es vectorizado sobre todas las muestras de
+    salida y usa solo buffers creados en el constructor.
+    """
+
+    def __init__(self, in_rate, out_rate, channels, max_block=4096,
+                 taps=AUDIO_RESAMPLER_TAPS, phases=AUDIO_RESAMPLER_PHASES, rolloff=0.95):
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.channels = channels
+        self.max_block = max_block
+        self.taps = taps
+        self.phases = phases
+        self.nominal_step = in_rate / out_rate
+        self.step = self.nominal_step
+        self.correction = 0.0  # Corrección relativa aplicada al paso (1e-6 = 1 ppm)
+
+        # Banco de filtros: fila p = respuesta desplazada p / phases muestras
+        half = taps // 2
+        self._half = half
+        self._offsets = np.arange(taps) - half + 1
+        cutoff = min(1.0, out_rate / in_rate) * rolloff
+        fractions = np.arange(phases + 1)[:, None] / phases
+        x = self._offsets[None, :] - fractions
+        window = np.blackman(taps + 2)[1:-1]
+        window = np.interp(x + half - 1, np.arange(taps), window, left=0.0, right=0.0)
+        bank = cutoff * np.sinc(cutoff * x) * window
+        bank /= bank.sum(axis=1, keepdims=True)
+        self._bank = bank[:-1].astype(np.float32)
+        self._bank_delta = (bank[1:] - bank[:-1]).astype(np.float32)
+
+        # Buffer de trabajo: historia de ``taps`` muestras + bloque nuevo
+        self._buffer = np.zeros((taps + max_block, channels), dtype=np.float32)
+        self._pos = float(taps)  # Posición de la próxima salida dentro del buffer
+
+        max_out = int(max_block / (self.nominal_step * 0.99)) + 4
+        self._out = np.zeros((max_out, channels), dtype=np.float32)
+        self._ramp = np.arange(max_out, dtype=np.float64)
+        self._positions = np.zeros(max_out, dtype=np.float64)
+        self._index = np.zeros(max_out, dtype=np.int64)
+        self._phase = np.zeros(max_out, dtype=np.float64)
+        self._phase_index = np.zeros(max_out, dtype=np.int64)
+        self._weight = np.zeros((max_out, 1), dtype=np.float32)
+        self._window_index = np.zeros((max_out, taps), dtype=np.int64)
+        self._kernel = np.zeros((max_out, taps), dtype=np.float32)
+        self._kernel_tmp = np.zeros((max_out, taps), dtype=np.float32)
+        self._windows = np.zeros((max_out, taps, channels), dtype=np.float32)
+
+    def set_correction(self, correction):
+        """Ajusta el paso de entrada en forma relativa (positivo = consumir entrada más rápido)."""
+        self.correction = correction
+        self.step = self.nominal_step * (1.0 + correction)
+
+    def process(self, block):
+        """Resamplea ``block`` (``(frames, channels)``, hasta ``max_block`` frames).
+
+        Retorna una vista del buffer interno de salida, válida hasta la próxima llamada.
+        """
+        frames = len(block)
+        taps = self.taps
+        total = taps + frames
+        self._buffer[taps:total] = block
+
+        # Salidas cuya ventana completa ya está disponible
+        count = int((total - 1 - self._half - self._pos) // self.step) + 1
+        count = max(0, min(count, len(self._out)))
+        if count:
+            positions = self._positions[:count]
+            np.multiply(self._ramp[:count], self.step, out=positions)
+            np.add(positions, self._pos, out=positions)
+            index = self._index[:count]
+            np.floor(positions, out=self._phase[:count])
+            np.copyto(index, self._phase[:count], casting='unsafe')
+
+            # Fase fraccional: fila del banco y peso de interpolación con la siguiente
+            phase = self._phase[:count]
+            np.subtract(positions, phase, out=phase)
+            np.multiply(phase, self.phases, out=phase)
+            phase_index = self._phase_index[:count]
+            np.copyto(phase_index, phase, casting='unsafe')
+            np.minimum(phase_index, self.phases - 1, out=phase_index)
+            np.subtract(phase, phase_index, out=phase)
+            weight = self._weight[:count]
+            np.copyto(weight[:, 0], phase, casting='unsafe')
+
+            kernel = self._kernel[:count]
+            kernel_tmp = self._kernel_tmp[:count]
+            np.take(self._bank, phase_index, axis=0, out=kernel)
+            np.take(self._bank_delta, phase_index, axis=0, out=kernel_tmp)
+            np.multiply(kernel_tmp, weight, out=kernel_tmp)
+            np.add(kernel, kernel_tmp, out=kernel)
+
+            # Ventanas de entrada (count, taps, channels) ponderadas por el kernel
+            window_index = self._window_index[:count]
+            np.add(index[:, None], self._offsets, out=window_index)
+            windows = self._windows[:count]
+            np.take(self._buffer[:total], window_index, axis=0, out=windows)
+            np.einsum('ktc,kt->kc', windows, kernel, out=self._out[:count])
+
+            self._pos += count * self.step
+
+        # Conservar las últimas ``taps`` muestras como historia
+        self._buffer[:taps] = self._buffer[total - taps:total]
+        self._pos -= total - taps
+        return self._out[:count]
+
+    def reset(self):
+        self._buffer.fill(0)
+        self._pos = float(self.taps)
@@ -0,0 +1,137 @@
+"""Conversión de muestras float32 al formato de los destinos de audio (WAV o pipe de ffmpeg)."""
+import struct
+import wave
+import cv2
+import numpy as np
+from ..config.settings import AUDIO_FORMAT, AUDIO_DITHER
+
+# Formato -> (formato crudo de ffmpeg, bytes por muestra, valor de fondo de escala)
+SAMPLE_FORMATS = {
+    'int16': ('s16le', 2, 32768),
+    'int24': ('s24le', 3, 8388608),
+    'float32': ('f32le', 4, None)
+}
+
+# Frames de ruido TPDF precalculado; cada bloque lo lee desde un offset aleatorio
+DITHER_TABLE_FRAMES = 1 << 16
+
+class SampleConverter:
+    """Convierte bloques float32 ``(frames, channels)`` a bytes del formato de salida.
+
+    Los enteros se escalan a fondo de escala, se redondean y se saturan (1.0
+    da el máximo positivo en lugar de dar la vuelta al negativo) en una sola
+    pasada de ``cv2.addWeighted``, que escribe directo en el buffer de salida.
+    Con ``dither`` el segundo sumando es ruido TPDF de ±1 LSB, tomado de una
+    tabla precalculada desde un offset aleatorio por bloque; sin dither es el
+    mismo bloque con peso 0. ``float32`` no convierte nada: entrega los
+    bytes del propio bloque.
+
+    Todos los buffers se crean en el constructor para ``capacity`` frames; el
+    resultado de ``convert`` es una vista válida hasta la próxima llamada.
+    """
+
+    def __init__(self, capacity, channels, sample_format=AUDIO_FORMAT, dither=AUDIO_DITHER, gain=1.0):
+        if sample_format not in SAMPLE_FORMATS:
+            raise ValueError(f"Formato de muestra desconocido: {sample_format}")
+        self.sample_format = sample_format
+        self.ffmpeg_format, self.sample_width, full_scale = SAMPLE_FORMATS[sample_format]
+        self.capacity = capacity
+        self.channels = channels
+        self.dither = dither and full_scale is not None
+        self.gain = np.float32(gain)
+
+        self._work = np.zeros((capacity, channels), dtype=np.float32)
+        if full_scale is not None:
+            self._scale = float(full_scale * gain)
+            self._low = -full_scale
+            self._high = full_scale - 1
+        if self.dither:
+            self._rng = np.random.default_rng()
+            # TPDF: diferencia de dos uniformes, triangular en ±1 LSB
+            shape = (DITHER_TABLE_FRAMES + capacity, channels)
+            self._noise = (self._rng.random(shape, dtype=np.float32)
+                           - self._rng.random(shape, dtype=np.float32))
+        if sample_format == 'int16':
+            self._pcm = np.zeros((capacity, channels), dtype=np.int16)
+            self._pcm_bytes = memoryview(self._pcm).cast('B')
+            self._depth = cv2.CV_16S
+        elif sample_format == 'int24':
+            # OpenCV satura a 32 bits; el recorte a 24 bits se hace después
+            self._pcm = np.zeros((capacity, channels), dtype=np.int32)
+            self._depth = cv2.CV_32S
+            self._packed = np.zeros(capacity * channels * 3, dtype=np.uint8)
+
+    def convert(self, block):
+        """Convierte hasta ``capacity`` frames y retorna un ``memoryview`` de bytes."""
+        frames = len(block)
+        if self.sample_format == 'float32':
+            if self.gain != 1:
+                block = np.multiply(block, self.gain, out=self._work[:frames])
+            return memoryview(np.ascontiguousarray(block)).cast('B')
+
+        # bloque completo (el caso normal): sin vistas nuevas por llamada
+        pcm = self._pcm if frames == self.capacity else self._pcm[:frames]
+        if self.dither:
+            offset = int(self._rng.integers(DITHER_TABLE_FRAMES))
+            # block * escala + ruido, redondeado al entero más cercano y saturado
+            cv2.addWeighted(block, self._scale, self._noise[offset:offset + frames], 1.0, 0.0,
+                            pcm, self._depth)
+        else:
+            # Sin dither el segundo sumando es el propio bloque con peso 0
+            cv2.addWeighted(block, self._scale, block, 0.0, 0.0, pcm, self._depth)
+        if self.sample_format == 'int16':
+            return self._pcm_bytes if pcm is self._pcm else self._pcm_bytes[:pcm.nbytes]
+        np.clip(pcm, self._low, self._high, out=pcm)
+        # 24 bits: los 3 bytes bajos de cada int32 little-endian, copiados por
+        # plano de byte (mucho más rápido que una copia con paso de 3 bytes)
+        packed = self._packed[:frames * self.channels * 3]
+        source = pcm.view(np.uint8).reshape(-1, 4)
+        for byte in range(3):
+            packed[byte::3] = source[:, byte]
+        return memoryview(packed)
+
+class FloatWaveWriter:
+    """Escritor de WAV float32 (``WAVE_FORMAT_IEEE_FLOAT``), que ``wave`` no soporta.
+
+    Expone ``writeframes``/``close`` como ``wave.Wave_write``; los tamaños de
+    la cabecera se completan al cerrar.
+    """
+
+    def __init__(self, path, channels, sample_rate):
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.frames = 0
+        self._file = open(path, 'wb')
+        self._write_header()
+
+    def _write_header(self):
+        block_align = self.channels * 4
+        data_size = self.frames * block_align
+        self._file.write(struct.pack('<4sI4s', b'RIFF', 50 + data_size, b'WAVE'))
+        self._file.write(struct.pack(
+            '<4sIHHIIHHH', b'fmt ', 18, 3, self.channels, self.sample_rate,
+            self.sample_rate * block_align, block_align, 32, 0
+        ))
+        self._file.write(struct.pack('<4sII', b'fact', 4, self.frames))
+        self._file.write(struct.pack('<4sI', b'data', data_size))
+
+    def writeframes(self, data):
+        self._file.write(data)
+        self.frames += len(data) // (self.channels * 4)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.seek(0)
+        self._write_header()
+        self._file.close()
+
+def open_wave(path, channels, sample_rate, sample_format=AUDIO_FORMAT):
+    """Abre un WAV para escribir muestras en ``sample_format``."""
+    if sample_format == 'float32':
+        return FloatWaveWriter(path, channels, sample_rate)
+    sink = wave.open(path, 'wb')
+    sink.setnchannels(channels)
+    sink.setsampwidth(SAMPLE_FORMATS[sample_format][1])
+    sink.setframerate(sample_rate)
+    return sink
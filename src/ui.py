@@ -5,7 +5,6 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QLabel, QVBoxLayout,
                             QFormLayout, QCheckBox, QGroupBox, QHBoxLayout, 
                             QTabWidget, QScrollArea)
 from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
-from PyQt5.QtGui import QImage, QPixmap
 import mss
 import numpy as np
 import cv2
@@ -22,6 +21,15 @@ import win32con
 import win32api
 from ctypes import windll
 
+# Este script se ejecuta directamente (python src/ui.py): la raíz del proyecto
+# debe estar en el path para importar los módulos compartidos del paquete src
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.utils.timing import FramePacer
+from src.core.frame_buffer import FrameRingBuffer
+from src.config.settings import PREVIEW_FPS
+from src.core.sample_format import SampleConverter
+from src.ui.preview import PreviewWidget
+
 def capture_cursor():
     """Captura la posición y la imagen del cursor."""
     try:
@@ -63,12 +71,19 @@ class ScreenCaptureThread(QThread):
         self.monitor = monitor
         self.fps = fps
         self.running = True
+        self.pacer = FramePacer(fps)
+        # El preview lee el último frame del anillo con su propio timer; la
+        # señal solo lleva copias para el video writer mientras se graba
+        self.ring = FrameRingBuffer(monitor['width'], monitor['height'])
+        self.emit_frames = False
 
     def run(self):
         with mss.mss() as sct:
+            self.pacer.start()
             while self.running:
                 try:
-                    start_time = time.time()
+                    # Esperar al deadline absoluto del próximo frame
+                    self.pacer.wait()
                     
                     # Capturar pantalla
                     monitor_dict = {
@@ -79,7 +94,12 @@ class ScreenCaptureThread(QThread):
                         'mon': self.monitor['mon']
                     }
                     
-                    screenshot = np.array(sct.grab(monitor_dict))
+                    index = self.ring.acquire_write()
+                    if index is None:
+                        continue  # El preview retiene todos los slots: se pierde este frame
+                    screenshot = self.ring.slots[index]
+                    shot = sct.grab(monitor_dict)
+                    np.copyto(screenshot, np.frombuffer(shot.raw, dtype=np.uint8).reshape(screenshot.shape))
                     
                     # Capturar cursor
                     cursor_img, cursor_pos = capture_cursor()
@@ -105,17 +125,13 @@ class ScreenCaptureThread(QThread):
                                 roi[..., c] = (roi[..., c] * (1 - cursor_alpha[..., 0]) + 
                                              cursor_rgb[..., c] * cursor_alpha[..., 0])
                     
-                    self.update_image_signal.emit(screenshot)
-                    
-                    # Control de FPS
-                    elapsed_time = time.time() - start_time
-                    sleep_time = max(0, (1 / self.fps) - elapsed_time)
-                    if sleep_time > 0:
-                        time.sleep(sleep_time)
+                    self.ring.publish(index)
+                    if self.emit_frames:
+                        self.update_image_signal.emit(screenshot.copy())
                         
                 except Exception as e:
                     print(f"Error en captura: {str(e)}")
-                    time.sleep(1/self.fps)  # Esperar antes de reintentar
+            self.pacer.stop()
 
     def stop(self):
         self.running = False
@@ -230,8 +246,9 @@ class StreamApp(QMainWindow):
         self.setGeometry(100, 100, 800, 600)
         self.screens = []
         self.current_screen = None
-        self.preview_label = QLabel(self)
+        self.preview = PreviewWidget(self)
         self.capture_thread = None
+        self.preview_reader = None
         self.is_recording = False
         self.video_writer = None
         self.audio_devices = self.get_audio_devices()
@@ -292,8 +309,12 @@ class StreamApp(QMainWindow):
         self.screen_selector.currentIndexChanged.connect(self.update_screen_selection)
         layout.addWidget(self.screen_selector)
 
-        self.preview_label.setAlignment(Qt.AlignCenter)
-        layout.addWidget(self.preview_label)
+        layout.addWidget(self.preview)
+
+        # Único disparador del preview: a lo sumo un frame nuevo por tick
+        self.preview_timer = QTimer()
+        self.preview_timer.timeout.connect(self.update_preview)
+        self.preview_timer.start(1000 // PREVIEW_FPS)
 
         self.add_keys_button = QPushButton("Agregar Claves", self)
         self.add_keys_button.clicked.connect(self.show_add_keys_dialog)
@@ -332,28 +353,40 @@ class StreamApp(QMainWindow):
             monitor = self.screens[self.current_screen]['monitor']
             fps = 30  # Definir FPS constante
             self.capture_thread = ScreenCaptureThread(monitor, fps)
-            self.capture_thread.update_image_signal.connect(self.update_preview)
+            self.capture_thread.emit_frames = self.is_recording
+            self.capture_thread.update_image_signal.connect(self.record_frame)
+            self.preview_reader = self.capture_thread.ring.reader()
             self.capture_thread.start()
 
-    def update_preview(self, screenshot=None):
-        if screenshot is not None:
+    def update_preview(self):
+        """Muestra el último frame capturado, solo si llegó uno nuevo desde el tick anterior."""
+        # No se dibuja mientras la ventana está minimizada u oculta
+        if self.capture_thread is None or not self.isVisible() or self.isMinimized():
+            return
+        ref = self.preview_reader.acquire_latest()
+        if ref is not None:
             try:
-                # La imagen viene en formato BGRA
-                height, width = screenshot.shape[:2]
-                
-                # Para la previsualización (convertir de BGRA a RGB)
-                preview_frame = cv2.cvtColor(screenshot, cv2.COLOR_BGRA2RGB)
-                bytes_per_line = 3 * width
-                preview_image = QImage(preview_frame.data, width, height, bytes_per_line, QImage.Format_RGB888)
-                pixmap = QPixmap.fromImage(preview_image)
-                self.preview_label.setPixmap(pixmap.scaled(self.preview_label.size(), Qt.KeepAspectRatio))
+                # La imagen viene en formato BGRA; el preview la reduce sin convertir
+                self.preview.show_frame(ref.array)
+            except Exception as e:
+                print(f"Error en update_preview: {str(e)}")
+            finally:
+                ref.release()
 
+    def set_frame_emission(self, enabled):
+        """La captura envía copias de cada frame por la señal solo mientras se graba."""
+        if self.capture_thread is not None:
+            self.capture_thread.emit_frames = enabled
+
+    def record_frame(self, screenshot=None):
+        if screenshot is not None:
+            try:
                 # Para la grabación (convertir de BGRA a BGR)
                 if self.is_recording and self.video_writer is not None:
                     record_frame = cv2.cvtColor(screenshot, cv2.COLOR_BGRA2BGR)
                     self.video_writer.write(record_frame)
             except Exception as e:
-                print(f"Error en update_preview: {str(e)}")
+                print(f"Error en record_frame: {str(e)}")
                 if self.is_recording and self.video_writer is not None:
                     try:
                         print("Intentando grabar frame sin procesar...")
@@ -397,13 +430,14 @@ class StreamApp(QMainWindow):
                     self.wav_files['mic'].setsampwidth(2)
                     self.wav_files['mic'].setframerate(44100)
 
+                    mic_converter = SampleConverter(4096, 2, 'int16')
+
                     def mic_callback(indata, frames, time, status):
                         if status:
                             print(f"Estado del micrófono: {status}")
                         if self.is_recording and len(indata) > 0:
                             try:
-                                data = (indata * 32767).astype(np.int16)
-                                self.wav_files['mic'].writeframes(data.tobytes())
+                                self.wav_files['mic'].writeframes(mic_converter.convert(indata))
                             except Exception as e:
                                 print(f"Error en callback de micrófono: {str(e)}")
 
@@ -460,15 +494,15 @@ class StreamApp(QMainWindow):
                     self.wav_files['speakers'].setsampwidth(2)
                     self.wav_files['speakers'].setframerate(44100)
 
+                    # Multiplicar por 4 para aumentar volumen, saturando en la conversión
+                    speaker_converter = SampleConverter(2048, 2, 'int16', gain=4.0)
+
                     def speaker_callback(indata, frames, time, status):
                         if status:
                             print(f"Estado del audio del sistema: {status}")
                         if self.is_recording and len(indata) > 0:
                             try:
-                                # Normalizar y amplificar el audio
-                                normalized = np.clip(indata * 4, -1, 1)  # Multiplicar por 4 para aumentar volumen
-                                data = (normalized * 32767).astype(np.int16)
-                                self.wav_files['speakers'].writeframes(data.tobytes())
+                                self.wav_files['speakers'].writeframes(speaker_converter.convert(indata))
                             except Exception as e:
                                 print(f"Error en callback de audio del sistema: {str(e)}")
 
@@ -531,21 +565,16 @@ class StreamApp(QMainWindow):
                                 def pyaudio_callback(in_data, frame_count, time_info, status):
                                     if self.is_recording:
                                         try:
-                                            # Convertir los bytes a numpy array
-                                            audio_data = np.frombuffer(in_data, dtype=np.int16)
-                                            # Normalizar a float32
-                                            normalized = audio_data.astype(np.float32) / 32768.0
-                                            # Amplificar y volver a convertir a int16
-                                            amplified = np.clip(normalized * 4, -1, 1)
-                                            data = (amplified * 32767).astype(np.int16)
-                                            self.wav_files['speakers'].writeframes(data.tobytes())
+                                            # Vista float32 de los bytes, amplificada y convertida a int16
+                                            audio_data = np.frombuffer(in_data, dtype=np.float32).reshape(-1, 2)
+                                            self.wav_files['speakers'].writeframes(speaker_converter.convert(audio_data))
                                         except Exception as e:
                                             print(f"Error en callback de PyAudio: {str(e)}")
                                     return (in_data, pyaudio.paContinue)
                                 
                                 # Configurar y iniciar el stream de PyAudio
                                 self.speaker_stream = p.open(
-                                    format=pyaudio.paInt16,
+                                    format=pyaudio.paFloat32,
                                     channels=2,
                                     rate=44100,
                                     input=True,
@@ -667,6 +696,7 @@ class StreamApp(QMainWindow):
                 
                 # Iniciar grabación de audio
                 self.is_recording = True  # Establecer is_recording antes de iniciar el audio
+                self.set_frame_emission(True)
                 self.start_audio_recording(filename_base)
                 
                 self.record_button.setText("Detener Grabación")
@@ -680,12 +710,14 @@ class StreamApp(QMainWindow):
             except Exception as e:
                 print(f"Error al crear el video: {str(e)}")
                 self.is_recording = False
+                self.set_frame_emission(False)
                 if self.video_writer:
                     self.video_writer.release()
                     self.video_writer = None
         else:
             # Detener grabación
             self.is_recording = False  # Primero marcamos que no estamos grabando
+            self.set_frame_emission(False)
             
             # Esperar un momento para asegurar que los últimos frames se escriban
             time.sleep(0.5)
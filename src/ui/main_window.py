@@ -2,19 +2,22 @@ import cv2
 import mss
 import sounddevice as sd
 from PyQt5.QtWidgets import (
-    QMainWindow, QLabel, QVBoxLayout, QWidget, QPushButton,
-    QComboBox, QDialog, QFormLayout, QLineEdit
+    QMainWindow, QLabel, QVBoxLayout, QHBoxLayout, QWidget, QPushButton,
+    QComboBox, QDialog, QFormLayout, QLineEdit, QCheckBox
 )
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtCore import QEvent, QTimer
 import os
 import asyncio
+from functools import partial
 import qasync
-from ..core.recording_manager import RecordingManager
+from ..core.recording_manager import RecordingManager, RemoteRecordingManager
 from ..core.screen_capture import ScreenCaptureThread
+from ..core.region import WindowTracker, list_windows, window_region
 from ..utils.async_utils import ProcessManager
-from ..config.settings import OUTPUT_DIR, PREVIEW_FPS
+from ..config.settings import OUTPUT_DIR, PREVIEW_FPS, CAPTURE_WORKER, AUDIO_METER_RATE, AUDIO_SILENCE_THRESHOLD_DB
 from .audio_settings import AudioSettingsDialog
+from .preview import PreviewWidget
+from .region_selector import RegionSelector
 
 def get_screen_list():
     """Retorna una lista con las pantallas disponibles usando mss."""
@@ -43,12 +46,21 @@ class StreamApp(QMainWindow):
         self.setGeometry(100, 100, 800, 600)
         
         # Inicializar managers
-        self.recording_manager = RecordingManager(OUTPUT_DIR)
+        if CAPTURE_WORKER:
+            self.recording_manager = RemoteRecordingManager(OUTPUT_DIR)
+        else:
+            self.recording_manager = RecordingManager(OUTPUT_DIR)
         self.process_manager = ProcessManager()
         
         # Variables de estado
         self.screens = []
         self.current_screen = None
+        self.capture_region = None  # None = monitor completo
+        self.window_tracker = None  # WindowTracker si se sigue una ventana
+        self.capture_index = 0  # Opción vigente del selector de área
+        self.region_selector = None
+        self.extra_capture_threads = []  # Capturas de los demás monitores durante la grabación
+        self.preview_seq = 0  # Último frame mostrado del anillo del worker
         self.is_recording = False
         self.selected_speakers = []
         self.selected_mics = []
@@ -105,18 +117,43 @@ class StreamApp(QMainWindow):
         self.screen_selector.currentIndexChanged.connect(self.update_screen_selection)
         layout.addWidget(self.screen_selector)
 
+        # Área a capturar: monitor completo, región dibujada o una ventana
+        capture_layout = QHBoxLayout()
+        self.capture_selector = QComboBox()
+        self.capture_selector.currentIndexChanged.connect(self.update_capture_selection)
+        capture_layout.addWidget(self.capture_selector, 1)
+        self.refresh_windows_button = QPushButton("Actualizar ventanas")
+        self.refresh_windows_button.clicked.connect(self.update_window_list)
+        capture_layout.addWidget(self.refresh_windows_button)
+        layout.addLayout(capture_layout)
+
+        # Los demás monitores se graban completos, cada uno con su pipeline
+        self.record_all_checkbox = QCheckBox("Grabar todos los monitores")
+        layout.addWidget(self.record_all_checkbox)
+
         # Preview
-        self.preview_label = QLabel()
-        self.preview_label.setAlignment(Qt.AlignCenter)
-        self.preview_label.setMinimumSize(640, 360)  # Tamaño mínimo para el preview
-        layout.addWidget(self.preview_label)
+        self.preview = PreviewWidget()
+        self.preview.setMinimumSize(640, 360)  # Tamaño mínimo para el preview
+        layout.addWidget(self.preview)
 
         # Botón de grabación
         self.record_button = QPushButton("Iniciar Grabación")
         self.record_button.clicked.connect(self.toggle_recording)
         layout.addWidget(self.record_button)
 
-        # Timer para actualizar el preview
+        # Estado de la finalización de grabaciones anteriores
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+        self.recording_manager.progress_callback = self.update_finalize_progress
+
+        # Niveles de audio de cada fuente durante la grabación
+        self.levels_label = QLabel()
+        layout.addWidget(self.levels_label)
+        self.levels_timer = QTimer()
+        self.levels_timer.timeout.connect(self.update_levels)
+        self.levels_timer.start(1000 // AUDIO_METER_RATE)
+
+        # Único disparador del preview: a lo sumo un frame nuevo por tick
         self.preview_timer = QTimer()
         self.preview_timer.timeout.connect(self.update_preview)
         self.preview_timer.start(1000 // PREVIEW_FPS)  # Usar PREVIEW_FPS para la actualización
@@ -125,31 +162,61 @@ class StreamApp(QMainWindow):
         self.update_screen_list()
 
     def update_preview(self):
-        """Actualiza el preview con el último frame capturado."""
-        if hasattr(self, 'capture_thread') and self.capture_thread.isRunning():
-            frame = self.capture_thread.last_frame
-            if frame is not None:
+        """Muestra el último frame capturado, solo si llegó uno nuevo desde el tick anterior."""
+        if self.recording_manager.remote:
+            self.update_remote_preview()
+        elif hasattr(self, 'capture_thread') and self.capture_thread.isRunning():
+            ref = self.preview_reader.acquire_latest()
+            if ref is not None:
                 try:
-                    # Redimensionar el frame para el preview
-                    height, width = frame.shape[:2]
-                    preview_width = min(640, width)
-                    preview_height = int(height * (preview_width / width))
-                    
-                    frame_resized = cv2.resize(frame, (preview_width, preview_height))
-                    frame_rgb = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2RGB)
-                    
-                    h, w, ch = frame_rgb.shape
-                    bytes_per_line = ch * w
-                    
-                    image = QImage(frame_rgb.data, w, h, bytes_per_line, QImage.Format_RGB888)
-                    pixmap = QPixmap.fromImage(image)
-                    self.preview_label.setPixmap(pixmap)
-
-                    # Si estamos grabando, escribir el frame original
-                    if self.is_recording and self.recording_manager.video_writer:
-                        self.recording_manager.write_frame(frame)
+                    self.preview.show_frame(ref.array)
                 except Exception as e:
                     print(f"Error en update_preview: {str(e)}")
+                finally:
+                    ref.release()
+
+    def update_remote_preview(self):
+        """Muestra el último frame que el worker publicó en el anillo compartido."""
+        ring = self.recording_manager.preview_ring
+        if ring is None:
+            return
+        latest = ring.read_latest(self.preview_seq)
+        if latest is not None:
+            seq, index, frame = latest
+            try:
+                # El worker ya lo redujo: solo se reduce otra vez si el widget se achicó
+                self.preview.load_frame(frame, scale=1)
+                # Si el worker reescribió el slot durante la copia, la copia se
+                # descarta sin mostrarse y se vuelve a leer en el próximo tick
+                if ring.is_current(index, seq):
+                    self.preview_seq = seq
+                    self.preview.present()
+            except Exception as e:
+                print(f"Error en update_preview: {str(e)}")
+
+    def update_preview_timer(self):
+        """Pausa el preview mientras la ventana está minimizada u oculta."""
+        hidden = self.isMinimized() or not self.isVisible()
+        if hidden:
+            self.preview_timer.stop()
+        elif not self.preview_timer.isActive():
+            self.preview_timer.start(1000 // PREVIEW_FPS)
+        if self.recording_manager.remote:
+            # El worker también deja de reducir frames para el anillo compartido
+            self.recording_manager.pause_preview(hidden)
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange:
+            self.update_preview_timer()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_preview_timer()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.update_preview_timer()
 
     @qasync.asyncSlot()
     async def toggle_recording(self):
@@ -159,13 +226,16 @@ class StreamApp(QMainWindow):
             self.record_button.setText("Iniciando grabación...")
             
             success = await self.recording_manager.start_recording(
-                self.screens[self.current_screen]['monitor'],
+                self.recording_areas(),
                 self.selected_speakers,
                 self.selected_mics
             )
             
             if success:
                 self.is_recording = True
+                self.set_capture_controls_enabled(False)
+                self.attach_encoder()
+                self.start_extra_captures()
                 self.record_button.setText("Detener Grabación")
             else:
                 self.record_button.setText("Iniciar Grabación")
@@ -175,11 +245,46 @@ class StreamApp(QMainWindow):
             self.record_button.setEnabled(False)
             self.record_button.setText("Deteniendo grabación...")
             
+            self.detach_encoder()
+            self.stop_extra_captures()
             await self.recording_manager.stop_recording()
             self.is_recording = False
+            self.set_capture_controls_enabled(True)
             self.record_button.setText("Iniciar Grabación")
             self.record_button.setEnabled(True)
 
+    def update_levels(self):
+        """Muestra el pico de cada fuente de audio y avisa si alguna no tiene señal."""
+        if not self.is_recording:
+            if self.levels_label.text():
+                self.levels_label.clear()
+            return
+        lines = []
+        for level in self.recording_manager.get_audio_levels().values():
+            peak = max(level['peak_db'])
+            fraction = min(1.0, max(0.0, 1 - peak / AUDIO_SILENCE_THRESHOLD_DB))
+            filled = int(round(fraction * 20))
+            line = f"{level['name']}: {'█' * filled}{'░' * (20 - filled)} {peak:.0f} dB"
+            if level['stalled']:
+                line += "  ⚠ sin datos del dispositivo"
+            elif level['silent']:
+                line += "  ⚠ sin señal"
+            lines.append(line)
+        self.levels_label.setText('\n'.join(lines))
+
+    def update_finalize_progress(self, final_file, event):
+        """Muestra el progreso de la combinación de audio y video."""
+        name = os.path.basename(final_file)
+        if event['done']:
+            self.status_label.setText(f"✓ {name} listo")
+            return
+        text = f"Finalizando {name}"
+        if event['percent'] is not None:
+            text += f": {event['percent']:.0f}%"
+        if event['eta'] is not None:
+            text += f" (quedan {event['eta']:.0f} s)"
+        self.status_label.setText(text)
+
     def update_screen_list(self):
         """Actualiza la lista de pantallas disponibles."""
         self.screens = get_screen_list()
@@ -196,18 +301,152 @@ class StreamApp(QMainWindow):
         """Actualiza la selección de pantalla."""
         if 0 <= index < len(self.screens):
             self.current_screen = index
-            if hasattr(self, 'capture_thread') and self.capture_thread is not None:
-                self.capture_thread.stop()
-            self.start_capture_thread()
+            self.update_window_list()
+            self.set_capture_region(None)
+
+    def update_window_list(self):
+        """Rellena el selector de área con las ventanas visibles del monitor actual."""
+        self.capture_selector.blockSignals(True)
+        self.capture_selector.clear()
+        self.capture_selector.addItem("Pantalla completa", None)
+        self.capture_selector.addItem("Dibujar región...", 'region')
+        if self.current_screen is not None:
+            for window in list_windows(self.screens[self.current_screen]['monitor']):
+                self.capture_selector.addItem(f"Ventana: {window['title'][:60]}", window['hwnd'])
+        # Conservar la opción vigente si la ventana seguida sigue en la lista
+        index = 0
+        if self.window_tracker is not None:
+            index = max(0, self.capture_selector.findData(self.window_tracker.hwnd))
+        elif self.capture_region is not None:
+            index = 1
+            self.capture_selector.setItemText(1, self.region_label(self.capture_region))
+        self.capture_index = index
+        self.capture_selector.setCurrentIndex(index)
+        self.capture_selector.blockSignals(False)
+
+    def update_capture_selection(self, index):
+        """Aplica la opción elegida en el selector de área."""
+        if self.current_screen is None or index < 0:
+            return
+        monitor = self.screens[self.current_screen]['monitor']
+        data = self.capture_selector.itemData(index)
+        if data is None:
+            self.capture_selector.setItemText(1, "Dibujar región...")
+            self.set_capture_region(None)
+        elif data == 'region':
+            # La región se aplica cuando el overlay la emite
+            self.region_selector = RegionSelector(monitor)
+            self.region_selector.region_selected.connect(self.on_region_selected)
+            self.region_selector.show()
+            return
+        else:
+            try:
+                region = window_region(data, monitor)
+            except ValueError as e:
+                print(f"Error al seleccionar ventana: {str(e)}")
+                self.restore_capture_selection()
+                return
+            self.set_capture_region(region, WindowTracker(data, monitor))
+        self.capture_index = index
+
+    def on_region_selected(self, region):
+        """Recibe la región dibujada (None si se canceló)."""
+        self.region_selector = None
+        if region is None:
+            self.restore_capture_selection()
+            return
+        self.capture_selector.setItemText(1, self.region_label(region))
+        self.capture_index = 1
+        self.set_capture_region(region)
+
+    def restore_capture_selection(self):
+        self.capture_selector.blockSignals(True)
+        self.capture_selector.setCurrentIndex(self.capture_index)
+        self.capture_selector.blockSignals(False)
+
+    def region_label(self, region):
+        return f"Región {region['width']}x{region['height']}"
+
+    def set_capture_region(self, region, tracker=None):
+        """Cambia el área capturada (None = monitor completo) y reinicia la captura."""
+        self.capture_region = region
+        self.window_tracker = tracker
+        if hasattr(self, 'capture_thread') and self.capture_thread is not None:
+            self.capture_thread.stop()
+        self.start_capture_thread()
+
+    def capture_area(self):
+        """Región que se graba: la elegida o el monitor completo."""
+        return self.capture_region or self.screens[self.current_screen]['monitor']
+
+    def recording_areas(self):
+        """Áreas a grabar: la del preview primero (lleva el audio) y, si se pidió, los demás monitores."""
+        areas = [self.capture_area()]
+        if self.record_all_checkbox.isChecked():
+            areas += [screen['monitor'] for i, screen in enumerate(self.screens) if i != self.current_screen]
+        return areas
+
+    def start_extra_captures(self):
+        """Inicia una captura por cada monitor adicional, conectada a su encoder."""
+        if self.recording_manager.remote:
+            return  # El worker inicia sus propias capturas
+        for index, area in enumerate(self.recording_areas()[1:], start=1):
+            thread = ScreenCaptureThread(area)
+            thread.frame_callback = partial(self.recording_manager.write_frame, index=index)
+            self.recording_manager.attach_pacer(thread.capture.pacer, index)
+            thread.start()
+            self.extra_capture_threads.append(thread)
+
+    def stop_extra_captures(self):
+        for thread in self.extra_capture_threads:
+            thread.frame_callback = None
+            thread.stop()
+        self.extra_capture_threads = []
+
+    def set_capture_controls_enabled(self, enabled):
+        """El tamaño del video queda fijo durante la grabación: no se puede cambiar el área."""
+        self.screen_selector.setEnabled(enabled)
+        self.capture_selector.setEnabled(enabled)
+        self.refresh_windows_button.setEnabled(enabled)
+        self.record_all_checkbox.setEnabled(enabled)
 
     def start_capture_thread(self):
         """Inicia el thread de captura de pantalla."""
         if self.current_screen is not None:
             monitor = self.screens[self.current_screen]['monitor']
-            self.capture_thread = ScreenCaptureThread(monitor)
-            self.capture_thread.update_image_signal.connect(self.update_preview)
+            if self.recording_manager.remote:
+                asyncio.ensure_future(self.start_remote_capture(monitor))
+                return
+            self.capture_thread = ScreenCaptureThread(monitor, self.capture_region, self.window_tracker)
+            self.preview_reader = self.capture_thread.ring.reader()
+            if self.is_recording:
+                self.attach_encoder()
             self.capture_thread.start()
 
+    async def start_remote_capture(self, monitor):
+        """Inicia la captura en el worker; el preview se lee de su anillo cuando responde."""
+        try:
+            # Antes de mostrarse la ventana el widget todavía no tiene su tamaño final
+            max_size = (max(self.preview.width(), self.preview.minimumWidth()),
+                        max(self.preview.height(), self.preview.minimumHeight()))
+            await self.recording_manager.start_capture(
+                monitor, self.capture_region, self.window_tracker, max_size
+            )
+            self.preview_seq = 0
+        except RuntimeError as e:
+            print(f"Error al iniciar la captura: {str(e)}")
+
+    def attach_encoder(self):
+        """Conecta el thread de captura directamente con el encoder."""
+        if hasattr(self, 'capture_thread') and self.capture_thread is not None:
+            self.capture_thread.frame_callback = self.recording_manager.write_frame
+            self.recording_manager.attach_pacer(self.capture_thread.capture.pacer)
+
+    def detach_encoder(self):
+        """Desconecta el thread de captura del encoder."""
+        if hasattr(self, 'capture_thread') and self.capture_thread is not None:
+            self.capture_thread.frame_callback = None
+
     def show_audio_settings(self):
         """Muestra el diálogo de configuración de audio."""
         dialog = AudioSettingsDialog(self)
@@ -219,7 +458,13 @@ class StreamApp(QMainWindow):
         if self.is_recording:
             self.loop.run_until_complete(self.recording_manager.stop_recording())
         
+        # Las finalizaciones pendientes se cancelan conservando los temporales;
+        # con el worker siguen en su proceso después de cerrar la ventana
+        if not self.recording_manager.remote and self.recording_manager.is_finalizing():
+            self.recording_manager.cancel_finalize()
+
         # Limpiar recursos
+        self.stop_extra_captures()
         if hasattr(self, 'capture_thread') and self.capture_thread is not None:
             self.capture_thread.stop()
         
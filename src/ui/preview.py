@@ -0,0 +1,77 @@
+"""Widget de previsualización: reduce frames BGRA a un buffer reutilizado y los pinta sin conversiones."""
+import cv2
+import numpy as np
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage, QPainter
+from PyQt5.QtWidgets import QWidget
+from ..config.settings import PREVIEW_SCALE
+from ..utils.video_utils import preview_size
+
+class PreviewWidget(QWidget):
+    """Muestra frames BGRA reducidos con ``cv2.INTER_AREA``.
+
+    El tamaño sale de ``preview_size`` (fracción entera del frame que entra
+    en el widget). El frame se reduce directamente a un buffer BGRA que se reutiliza
+    mientras no cambie el tamaño; si ya tiene ese tamaño solo se copia. Ese
+    buffer se envuelve como ``QImage.Format_RGB32``, cuyo orden de bytes en
+    memoria (0xffRRGGBB en little-endian) es el mismo BGRA de la captura: no
+    hay conversión de color ni ``QPixmap`` intermedio y ``paintEvent`` dibuja
+    la imagen tal cual.
+
+    Hay dos buffers: ``load_frame`` escribe en el de atrás y ``present`` lo
+    intercambia con el que se pinta, así un frame que resulte inválido
+    después de copiarlo nunca llega a la pantalla.
+    """
+
+    def __init__(self, parent=None, scale=PREVIEW_SCALE):
+        super().__init__(parent)
+        self.scale = scale
+        self._buffer = None
+        self._image = None
+        self._back = None
+        self._back_image = None
+        self.frames = 0  # Frames mostrados
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+
+    def show_frame(self, frame):
+        """Reduce ``frame`` (BGRA) al buffer del preview y agenda un repintado."""
+        self.load_frame(frame)
+        self.present()
+
+    def load_frame(self, frame, scale=None):
+        """Reduce ``frame`` al buffer de atrás sin repintar.
+
+        ``scale`` reemplaza a la escala del widget; con 1 un frame que ya
+        entra en el widget (el anillo del worker, ya reducido) solo se copia.
+        """
+        height, width = frame.shape[:2]
+        size = preview_size(width, height, self.scale if scale is None else scale,
+                            self.width(), self.height())
+        if self._back is None or self._back.shape[1::-1] != size:
+            self._back = np.empty((size[1], size[0], 4), dtype=np.uint8)
+            self._back_image = QImage(self._back.data, size[0], size[1], size[0] * 4, QImage.Format_RGB32)
+        if size == (width, height):
+            np.copyto(self._back, frame)
+        else:
+            cv2.resize(frame, size, dst=self._back, interpolation=cv2.INTER_AREA)
+
+    def present(self):
+        """Pasa el último frame cargado al frente y agenda un repintado."""
+        self._buffer, self._back = self._back, self._buffer
+        self._image, self._back_image = self._back_image, self._image
+        self.frames += 1
+        self.update()
+
+    def clear(self):
+        self._buffer = None
+        self._image = None
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.black)
+        if self._image is not None:
+            x = (self.width() - self._image.width()) // 2
+            y = (self.height() - self._image.height()) // 2
+            painter.drawImage(x, y, self._image)
+        painter.end()
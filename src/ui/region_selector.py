@@ -0,0 +1,82 @@
+"""Overlay para dibujar con el mouse la región de un monitor que se va a capturar."""
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtCore import Qt, QRect, pyqtSignal
+from PyQt5.QtGui import QColor, QPainter, QPen
+from ..core.region import make_region
+
+class RegionSelector(QWidget):
+    """Cubre ``monitor`` con una capa semitransparente; arrastrar define la región y Esc cancela.
+
+    Emite ``region_selected`` con el dict de ``make_region`` (coordenadas
+    absolutas de mss, lados pares), o con None si se cerró sin una región válida.
+    """
+    region_selected = pyqtSignal(object)
+
+    def __init__(self, monitor):
+        super().__init__(None, Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
+        self.monitor = monitor
+        self.origin = None
+        self.current = None
+        self.region = None
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.setCursor(Qt.CrossCursor)
+        self.setGeometry(monitor['left'], monitor['top'], monitor['width'], monitor['height'])
+
+    def selection(self):
+        if self.origin is None or self.current is None:
+            return None
+        return QRect(self.origin, self.current).normalized()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.origin = event.pos()
+            self.current = event.pos()
+            self.update()
+
+    def mouseMoveEvent(self, event):
+        if self.origin is not None:
+            self.current = event.pos()
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        if event.button() != Qt.LeftButton or self.origin is None:
+            return
+        self.current = event.pos()
+        rect = self.selection()
+        # Coordenadas del widget -> píxeles físicos del monitor (por si Qt escala por DPI)
+        ratio_x = self.monitor['width'] / max(1, self.width())
+        ratio_y = self.monitor['height'] / max(1, self.height())
+        try:
+            self.region = make_region(
+                self.monitor,
+                self.monitor['left'] + int(rect.left() * ratio_x),
+                self.monitor['top'] + int(rect.top() * ratio_y),
+                int(rect.width() * ratio_x),
+                int(rect.height() * ratio_y)
+            )
+        except ValueError as e:
+            print(f"Error al seleccionar región: {str(e)}")
+        self.close()
+
+    def closeEvent(self, event):
+        self.region_selected.emit(self.region)
+        super().closeEvent(event)
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Escape:
+            self.close()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        # Opacidad mínima fuera de cero: con fondo totalmente transparente
+        # Windows deja pasar los clics a las ventanas de abajo
+        painter.fillRect(self.rect(), QColor(0, 0, 0, 100))
+        rect = self.selection()
+        if rect is not None:
+            painter.setCompositionMode(QPainter.CompositionMode_Source)
+            painter.fillRect(rect, QColor(0, 0, 0, 1))
+            painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+            painter.setPen(QPen(QColor(255, 64, 64), 2))
+            painter.drawRect(rect)
+        painter.end()
@@ -0,0 +1,697 @@
+"""Benchmarks y verificaciones de rendimiento del pipeline de grabación.
+
+Uso: ``python -m src.utils.benchmarks <nombre>``. Cada verificación lanza
+``AssertionError`` si el resultado no cumple lo esperado.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from ..config.settings import CURSOR_ONLY_MAX_FRAMES, FFMPEG_PATH, PREVIEW_FPS, PREVIEW_SCALE, VIDEO_FPS
+from ..core.frame_buffer import FrameRingBuffer, SharedPreviewRing
+from ..core.compositor import CursorSprite, FrameCompositor
+from ..core.damage import SampledChangeDetector, TileDamageDetector
+from ..core.resampler import PolyphaseResampler
+from ..core.sample_format import SAMPLE_FORMATS, SampleConverter
+from ..core.loudness import LoudnessMeter
+from ..core.audio_capture import LevelMeter
+from ..core.encoder import FrameEncoderThread
+from ..core.ffmpeg_encoder import FFmpegPipeWriter
+from .timing import FramePacer
+from .video_utils import (
+    build_combine_command, preview_size, transcode_segments_async, transcode_workers
+)
+
+# Memoria que puede variar durante la verificación sin contar como asignación
+# por frame (objetos pequeños de Python, nunca un buffer de imagen)
+ALLOCATION_TOLERANCE = 16 * 1024
+# Margen al comparar el mejor tiempo de dos caminos medidos en rondas
+# intercaladas: en una máquina compartida la relación entre dos caminos
+# equivalentes varía hasta ~25% según la carga, así que menos es ruido
+TIMING_TOLERANCE = 1.25
+
+def check_capture_allocations(frames=300, width=1920, height=1080, warmup=10):
+    """Verifica con tracemalloc que el camino de captura no asigna memoria por frame.
+
+    Procesa ``frames`` capturas sintéticas con cursor a través del anillo, el
+    detector de cambios y el compositor (incluido el camino de solo cursor),
+    tal como lo hace ``ScreenCaptureThread``. Falla si la memoria
+    crece o si el pico supera ``ALLOCATION_TOLERANCE``, lo que indicaría un
+    array temporal por frame.
+    """
+    rng = np.random.default_rng(0)
+    sources = [
+        rng.integers(0, 256, size=(height, width, 4), dtype=np.uint8)
+        for _ in range(2)
+    ]
+    cursor = CursorSprite.from_bgra(rng.integers(0, 256, size=(32, 32, 4), dtype=np.uint8))
+    ring = FrameRingBuffer(width, height)
+    compositor = FrameCompositor(ring)
+    detector = SampledChangeDetector(width, height)
+    reader = ring.reader()
+    # Incluye posiciones parcialmente fuera de pantalla para cubrir el recorte
+    positions = [((i * 37) % (width + 40) - 20, (i * 23) % (height + 40) - 20) for i in range(frames)]
+
+    def step(i):
+        x, y = positions[i]
+        if i % 3:
+            compositor.update_cursor(cursor, x, y)
+        else:
+            source = sources[(i // 3) & 1]
+            detector.update(source)
+            compositor.process(source, cursor, x, y)
+        ref = reader.acquire_latest()
+        if ref is not None:
+            ref.release()
+
+    for i in range(warmup):
+        step(i)
+
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        for i in range(frames):
+            step(i)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        'frames': frames,
+        'growth_bytes': current - baseline,
+        'peak_bytes': peak - baseline,
+        'frame_bytes': width * height * 4
+    }
+    assert result['growth_bytes'] <= ALLOCATION_TOLERANCE, f"La memoria creció: {result}"
+    assert result['peak_bytes'] <= ALLOCATION_TOLERANCE, f"Asignación por frame detectada: {result}"
+    return result
+
+def check_cursor_updates(grabs=50, width=1920, height=1080, held_frames=2):
+    """Verifica que los frames de solo cursor restauren únicamente el rectángulo del cursor.
+
+    Simula el bucle de captura con los valores por defecto: una captura
+    completa cada ``CURSOR_ONLY_MAX_FRAMES + 1`` frames y un lector que, como
+    la cola del encoder, retiene los últimos ``held_frames`` frames. Cuenta
+    qué camino usa ``update_cursor`` y compara cada frame con la base más el
+    cursor compuesto desde cero.
+    """
+    rng = np.random.default_rng(0)
+    sources = [rng.integers(0, 256, size=(height, width, 4), dtype=np.uint8) for _ in range(2)]
+    cursor = CursorSprite.from_bgra(rng.integers(0, 256, size=(32, 32, 4), dtype=np.uint8))
+    ring = FrameRingBuffer(width, height)
+    compositor = FrameCompositor(ring)
+    reader = ring.reader()
+    expected = np.empty_like(sources[0])
+    held = []
+    mismatches = 0
+    for i in range(grabs * (CURSOR_ONLY_MAX_FRAMES + 1)):
+        x, y = (i * 37) % width, (i * 23) % height
+        if i % (CURSOR_ONLY_MAX_FRAMES + 1):
+            compositor.update_cursor(cursor, x, y)
+            np.copyto(expected, compositor.base)
+            compositor.blend_cursor(expected, cursor, x, y)
+            check = True
+        else:
+            compositor.process(sources[(i // (CURSOR_ONLY_MAX_FRAMES + 1)) & 1], cursor, x, y)
+            check = False
+        ref = reader.acquire_latest()
+        if check and not np.array_equal(ref.array, expected):
+            mismatches += 1
+        held.append(ref)
+        if len(held) > held_frames:
+            held.pop(0).release()
+
+    result = {
+        'cursor_frames': compositor.rect_restores + compositor.full_restores,
+        'rect_restores': compositor.rect_restores,
+        'full_restores': compositor.full_restores,
+        'mismatches': mismatches
+    }
+    assert mismatches == 0, f"Frames de solo cursor con contenido incorrecto: {result}"
+    # Tras cada captura, la base se copia completa solo hasta que hay un slot con
+    # ella que no está retenido ni publicado como último
+    assert compositor.full_restores <= grabs * held_frames, f"El camino del rectángulo no se usa: {result}"
+    return result
+
+def bench_damage_detection(frames=50, sizes=((1920, 1080), (3840, 2160))):
+    """Mide el costo de la detección de cambios por tiles y verifica que detecta cambios mínimos.
+
+    Un píxel modificado y dos píxeles intercambiados dentro del mismo tile
+    deben marcar exactamente un tile; un frame idéntico debe dar ratio 0.
+    Se mide con la pantalla estática y con todos los tiles cambiando (el
+    peor caso, que además copia el frame): ambos deben entrar con holgura
+    en el intervalo de un frame a ``VIDEO_FPS``, porque corren en el thread
+    del encoder.
+    """
+    rng = np.random.default_rng(0)
+    budget_ms = 1000 / VIDEO_FPS
+    result = {'budget_ms': budget_ms}
+    for width, height in sizes:
+        frame = rng.integers(0, 256, size=(height, width, 4), dtype=np.uint8)
+        detector = TileDamageDetector(width, height)
+        one_tile = 1 / detector.tile_count
+
+        detector.update(frame)
+        assert detector.update(frame) == 0.0, "Un frame idéntico no se detectó como duplicado"
+        changed = frame.copy()
+        changed[height // 2, width // 2, 1] ^= 1
+        assert detector.update(changed) == one_tile, "No se detectó el cambio de un píxel"
+        swapped = changed.copy()
+        swapped[0, 0], swapped[0, 1] = changed[0, 1], changed[0, 0]
+        if not np.array_equal(swapped, changed):
+            assert detector.update(swapped) == one_tile, "No se detectó el intercambio de píxeles"
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            detector.update(frame)
+        static = (time.perf_counter() - start) / frames * 1000
+
+        inverted = np.bitwise_not(frame)
+        start = time.perf_counter()
+        for i in range(frames):
+            detector.update(inverted if i % 2 == 0 else frame)
+        changing = (time.perf_counter() - start) / frames * 1000
+        assert detector.ratio == 1.0, "Un frame distinto no marcó todos los tiles"
+
+        result[f'{width}x{height}'] = {
+            'tiles': detector.tile_count,
+            'static_ms': static,
+            'changing_ms': changing
+        }
+        assert changing < budget_ms / 2, f"La detección de cambios no entra en el frame: {result}"
+    return result
+
+def check_frame_pacing(seconds=10, fps=30, late_policy='skip'):
+    """Verifica que el pacer entregue ``seconds * fps`` deadlines sin deriva.
+
+    Simula trabajo variable por frame, incluida una pausa de 5 frames, y
+    falla si frames entregados más saltados se apartan del total esperado.
+    """
+    rng = np.random.default_rng(0)
+    pacer = FramePacer(fps, late_policy=late_policy)
+    total = seconds * fps
+    pacer.start()
+    try:
+        while pacer.frame_index < total:
+            pacer.wait()
+            work = rng.uniform(0.2, 0.8) / fps
+            if pacer.frames == total // 2:
+                work = 5 / fps  # Pausa larga: obliga a saltar o recuperar deadlines
+            time.sleep(work)
+    finally:
+        pacer.stop()
+
+    result = pacer.stats()
+    delivered = result['frames'] + result['skipped']
+    assert delivered == total, f"Deadlines entregados {delivered} != {total}: {result}"
+    if late_policy == 'catch_up':
+        assert result['frames'] == total, f"Frames perdidos en modo catch_up: {result}"
+    return result
+
+def bench_resampler(seconds=30, in_rate=48000, out_rate=44100, channels=2, block=1024):
+    """Mide el costo de CPU del resampler por segundo de canal y verifica su precisión.
+
+    Resamplea senos de 1 kHz y 3 kHz en bloques de ``block`` frames, como
+    llegan del callback, y compara contra los senos ideales a ``out_rate``:
+    falla si la relación señal/error queda bajo 70 dB o si se pierden muestras.
+    """
+    resampler = PolyphaseResampler(in_rate, out_rate, channels, max_block=block)
+    t = np.arange(int(seconds * in_rate)) / in_rate
+    freqs = (1000.0, 3000.0)
+    signal = np.stack([0.5 * np.sin(2 * np.pi * freqs[c % 2] * t) for c in range(channels)], axis=1)
+    signal = signal.astype(np.float32)
+
+    output = np.zeros((int(len(signal) * out_rate / in_rate) + block, channels), dtype=np.float32)
+    produced = 0
+    start = time.process_time()
+    for offset in range(0, len(signal), block):
+        out = resampler.process(signal[offset:offset + block])
+        output[produced:produced + len(out)] = out
+        produced += len(out)
+    cpu = time.process_time() - start
+
+    expected = len(signal) * out_rate / in_rate
+    assert abs(produced - expected) <= resampler.taps, f"Muestras producidas {produced} != {expected:.0f}"
+    j = np.arange(produced) / out_rate
+    reference = np.stack([0.5 * np.sin(2 * np.pi * freqs[c % 2] * j) for c in range(channels)], axis=1)
+    edge = resampler.taps
+    error = output[edge:produced - edge] - reference[edge:produced - edge]
+    snr = 10 * np.log10(np.mean(reference[edge:produced - edge] ** 2) / np.mean(error ** 2))
+    assert snr > 70, f"Relación señal/error insuficiente: {snr:.1f} dB"
+    return {
+        'seconds': seconds,
+        'cpu_ms_per_channel_second': cpu / (seconds * channels) * 1000,
+        'realtime_factor': seconds / cpu if cpu else float('inf'),
+        'snr_db': float(snr)
+    }
+
+def bench_sample_format(blocks=2000, frames=4410, channels=2, rounds=10):
+    """Mide cada camino de conversión de muestras y verifica saturación y asignaciones.
+
+    Convierte ``blocks`` bloques de ``frames`` frames (0.1 s, lo que escribe
+    un ``AudioWriterThread`` por ciclo) en cada formato, con y sin dither, y
+    lo compara con ``(x * 32767).astype(np.int16)``. Falla si un valor fuera
+    de rango da la vuelta en lugar de saturar, si la conversión asigna memoria
+    o si int16 (con redondeo y saturación) es más lenta que esa conversión;
+    los tiempos son el mejor de ``rounds`` rondas intercaladas.
+    """
+    rng = np.random.default_rng(0)
+    block = rng.uniform(-1.2, 1.2, size=(frames, channels)).astype(np.float32)
+    # -1.0 no entra: con dither puede redondear legítimamente a -32767
+    edges = np.array([[1.0, -1.5], [1.5, -1.5]], dtype=np.float32)
+    results = {}
+    per_round = blocks // rounds
+
+    def ns_per_sample(convert):
+        start = time.perf_counter()
+        for _ in range(per_round):
+            convert(block)
+        return (time.perf_counter() - start) / (per_round * block.size) * 1e9
+
+    def naive(samples):
+        return (samples * 32767).astype(np.int16).tobytes()
+
+    results['naive_int16_ns_per_sample'] = float('inf')
+
+    for sample_format in SAMPLE_FORMATS:
+        for dither in (False, True):
+            if dither and sample_format == 'float32':
+                continue
+            converter = SampleConverter(frames, channels, sample_format, dither=dither)
+            if sample_format == 'int16':
+                edge = np.frombuffer(bytes(converter.convert(edges)), dtype=np.int16)
+                assert edge.tolist() == [32767, -32768] * 2, f"int16 no satura: {edge.tolist()}"
+            elif sample_format == 'int24':
+                raw = np.frombuffer(bytes(converter.convert(edges)), dtype=np.uint8).reshape(-1, 3)
+                edge = raw[:, 0].astype(np.int32) | raw[:, 1].astype(np.int32) << 8 | raw[:, 2].astype(np.int32) << 16
+                edge = np.where(edge >= 1 << 23, edge - (1 << 24), edge)
+                assert edge.tolist() == [8388607, -8388608] * 2, f"int24 no satura: {edge.tolist()}"
+
+            name = f"{sample_format}{'_dither' if dither else ''}"
+            converter.convert(block)
+            tracemalloc.start()
+            for _ in range(10):
+                converter.convert(block)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            assert peak < ALLOCATION_TOLERANCE, f"{name} asigna memoria por bloque: {peak} bytes"
+
+            # int16 se intercala con la conversión ingenua para que el ruido
+            # de la máquina afecte a las dos por igual
+            results[f"{name}_ns_per_sample"] = float('inf')
+            for _ in range(rounds):
+                if name == 'int16':
+                    results['naive_int16_ns_per_sample'] = min(results['naive_int16_ns_per_sample'], ns_per_sample(naive))
+                results[f"{name}_ns_per_sample"] = min(results[f"{name}_ns_per_sample"], ns_per_sample(converter.convert))
+    assert results['int16_ns_per_sample'] <= results['naive_int16_ns_per_sample'] * TIMING_TOLERANCE, \
+        f"La conversión int16 es más lenta que astype: {results}"
+    return results
+
+def check_loudness(sample_rate=48000, block=4410):
+    """Verifica el medidor de sonoridad con las señales de referencia de EBU y mide su costo.
+
+    Un seno de 1 kHz a -23 dBFS en ambos canales debe medir -23 LUFS, y 20 s
+    a -20 LUFS seguidos de 20 s a -30 LUFS deben dar un LRA de 10 LU (EBU
+    Tech 3341/3342, con tolerancia de ±0.1).
+    """
+    t = np.arange(sample_rate * 20) / sample_rate
+    tone = np.sin(2 * np.pi * 1000 * t)
+
+    def measure(signal):
+        meter = LoudnessMeter(sample_rate, 2)
+        stereo = np.stack([signal, signal], axis=1).astype(np.float32)
+        start = time.process_time()
+        for offset in range(0, len(stereo), block):
+            meter.process(stereo[offset:offset + block])
+        return meter, time.process_time() - start
+
+    meter, cpu = measure(tone * 10 ** (-23 / 20))
+    integrated = meter.integrated()
+    assert abs(integrated + 23) <= 0.1, f"Sonoridad integrada {integrated:.2f} LUFS != -23"
+
+    steps, _ = measure(np.concatenate([tone * 10 ** (-20 / 20), tone * 10 ** (-30 / 20)]))
+    lra = steps.loudness_range()
+    assert abs(lra - 10) <= 0.1, f"LRA {lra:.2f} LU != 10"
+    return {
+        'integrated_lufs': integrated,
+        'loudness_range_lu': lra,
+        'cpu_ms_per_channel_second': cpu / (len(tone) / sample_rate * 2) * 1000
+    }
+
+def check_level_meter(callbacks=20000, sample_rate=48000, block=1024, channels=2):
+    """Mide el costo del medidor de niveles por callback y verifica la alarma de silencio.
+
+    Falla si ``process`` asigna memoria, si la alarma no se activa al
+    cumplirse ``alarm_seconds`` de silencio o si no se apaga al volver la señal.
+    """
+    rng = np.random.default_rng(0)
+    signal = rng.uniform(-0.5, 0.5, size=(block, channels)).astype(np.float32)
+    silence = np.zeros((block, channels), dtype=np.float32)
+    meter = LevelMeter(sample_rate, channels)
+
+    meter.process(signal)
+    tracemalloc.start()
+    for _ in range(100):
+        meter.process(signal)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < ALLOCATION_TOLERANCE, f"El medidor asigna memoria por callback: {peak} bytes"
+
+    start = time.perf_counter()
+    for _ in range(callbacks):
+        meter.process(signal)
+    elapsed = time.perf_counter() - start
+    assert not meter.silent and abs(meter.peak.max() - 0.5) < 0.01, "Niveles incorrectos con señal"
+
+    silent_callbacks = 0
+    while not meter.silent:
+        meter.process(silence)
+        silent_callbacks += 1
+    alarm_after = silent_callbacks * block / sample_rate
+    assert abs(alarm_after - meter.alarm_seconds) <= 2 * meter.window / sample_rate, \
+        f"La alarma se activó a los {alarm_after:.2f} s"
+    for _ in range(meter.window // block + 1):
+        meter.process(signal)
+    assert not meter.silent, "La alarma no se apagó al volver la señal"
+    return {
+        'us_per_callback': elapsed / callbacks * 1e6,
+        'callback_budget_us': block / sample_rate * 1e6,
+        'alarm_after_seconds': alarm_after
+    }
+
+def bench_region_capture(frames=100, monitor=(3840, 2160), region=(1280, 720)):
+    """Compara el costo por frame del camino de captura para un monitor completo y para una región.
+
+    Pasa frames sintéticos por el detector de cambios y el compositor (lo
+    que hace ``ScreenCaptureThread`` tras cada grab) con anillos del tamaño
+    de cada área: bytes y tiempo por frame deben escalar con el área.
+    """
+    rng = np.random.default_rng(0)
+    cursor = CursorSprite.from_bgra(rng.integers(0, 256, size=(32, 32, 4), dtype=np.uint8))
+    result = {}
+    for name, (width, height) in (('monitor', monitor), ('region', region)):
+        source = rng.integers(0, 256, size=(height, width, 4), dtype=np.uint8)
+        ring = FrameRingBuffer(width, height)
+        compositor = FrameCompositor(ring)
+        detector = SampledChangeDetector(width, height)
+        reader = ring.reader()
+        start = time.perf_counter()
+        for i in range(frames):
+            detector.update(source)
+            compositor.process(source, cursor, i % width, i % height)
+            ref = reader.acquire_latest()
+            if ref is not None:
+                ref.release()
+        elapsed = time.perf_counter() - start
+        result[name] = {
+            'size': (width, height),
+            'mb_per_second': width * height * 4 * VIDEO_FPS / 1e6,
+            'ms_per_frame': elapsed / frames * 1000
+        }
+    area_ratio = (monitor[0] * monitor[1]) / (region[0] * region[1])
+    result['area_ratio'] = area_ratio
+    result['time_ratio'] = result['monitor']['ms_per_frame'] / result['region']['ms_per_frame']
+    assert result['time_ratio'] > area_ratio / 3, f"El costo no escala con el área: {result}"
+    return result
+
+def bench_multi_monitor(max_monitors=4, frames=90, width=1920, height=1080):
+    """Throughput de captura + codificación en función de la cantidad de monitores.
+
+    Para cada cantidad ``n`` se arman ``n`` pipelines independientes como los
+    de ``RecordingManager``: un thread productor por monitor (detector de
+    cambios, compositor y anillo, lo que hace ``ScreenCaptureThread``), un
+    ``FrameEncoderThread`` y un proceso ffmpeg propio. Los frames sintéticos
+    cambian en cada frame y se entregan sin pausas, así que se mide el máximo
+    sostenible. La eficiencia compara con ``n`` veces el throughput de un
+    monitor; depende de los núcleos disponibles (``os.cpu_count()``).
+    """
+    rng = np.random.default_rng(0)
+    cursor = CursorSprite.from_bgra(rng.integers(0, 256, size=(32, 32, 4), dtype=np.uint8))
+    # Gradiente con una barra que se desplaza: contenido comprimible pero distinto en cada frame
+    base = np.zeros((height, width, 4), dtype=np.uint8)
+    base[..., 0] = np.linspace(0, 255, width, dtype=np.uint8)
+    base[..., 1] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+    sources = []
+    for i in range(8):
+        source = base.copy()
+        bar = i * width // 8
+        source[:, bar:bar + width // 16, 2] = 255
+        sources.append(source)
+
+    def produce(ring, encoder):
+        compositor = FrameCompositor(ring)
+        detector = SampledChangeDetector(width, height)
+        for i in range(frames):
+            source = sources[i % len(sources)]
+            detector.update(source)
+            result = compositor.process(source, cursor, i % width, i % height)
+            while result is None:
+                time.sleep(0.001)  # Anillo lleno: esperar a que el encoder libere slots
+                result = compositor.process(source, cursor, i % width, i % height)
+            ref = ring.acquire(result[0])
+            if ref is not None and not encoder.submit(ref):
+                ref.release()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for count in range(1, max_monitors + 1):
+            writers = [
+                FFmpegPipeWriter(os.path.join(directory, f"bench_{count}_{i}.mkv"), width, height, VIDEO_FPS)
+                for i in range(count)
+            ]
+            for writer in writers:
+                assert writer.open(), "No se pudo iniciar ffmpeg"
+            encoders = [FrameEncoderThread(writer, overflow_policy='block') for writer in writers]
+            producers = [
+                threading.Thread(target=produce, args=(FrameRingBuffer(width, height), encoder))
+                for encoder in encoders
+            ]
+            start = time.perf_counter()
+            for encoder in encoders:
+                encoder.start()
+            for producer in producers:
+                producer.start()
+            for producer in producers:
+                producer.join()
+            for encoder, writer in zip(encoders, writers):
+                encoder.stop()
+                writer.release()
+            elapsed = time.perf_counter() - start
+            encoded = sum(encoder.encoded_frames for encoder in encoders)
+            assert encoded == count * frames, f"Se perdieron frames: {encoded} de {count * frames}"
+            results.append({'monitors': count, 'fps': encoded / elapsed})
+
+    single = results[0]['fps']
+    for result in results:
+        result['fps_per_monitor'] = result['fps'] / result['monitors']
+        result['efficiency'] = result['fps'] / (single * result['monitors'])
+    return {'size': (width, height), 'cpus': os.cpu_count(), 'results': results}
+
+def bench_preview(frames=200, width=2560, height=1440, scale=PREVIEW_SCALE, max_width=1280, max_height=720):
+    """Compara el preview anterior (resize + cvtColor a RGB) con la reducción INTER_AREA a un buffer BGRA reutilizado.
+
+    Mide solo el trabajo de OpenCV (sin Qt) para un widget de
+    ``max_width`` x ``max_height``: el camino nuevo no convierte color y
+    ``cv2.resize`` escribe sobre el mismo buffer en cada frame.
+    """
+    frame = np.random.default_rng(0).integers(0, 256, (height, width, 4), dtype=np.uint8)
+    size = preview_size(width, height, scale, max_width, max_height)
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        resized = cv2.resize(frame, (min(640, width), int(height * min(640, width) / width)))
+        cv2.cvtColor(resized, cv2.COLOR_BGRA2RGB)
+    old = (time.perf_counter() - start) / frames
+
+    buffer = np.empty((size[1], size[0], 4), dtype=np.uint8)
+    start = time.perf_counter()
+    for _ in range(frames):
+        result = cv2.resize(frame, size, dst=buffer, interpolation=cv2.INTER_AREA)
+    new = (time.perf_counter() - start) / frames
+    assert result is buffer, "cv2.resize no reutilizó el buffer del preview"
+    return {
+        'size': size,
+        'resize_cvtcolor_ms': old * 1000,
+        'inter_area_in_place_ms': new * 1000
+    }
+
+def _paced_capture(seconds, width, height, preview_name=None):
+    """Bucle de captura sintético a ``VIDEO_FPS``: detector de cambios, compositor y preview reducido.
+
+    Retorna los frames procesados. Con ``preview_name`` publica el preview en
+    ese ``SharedPreviewRing``, como el worker de captura.
+    """
+    rng = np.random.default_rng(0)
+    sources = [rng.integers(0, 256, size=(height, width, 4), dtype=np.uint8) for _ in range(2)]
+    cursor = CursorSprite.from_bgra(rng.integers(0, 256, size=(32, 32, 4), dtype=np.uint8))
+    ring = FrameRingBuffer(width, height)
+    compositor = FrameCompositor(ring)
+    detector = SampledChangeDetector(width, height)
+    reader = ring.reader()
+    preview = SharedPreviewRing.attach(preview_name) if preview_name else None
+    pacer = FramePacer(VIDEO_FPS)
+    pacer.start()
+    try:
+        while pacer.frame_index < seconds * VIDEO_FPS:
+            pacer.wait()
+            source = sources[pacer.frames % 2]
+            detector.update(source)
+            compositor.process(source, cursor, pacer.frames % width, pacer.frames % height)
+            ref = reader.acquire_latest()
+            if ref is None:
+                continue
+            if preview is not None:
+                index, slot = preview.begin_write()
+                cv2.resize(ref.array, (preview.width, preview.height), dst=slot, interpolation=cv2.INTER_AREA)
+                preview.publish(index)
+            ref.release()
+    finally:
+        pacer.stop()
+        if preview is not None:
+            preview.close()
+    return pacer.frames
+
+def _gui_load(stop, items=1_000_000):
+    """Carga que retiene el GIL como un slot de Qt largo: ``sum`` en C no lo suelta hasta terminar."""
+    while not stop.is_set():
+        sum(range(items))
+
+def bench_worker_isolation(seconds=5, width=1920, height=1080):
+    """FPS logrados por la captura con la GUI cargada: en un thread del proceso de la GUI vs. en un proceso worker.
+
+    Sin carga, los dos caminos deben sostener ``VIDEO_FPS``. Con la GUI
+    ocupada en llamadas largas que retienen el GIL, la captura en thread
+    espera cada vez que lo necesita; en el worker solo comparte CPU con el
+    sistema operativo y el preview llega a este proceso por un
+    ``SharedPreviewRing``.
+    """
+    result = {'cpus': os.cpu_count(), 'target_fps': VIDEO_FPS}
+    result['idle_fps'] = _paced_capture(seconds, width, height) / seconds
+
+    stop = threading.Event()
+    frames = []
+    capture = threading.Thread(target=lambda: frames.append(_paced_capture(seconds, width, height)))
+    capture.start()
+    load = threading.Thread(target=_gui_load, args=(stop,))
+    load.start()
+    capture.join()
+    stop.set()
+    load.join()
+    result['thread_fps'] = frames[0] / seconds
+
+    preview = SharedPreviewRing.create(*preview_size(width, height, PREVIEW_SCALE))
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        pool.apply(time.sleep, (0,))  # Esperar el arranque del proceso antes de medir
+        stop.clear()
+        load = threading.Thread(target=_gui_load, args=(stop,))
+        load.start()
+        pending = pool.apply_async(_paced_capture, (seconds, width, height, preview.name))
+        seen = 0
+        while not pending.ready():
+            time.sleep(1.0 / PREVIEW_FPS)  # El timer del preview de la GUI
+            latest = preview.read_latest(seen)
+            if latest is not None:
+                seen = latest[0]
+        stop.set()
+        load.join()
+        result['worker_fps'] = pending.get() / seconds
+    result['previews_received'] = seen
+    preview.close()
+
+    assert result['idle_fps'] > VIDEO_FPS * 0.9, f"La captura no sostiene VIDEO_FPS sin carga: {result}"
+    assert seen > 0, "El preview no llegó desde el worker"
+    return result
+
+def _count_frames(video_file):
+    """Paquetes de video de un archivo, contados por ffmpeg sin decodificar (uno por frame)."""
+    result = subprocess.run(
+        [FFMPEG_PATH, '-hide_banner', '-loglevel', 'error', '-i', video_file,
+         '-map', '0:v', '-c', 'copy', '-f', 'framecrc', '-'],
+        capture_output=True, text=True, check=True
+    )
+    return sum(1 for line in result.stdout.splitlines() if line and not line.startswith('#'))
+
+def bench_parallel_transcode(minutes=30, width=320, height=240, keyframe_seconds=10):
+    """Tiempo de la recodificación final en serie vs. por segmentos en paralelo, según los procesos.
+
+    Genera un video sintético de ``minutes`` minutos con el códec del AVI
+    temporal de OpenCV y un keyframe cada ``keyframe_seconds``. Cada salida
+    paralela (corte, recodificación y concatenación sin pérdida) debe tener
+    los mismos frames que la entrada. El audio se multiplexa en la
+    concatenación y no cambia con la cantidad de procesos, así que no se incluye.
+    """
+    cpus = os.cpu_count() or 1
+    counts = sorted({1, cpus} | {n for n in (2, 4, 8, 16) if n < cpus})
+    result = {'cpus': cpus, 'minutes': minutes, 'size': (width, height)}
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'source.avi')
+        subprocess.run([
+            FFMPEG_PATH, '-y', '-hide_banner', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate={VIDEO_FPS}',
+            '-t', str(minutes * 60), '-c:v', 'mpeg4', '-q:v', '5', '-g', str(VIDEO_FPS * keyframe_seconds),
+            source
+        ], check=True)
+        frames = _count_frames(source)
+
+        serial_file = os.path.join(tmp, 'serial.mkv')
+        start = time.perf_counter()
+        subprocess.run(build_combine_command(source, [], serial_file, 'transcode'), capture_output=True, check=True)
+        result['serial_seconds'] = time.perf_counter() - start
+
+        runs = []
+        for workers in counts:
+            work_dir = os.path.join(tmp, f'segments_{workers}')
+            output = os.path.join(tmp, f'parallel_{workers}.mkv')
+            start = time.perf_counter()
+            list_file = asyncio.run(transcode_segments_async(source, work_dir, minutes * 60, workers))
+            subprocess.run(
+                build_combine_command(list_file, [], output, 'parallel', concat=True),
+                capture_output=True, check=True
+            )
+            elapsed = time.perf_counter() - start
+            segments = len(os.listdir(work_dir)) - 1
+            shutil.rmtree(work_dir)
+            assert _count_frames(output) == frames, f"La concatenación perdió frames con {workers} procesos"
+            runs.append({
+                'workers': workers,
+                'segments': segments,
+                'seconds': elapsed,
+                'speedup': result['serial_seconds'] / elapsed
+            })
+    result['frames'] = frames
+    result['runs'] = runs
+    return result
+
+BENCHMARKS = {
+    'capture-alloc': check_capture_allocations,
+    'cursor-only': check_cursor_updates,
+    'damage': bench_damage_detection,
+    'pacing': check_frame_pacing,
+    'resample': bench_resampler,
+    'sample-format': bench_sample_format,
+    'loudness': check_loudness,
+    'levels': check_level_meter,
+    'preview': bench_preview,
+    'region': bench_region_capture,
+    'multi-monitor': bench_multi_monitor,
+    'worker-isolation': bench_worker_isolation,
+    'parallel-transcode': bench_parallel_transcode,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del grabador de pantalla")
+    parser.add_argument('name', choices=sorted(BENCHMARKS))
+    args = parser.parse_args()
+    print(BENCHMARKS[args.name]())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Escritor mínimo de Matroska en streaming para enviar frames crudos con timestamps a ffmpeg.
+
+``rawvideo`` por stdin asume una cadencia fija; envolver cada frame en un
+``SimpleBlock`` de Matroska permite transmitir timestamps reales (salida VFR)
+sin copiar ni convertir los píxeles.
+"""
+import struct
+
+TIMESTAMP_SCALE_NS = 1_000_000  # Timestamps en milisegundos
+UNKNOWN_SIZE = b'\x01\xff\xff\xff\xff\xff\xff\xff'
+
+def _encode_id(element_id):
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big')
+
+def _encode_size(size):
+    # Tamaño en 8 bytes: marcador 0x01 + 7 bytes
+    return b'\x01' + size.to_bytes(7, 'big')
+
+def _element(element_id, payload):
+    return _encode_id(element_id) + _encode_size(len(payload)) + payload
+
+def _uint(element_id, value):
+    return _element(element_id, value.to_bytes(max(1, (value.bit_length() + 7) // 8), 'big'))
+
+def _string(element_id, value):
+    return _element(element_id, value.encode('ascii'))
+
+class MatroskaFrameStream:
+    """Genera un stream Matroska de un solo track de video sin comprimir (``V_UNCOMPRESSED``)."""
+
+    def __init__(self, stream, width, height, colour_space=b'BGRA'):
+        self.stream = stream
+        self.width = width
+        self.height = height
+        self.colour_space = colour_space
+        self._header_written = False
+
+    def _write_header(self):
+        ebml = _element(0x1A45DFA3, b''.join([
+            _uint(0x4286, 1),            # EBMLVersion
+            _uint(0x42F7, 1),            # EBMLReadVersion
+            _uint(0x42F2, 4),            # EBMLMaxIDLength
+            _uint(0x42F3, 8),            # EBMLMaxSizeLength
+            _string(0x4282, 'matroska'), # DocType
+            _uint(0x4287, 4),            # DocTypeVersion
+            _uint(0x4285, 2),            # DocTypeReadVersion
+        ]))
+        info = _element(0x1549A966, b''.join([
+            _uint(0x2AD7B1, TIMESTAMP_SCALE_NS),
+            _string(0x4D80, 'screenRecording'),
+            _string(0x5741, 'screenRecording'),
+        ]))
+        video = _element(0xE0, b''.join([
+            _uint(0xB0, self.width),
+            _uint(0xBA, self.height),
+            _element(0x2EB524, self.colour_space),
+        ]))
+        track = _element(0xAE, b''.join([
+            _uint(0xD7, 1),                   # TrackNumber
+            _uint(0x73C5, 1),                 # TrackUID
+            _uint(0x83, 1),                   # TrackType: video
+            _uint(0x9C, 0),                   # FlagLacing
+            _string(0x86, 'V_UNCOMPRESSED'),  # CodecID
+            video,
+        ]))
+        tracks = _element(0x1654AE6B, track)
+        # Segmento de tamaño desconocido: se escribe en vivo
+        self.stream.write(ebml + _encode_id(0x18538067) + UNKNOWN_SIZE + info + tracks)
+        self._header_written = True
+
+    def write(self, frame, pts):
+        """Escribe un frame (buffer contiguo) con su timestamp en segundos."""
+        if not self._header_written:
+            self._write_header()
+        data = memoryview(frame).cast('B')
+        timestamp = _uint(0xE7, int(round(pts * 1000)))
+        # SimpleBlock: track 1, timestamp relativo 0, flag keyframe
+        block_header = b'\x81' + struct.pack('>h', 0) + b'\x80'
+        block_size = len(block_header) + len(data)
+        cluster_size = len(timestamp) + 1 + 8 + block_size
+        self.stream.write(
+            _encode_id(0x1F43B675) + _encode_size(cluster_size) + timestamp +
+            b'\xa3' + _encode_size(block_size) + block_header
+        )
+        self.stream.write(data)
@@ -0,0 +1,140 @@
+"""Control de ritmo de frames con deadlines absolutos sobre un reloj monotónico."""
+import os
+import time
+from ..config.settings import PACER_LATE_POLICY, PACER_SPIN_US
+
+if os.name == 'nt':
+    from ctypes import windll
+
+LATE_POLICIES = ('skip', 'catch_up')
+
+class FramePacer:
+    """Marca el ritmo de un loop a ``fps`` sin acumular deriva.
+
+    El deadline del frame ``k`` es ``inicio + k / fps`` calculado en enteros
+    de nanosegundos, así que el jitter de un frame no se arrastra al
+    siguiente. La espera duerme hasta ``spin_us`` antes del deadline y el
+    resto lo cubre con espera activa.
+
+    Si un frame llega tarde más de un período completo, ``late_policy``
+    decide: ``'skip'`` salta los deadlines perdidos (el muxer repite el
+    frame anterior) y ``'catch_up'`` los entrega seguidos sin esperar.
+    """
+
+    def __init__(self, fps, late_policy=PACER_LATE_POLICY, spin_us=PACER_SPIN_US):
+        if late_policy not in LATE_POLICIES:
+            raise ValueError(f"Política de retraso desconocida: {late_policy}")
+        self.fps = fps
+        self.late_policy = late_policy
+        self.period_ns = 1_000_000_000 // fps
+        self.spin_ns = spin_us * 1000
+        self._start_ns = None
+        self._stats_start_ns = None  # Desde cuándo cuentan las estadísticas
+        self._timer_resolution = False
+        self.frame_index = 0
+
+        # Estadísticas
+        self.frames = 0
+        self.skipped_frames = 0
+        self.late_frames = 0  # Entregados más de 1 ms después de su deadline
+        self.lateness_ns = 0  # Retraso del último frame
+        self.max_lateness_ns = 0
+        self._total_lateness_ns = 0
+
+    def start(self):
+        """Fija el instante de inicio; el primer deadline es inmediato."""
+        if os.name == 'nt' and not self._timer_resolution:
+            # Resolución de 1 ms para time.sleep en Windows
+            windll.winmm.timeBeginPeriod(1)
+            self._timer_resolution = True
+        self._start_ns = time.perf_counter_ns()
+        self._stats_start_ns = self._start_ns
+        self.frame_index = 0
+
+    def deadline_ns(self, index):
+        return self._start_ns + index * 1_000_000_000 // self.fps
+
+    def wait(self):
+        """Espera hasta el deadline del próximo frame. Retorna cuántos deadlines se saltaron."""
+        if self._start_ns is None:
+            self.start()
+
+        deadline = self.deadline_ns(self.frame_index)
+        now = time.perf_counter_ns()
+        skipped = 0
+
+        if now < deadline:
+            remaining = deadline - now - self.spin_ns
+            if remaining > 0:
+                time.sleep(remaining / 1e9)
+            while time.perf_counter_ns() < deadline:
+                time.sleep(0)
+            now = time.perf_counter_ns()
+        elif now - deadline >= self.period_ns and self.late_policy == 'skip':
+            # Saltar al deadline más reciente ya vencido
+            current = (now - self._start_ns) * self.fps // 1_000_000_000
+            skipped = current - self.frame_index
+            self.frame_index = current
+            self.skipped_frames += skipped
+            deadline = self.deadline_ns(current)
+
+        lateness = now - deadline
+        self.lateness_ns = lateness
+        self._total_lateness_ns += lateness
+        if lateness > self.max_lateness_ns:
+            self.max_lateness_ns = lateness
+        if lateness > 1_000_000:
+            self.late_frames += 1
+
+        self.frame_index += 1
+        self.frames += 1
+        return skipped
+
+    def stop(self):
+        """Restaura la resolución del temporizador del sistema."""
+        if self._timer_resolution:
+            windll.winmm.timeEndPeriod(1)
+            self._timer_resolution = False
+
+    def reset_stats(self):
+        """Reinicia las estadísticas sin mover los deadlines (p.ej. al empezar a grabar)."""
+        self.frames = 0
+        self.skipped_frames = 0
+        self.late_frames = 0
+        self.max_lateness_ns = 0
+        self._total_lateness_ns = 0
+        self._stats_start_ns = time.perf_counter_ns()
+
+    def stats(self):
+        """Retorna las estadísticas de puntualidad en milisegundos."""
+        elapsed = (time.perf_counter_ns() - self._stats_start_ns) / 1e9 if self._stats_start_ns else 0.0
+        return {
+            'frames': self.frames,
+            'skipped': self.skipped_frames,
+            'expected': int(elapsed * self.fps),
+            'late': self.late_frames,
+            'mean_lateness_ms': self._total_lateness_ns / self.frames / 1e6 if self.frames else 0.0,
+            'max_lateness_ms': self.max_lateness_ns / 1e6
+        }
+
+class SessionClock:
+    """Reloj monotónico común a video y audio durante una grabación.
+
+    Los frames del anillo y los bloques de audio se sellan con
+    ``time.perf_counter()``; ``to_session`` los lleva a segundos desde el
+    inicio de la sesión.
+    """
+
+    def __init__(self):
+        self.start_time = None
+
+    def start(self):
+        self.start_time = time.perf_counter()
+
+    def now(self):
+        """Segundos transcurridos desde el inicio de la sesión."""
+        return time.perf_counter() - self.start_time
+
+    def to_session(self, timestamp):
+        """Convierte un valor de ``perf_counter`` a segundos de sesión."""
+        return timestamp - self.start_time
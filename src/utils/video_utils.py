@@ -1,8 +1,18 @@
 import cv2
+import math
 import numpy as np
 import subprocess
 import os
-from ..config.settings import VIDEO_CODEC, VIDEO_QUALITY
+import shutil
+import time
+import asyncio
+from ..config.settings import (
+    VIDEO_CODEC, VIDEO_QUALITY, FFMPEG_PATH, FINALIZE_MODE,
+    TRANSCODE_WORKERS, TRANSCODE_MIN_SEGMENT_SECONDS
+)
+
+FINALIZE_MODES = ('copy', 'transcode', 'parallel')
+SEGMENTS_PER_WORKER = 2  # Más segmentos que procesos: los cortes en keyframes no son parejos
 
 class VideoProcessor:
     def __init__(self):
@@ -55,59 +65,113 @@ class VideoProcessor:
             print(f"Error al cerrar video writer: {str(e)}")
             return False
 
-def combine_audio_video(video_file, audio_files, output_file):
-    """Combina video y audio de manera optimizada usando FFmpeg."""
+def preview_size(width, height, scale, max_width=0, max_height=0):
+    """Tamaño del preview: a lo sumo ``scale`` del frame y, si se indica, dentro de ``max_width`` x ``max_height``.
+
+    El tamaño se redondea a una fracción entera 1/n del frame: con factores
+    enteros ``cv2.INTER_AREA`` promedia bloques n x n por un camino rápido,
+    mientras que con factores fraccionarios es varias veces más lento que la
+    captura misma.
+    """
+    limit = scale
+    if max_width > 0 and max_height > 0:
+        limit = min(limit, max_width / width, max_height / height)
+    factor = max(1, math.ceil(1 / limit - 1e-9)) if limit > 0 else 1
+    return max(2, width // factor), max(2, height // factor)
+
+def _valid_audio_files(audio_files):
+    """Filtra los WAV que existen y contienen datos."""
+    return [
+        f for f in audio_files 
+        if os.path.exists(f) and os.path.getsize(f) > 44
+    ]
+
+def transcode_video_args():
+    """Códec y calidad de video al recodificar en la finalización."""
+    return ['-c:v', 'mpeg4', '-q:v', str(VIDEO_QUALITY)]
+
+def build_combine_command(video_file, audio_files, output_file, mode=FINALIZE_MODE,
+                          track_titles=None, audio_gains=None, concat=False):
+    """Construye el comando FFmpeg que combina video y audio.
+
+    Cada audio se guarda como su propia pista: con ``AUDIO_TRACK_MODE = 'mix'``
+    las fuentes ya llegan mezcladas en un solo WAV (``AudioMixerThread``).
+    ``track_titles`` (archivo -> título) pone nombre a las pistas y
+    ``audio_gains`` (archivo -> dB) aplica la normalización de sonoridad con
+    ``volume`` en la misma pasada en que el audio se codifica.
+
+    Con ``concat`` el video es una lista del demuxer concat con segmentos ya
+    recodificados, que se copian. En modo 'parallel' sin lista el video se
+    recodifica en serie, como en 'transcode'.
+    """
+    if mode not in FINALIZE_MODES:
+        raise ValueError(f"Modo de finalización desconocido: {mode}")
+
+    # Construir comando FFmpeg optimizado
+    cmd = [FFMPEG_PATH, '-y']
+    if concat:
+        cmd.extend(['-f', 'concat', '-safe', '0'])
+    cmd.extend(['-i', video_file])
+    
+    # Agregar inputs de audio
+    for audio_file in audio_files:
+        cmd.extend(['-i', audio_file])
+
+    # Configurar filtros y mapeo: una pista por archivo de audio
+    gains = audio_gains or {}
+    titles = track_titles or {}
+    filters = []
+    maps = []
+    for i, audio_file in enumerate(audio_files):
+        gain_db = gains.get(audio_file, 0.0)
+        if abs(gain_db) >= 0.01:
+            filters.append(f'[{i+1}:a]volume={gain_db:.2f}dB[a{i}]')
+            maps.extend(['-map', f'[a{i}]'])
+        else:
+            maps.extend(['-map', f'{i+1}:a'])
+        title = titles.get(audio_file)
+        if title:
+            maps.extend([f'-metadata:s:a:{i}', f'title={title}'])
+
+    if filters:
+        cmd.extend(['-filter_complex', ';'.join(filters)])
+    cmd.extend(['-map', '0:v'])
+    cmd.extend(maps)
+
+    # Configurar códecs y calidad
+    if mode == 'copy' or concat:
+        cmd.extend(['-c:v', 'copy'])
+    else:
+        cmd.extend(transcode_video_args())
+    cmd.extend([
+        '-c:a', 'aac',
+        '-b:a', '192k',  # Reducido de 320k para optimizar
+        output_file
+    ])
+    return cmd
+
+def combine_audio_video(video_file, audio_files, output_file, mode=FINALIZE_MODE,
+                        track_titles=None, audio_gains=None):
+    """Combina video y audio de manera optimizada usando FFmpeg.
+
+    En modo 'copy' el video ya comprimido se copia sin recodificar y solo se
+    codifica el audio; 'transcode' recodifica también el video.
+    """
     try:
         if not os.path.exists(video_file):
             raise FileNotFoundError(f"No se encuentra el video: {video_file}")
 
         # Verificar archivos de audio válidos
-        valid_audio_files = [
-            f for f in audio_files 
-            if os.path.exists(f) and os.path.getsize(f) > 44
-        ]
+        valid_audio_files = _valid_audio_files(audio_files)
 
         if not valid_audio_files:
             os.rename(video_file, output_file)
             return True
 
-        # Construir comando FFmpeg optimizado
-        cmd = ['ffmpeg', '-y', '-i', video_file]
-        
-        # Agregar inputs de audio
-        for audio_file in valid_audio_files:
-            cmd.extend(['-i', audio_file])
-
-        # Configurar filtros y mapeo
-        if len(valid_audio_files) > 1:
-            filter_complex = ''.join([
-                f'[{i+1}:a]volume=1[a{i}];' 
-                for i in range(len(valid_audio_files))
-            ])
-            filter_complex += ''.join([
-                f'[a{i}]' for i in range(len(valid_audio_files))
-            ])
-            filter_complex += f'amix=inputs={len(valid_audio_files)}:duration=longest[a]'
-            
-            cmd.extend([
-                '-filter_complex', filter_complex,
-                '-map', '0:v', '-map', '[a]'
-            ])
-        else:
-            cmd.extend(['-map', '0:v', '-map', '1:a'])
-
-        # Configurar códecs y calidad
-        cmd.extend([
-            '-c:v', 'mpeg4',
-            '-q:v', str(VIDEO_QUALITY),
-            '-c:a', 'aac',
-            '-b:a', '192k',  # Reducido de 320k para optimizar
-            output_file
-        ])
-
         # Ejecutar FFmpeg
         result = subprocess.run(
-            cmd,
+            build_combine_command(video_file, valid_audio_files, output_file, mode,
+                                  track_titles, audio_gains),
             capture_output=True,
             text=True,
             check=True
@@ -124,4 +188,342 @@ def combine_audio_video(video_file, audio_files, output_file):
         print(f"Error al combinar audio y video: {str(e)}")
         if os.path.exists(video_file):
             os.rename(video_file, output_file)
-        return False 
\ No newline at end of file
+        return False
+
+def build_merge_command(video_files, output_file, titles=None):
+    """Comando FFmpeg que junta varios videos en un contenedor con un stream de video por archivo.
+
+    Del primer archivo se copian todos los streams (video y audio); de los
+    demás, solo el video. Todo se copia sin recodificar: como los archivos
+    comparten el reloj de sesión, los streams quedan alineados.
+    """
+    cmd = [FFMPEG_PATH, '-y', '-hide_banner', '-loglevel', 'error']
+    for video_file in video_files:
+        cmd.extend(['-i', video_file])
+    cmd.extend(['-map', '0'])
+    for i in range(1, len(video_files)):
+        cmd.extend(['-map', f'{i}:v'])
+    for i, title in enumerate(titles or []):
+        cmd.extend([f'-metadata:s:v:{i}', f'title={title}'])
+    cmd.extend(['-c', 'copy', output_file])
+    return cmd
+
+async def merge_video_streams_async(video_files, output_file, titles=None):
+    """Junta ``video_files`` en ``output_file`` (ver ``build_merge_command``).
+
+    Si ffmpeg termina bien se borran los archivos de entrada; si falla o se
+    cancela se conservan y se descarta la salida parcial.
+    """
+    video_files = [f for f in video_files if os.path.exists(f)]
+    if len(video_files) < 2:
+        print("Error al combinar monitores: faltan archivos de video")
+        return False
+
+    process = None
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *build_merge_command(video_files, output_file, titles),
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(
+                f"FFmpeg terminó con código {process.returncode}: {stderr.decode(errors='replace').strip()}"
+            )
+        for video_file in video_files:
+            os.remove(video_file)
+        return True
+
+    except asyncio.CancelledError:
+        if process and process.returncode is None:
+            process.kill()
+            await process.wait()
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        raise
+
+    except Exception as e:
+        print(f"Error al combinar monitores: {str(e)}")
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        return False
+
+def build_gain_command(media_file, output_file, stream_gains):
+    """Comando FFmpeg que aplica ``volume`` a las pistas de audio de un archivo ya multiplexado.
+
+    ``stream_gains`` asocia el índice de cada pista de audio con su ganancia
+    en dB. El video y las demás pistas se copian; solo se recodifican las
+    pistas con ganancia.
+    """
+    cmd = [FFMPEG_PATH, '-y', '-hide_banner', '-loglevel', 'error', '-i', media_file,
+           '-map', '0', '-c', 'copy']
+    for index, gain_db in sorted(stream_gains.items()):
+        cmd.extend([f'-filter:a:{index}', f'volume={gain_db:.2f}dB',
+                    f'-c:a:{index}', 'aac', f'-b:a:{index}', '192k'])
+    cmd.append(output_file)
+    return cmd
+
+async def apply_audio_gains_async(media_file, stream_gains):
+    """Normaliza el audio de ``media_file`` en el lugar (ver ``build_gain_command``).
+
+    Con multiplexado en vivo el audio ya está codificado cuando se conoce la
+    sonoridad, así que la ganancia se aplica en una segunda pasada que copia
+    el video. Si ffmpeg falla o se cancela, el archivo original queda intacto.
+    """
+    stream_gains = {index: gain for index, gain in stream_gains.items() if abs(gain) >= 0.01}
+    if not stream_gains:
+        return True
+    base, ext = os.path.splitext(media_file)
+    output_file = f"{base}_normalized{ext}"
+    process = None
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *build_gain_command(media_file, output_file, stream_gains),
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(
+                f"FFmpeg terminó con código {process.returncode}: {stderr.decode(errors='replace').strip()}"
+            )
+        os.replace(output_file, media_file)
+        return True
+
+    except asyncio.CancelledError:
+        if process and process.returncode is None:
+            process.kill()
+            await process.wait()
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        raise
+
+    except Exception as e:
+        print(f"Error al normalizar el audio: {str(e)}")
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        return False
+
+def transcode_workers(workers=TRANSCODE_WORKERS):
+    """Procesos de ffmpeg simultáneos del modo 'parallel' (0 = uno por núcleo)."""
+    return workers or os.cpu_count() or 1
+
+def build_segment_command(video_file, pattern, segment_seconds):
+    """Comando que corta el video sin recodificar en segmentos de al menos ``segment_seconds``.
+
+    El muxer segment solo corta en keyframes, así que cada segmento empieza
+    con uno y se puede recodificar de forma independiente.
+    """
+    return [
+        FFMPEG_PATH, '-y', '-hide_banner', '-loglevel', 'error', '-i', video_file,
+        '-map', '0:v', '-c', 'copy', '-f', 'segment',
+        '-segment_time', f'{segment_seconds:.3f}', '-reset_timestamps', '1', pattern
+    ]
+
+def build_transcode_command(segment_file, output_file):
+    """Comando que recodifica un segmento con un solo thread (el paralelismo está entre procesos)."""
+    return [
+        FFMPEG_PATH, '-y', '-hide_banner', '-loglevel', 'error', '-i', segment_file,
+        '-map', '0:v', *transcode_video_args(), '-threads', '1', output_file
+    ]
+
+async def _run_ffmpeg_async(cmd):
+    """Ejecuta FFmpeg como subproceso de asyncio; lo termina si la tarea se cancela."""
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        _, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    if process.returncode != 0:
+        raise RuntimeError(
+            f"FFmpeg terminó con código {process.returncode}: {stderr.decode(errors='replace').strip()}"
+        )
+
+async def transcode_segments_async(video_file, work_dir, duration, workers=None,
+                                   progress_callback=None):
+    """Recodifica ``video_file`` en paralelo: lo corta en keyframes y pasa cada segmento por su propio ffmpeg.
+
+    Corren a la vez hasta ``workers`` procesos. Retorna la lista del demuxer
+    concat con los segmentos recodificados en orden, o None si el video dura
+    menos de dos segmentos de ``TRANSCODE_MIN_SEGMENT_SECONDS``.
+    ``progress_callback`` recibe un evento cada vez que termina un segmento.
+    """
+    workers = transcode_workers(workers)
+    count = min(workers * SEGMENTS_PER_WORKER, int((duration or 0) // TRANSCODE_MIN_SEGMENT_SECONDS))
+    if count < 2:
+        return None
+
+    os.makedirs(work_dir, exist_ok=True)
+    await _run_ffmpeg_async(build_segment_command(video_file, os.path.join(work_dir, 'src_%04d.mkv'), duration / count))
+    sources = sorted(f for f in os.listdir(work_dir) if f.startswith('src_'))
+
+    semaphore = asyncio.Semaphore(workers)
+    started_at = time.monotonic()
+    finished = []
+
+    async def transcode(source):
+        output = 'out_' + source[len('src_'):]
+        async with semaphore:
+            await _run_ffmpeg_async(build_transcode_command(
+                os.path.join(work_dir, source), os.path.join(work_dir, output)
+            ))
+        os.remove(os.path.join(work_dir, source))
+        finished.append(output)
+        if progress_callback:
+            # Aproximado: los segmentos duran parecido pero no igual
+            out_time_us = int(duration * len(finished) / len(sources) * 1_000_000)
+            progress_callback(parse_ffmpeg_progress({'out_time_us': out_time_us}, duration, started_at))
+        return output
+
+    tasks = [asyncio.ensure_future(transcode(source)) for source in sources]
+    try:
+        outputs = await asyncio.gather(*tasks)
+    except BaseException:
+        # Un segmento falló o se canceló la finalización: detener los demás
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    # Rutas relativas: el demuxer concat las resuelve desde la carpeta de la lista
+    list_file = os.path.join(work_dir, 'segments.txt')
+    with open(list_file, 'w') as f:
+        for output in outputs:
+            f.write(f"file '{output}'\n")
+    return list_file
+
+def parse_ffmpeg_progress(block, duration, started_at):
+    """Convierte un bloque de ``-progress`` de FFmpeg en un evento de progreso."""
+    out_time_us = block.get('out_time_us') or block.get('out_time_ms')
+    try:
+        out_time = max(0.0, int(out_time_us) / 1_000_000)
+    except (TypeError, ValueError):
+        out_time = 0.0
+
+    done = block.get('progress') == 'end'
+    percent = None
+    eta = None
+    if done:
+        percent = 100.0
+        eta = 0.0
+    elif duration:
+        percent = min(100.0, 100.0 * out_time / duration)
+        elapsed = time.monotonic() - started_at
+        if percent > 0:
+            eta = elapsed * (100.0 - percent) / percent
+
+    return {
+        'out_time': out_time,
+        'percent': percent,
+        'eta': eta,
+        'speed': block.get('speed', '').strip() or None,
+        'done': done
+    }
+
+async def combine_audio_video_async(video_file, audio_files, output_file,
+                                    mode=FINALIZE_MODE, duration=None,
+                                    progress_callback=None, track_titles=None,
+                                    audio_gains=None):
+    """Versión asíncrona y cancelable de ``combine_audio_video``.
+
+    FFmpeg corre como subproceso de asyncio, así que el loop de eventos sigue
+    libre. ``progress_callback`` recibe eventos con porcentaje y ETA calculados
+    a partir de ``duration`` (segundos de video). Si la tarea se cancela, el
+    proceso se termina y los archivos temporales se conservan.
+
+    En modo 'parallel' el video se recodifica antes por segmentos en
+    paralelo (``transcode_segments_async``); después se concatenan sin
+    recodificar y el audio se multiplexa una sola vez.
+    """
+    if not os.path.exists(video_file):
+        print(f"Error al combinar audio y video: No se encuentra el video: {video_file}")
+        return False
+
+    valid_audio_files = _valid_audio_files(audio_files)
+    if not valid_audio_files and mode != 'parallel':
+        os.rename(video_file, output_file)
+        if progress_callback:
+            progress_callback(parse_ffmpeg_progress({'progress': 'end'}, duration, 0))
+        return True
+
+    process = None
+    work_dir = f"{os.path.splitext(output_file)[0]}_segments" if mode == 'parallel' else None
+    try:
+        video_input = video_file
+        mux_progress = progress_callback
+        if work_dir:
+            video_input = await transcode_segments_async(
+                video_file, work_dir, duration, progress_callback=progress_callback
+            )
+            if video_input is None:
+                video_input = video_file  # Muy corto para repartir: se recodifica en serie
+            elif progress_callback:
+                # El video ya está recodificado: de la concatenación solo se informa el final
+                def mux_progress(event):
+                    if event['done']:
+                        progress_callback(event)
+
+        cmd = build_combine_command(video_input, valid_audio_files, output_file, mode,
+                                    track_titles, audio_gains, concat=video_input != video_file)
+        # Reportar progreso por stdout en formato clave=valor
+        cmd[1:1] = ['-hide_banner', '-loglevel', 'error', '-nostats', '-progress', 'pipe:1']
+
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        started_at = time.monotonic()
+        block = {}
+        async for raw_line in process.stdout:
+            key, _, value = raw_line.decode(errors='replace').strip().partition('=')
+            if not key:
+                continue
+            block[key] = value
+            if key == 'progress':
+                if mux_progress:
+                    mux_progress(parse_ffmpeg_progress(block, duration, started_at))
+                block = {}
+
+        stderr = await process.stderr.read()
+        returncode = await process.wait()
+        if returncode != 0:
+            raise RuntimeError(
+                f"FFmpeg terminó con código {returncode}: {stderr.decode(errors='replace').strip()}"
+            )
+
+        # Limpiar archivos temporales
+        os.remove(video_file)
+        for audio_file in valid_audio_files:
+            os.remove(audio_file)
+        return True
+
+    except asyncio.CancelledError:
+        print(f"Finalización cancelada, se conservan los temporales de {os.path.basename(output_file)}")
+        if process and process.returncode is None:
+            process.kill()
+            await process.wait()
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        raise
+
+    except Exception as e:
+        print(f"Error al combinar audio y video: {str(e)}")
+        if process and process.returncode is None:
+            process.kill()
+            await process.wait()
+        if os.path.exists(video_file):
+            os.replace(video_file, output_file)
+        return False
+
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)